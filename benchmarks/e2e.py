@@ -0,0 +1,268 @@
+# benchmarks/e2e.py
+"""
+End-to-end benchmark: the real server over stdio, against the local Gmail emulator.
+
+Starts the Gmail API emulator in-process, launches gmail-server (through
+server.main) as a child process pointed at it with GMAIL_API_ROOT, and
+drives list_unread / search_emails over the MCP stdio protocol from
+--concurrency concurrent callers. The report covers startup time (to the
+initialize response, and to the first tool result), per-call latency
+percentiles, throughput, Gmail quota units consumed (as charged by the
+emulator) and the server's peak RSS.
+
+With --baseline, the report is compared with an earlier one and the script
+exits non-zero when a metric regressed by more than --max-regression-pct.
+
+Usage:
+    uv run python benchmarks/e2e.py --calls 500 --concurrency 16 --latency-ms 40 --output e2e.json
+    uv run python benchmarks/e2e.py --calls 500 --concurrency 16 --latency-ms 40 --baseline e2e.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from mcp import ClientSession
+from mcp.client.stdio import StdioServerParameters, stdio_client
+
+from mcp_server.gmail.emulator import FaultProfile, GmailEmulator, SyntheticMailbox
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Runs the server in the child and writes its peak RSS to BENCH_RSS_FILE on exit.
+# The MCP client stops the server with SIGTERM; turning that into KeyboardInterrupt
+# lets main() return normally, so the atexit hook runs.
+CHILD_SCRIPT = """
+import atexit, json, os, resource, signal, sys
+signal.signal(signal.SIGTERM, signal.default_int_handler)
+def _report_rss():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    peak_bytes = peak if sys.platform == "darwin" else peak * 1024
+    with open(os.environ["BENCH_RSS_FILE"], "w") as f:
+        json.dump({"peak_rss_bytes": peak_bytes}, f)
+atexit.register(_report_rss)
+from mcp_server.gmail.server import main
+main()
+"""
+
+DEFAULT_QUERIES = ["is:unread", "from:ada", "subject:report", "invoice", "-is:unread meeting", "category:updates"]
+# Metrics compared against a baseline, and whether larger values are better
+COMPARED_METRICS = {
+    "latency_ms.p50": False,
+    "latency_ms.p95": False,
+    "latency_ms.p99": False,
+    "throughput_per_s": True,
+    "quota_units_per_call": False,
+    "startup_ms.initialize": False,
+    "startup_ms.first_call": False,
+    "server_peak_rss_mb": False,
+}
+
+
+def _workload(args: argparse.Namespace) -> list[tuple[str, dict]]:
+    """Returns the (tool, arguments) of every measured call, in issue order."""
+    calls = []
+    for index in range(args.calls):
+        tool = args.tool if args.tool != "mixed" else ("list_unread", "search_emails")[index % 2]
+        arguments = {"max_results": args.max_results}
+        if tool == "search_emails":
+            arguments["query"] = args.queries[index % len(args.queries)]
+        calls.append((tool, arguments))
+    return calls
+
+
+def _is_error(result) -> bool:
+    if result.isError:
+        return True
+    try:
+        return "error" in json.loads(result.content[0].text)
+    except (IndexError, ValueError, AttributeError, TypeError):
+        return True
+
+
+def _percentile(sorted_values: list[float], quantile: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    return sorted_values[min(len(sorted_values) - 1, max(0, round(quantile * len(sorted_values)) - 1))]
+
+
+async def _drive(session: ClientSession, calls: list[tuple[str, dict]], concurrency: int) -> tuple[list[float], int, float]:
+    """Issues calls from `concurrency` workers; returns (latencies in ms, error count, wall time in s)."""
+    queue = list(reversed(calls))
+    latencies: list[float] = []
+    errors = 0
+
+    async def worker() -> None:
+        nonlocal errors
+        while queue:
+            tool, arguments = queue.pop()
+            start = time.perf_counter()
+            try:
+                result = await session.call_tool(tool, arguments)
+                failed = _is_error(result)
+            except Exception:
+                failed = True
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors += failed
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+async def _run(args: argparse.Namespace, emulator: GmailEmulator, rss_file: Path, errlog) -> dict:
+    env = {
+        **os.environ,
+        **dict(entry.split("=", 1) for entry in args.env),
+        "GMAIL_API_ROOT": emulator.api_root,
+        "GMAIL_METADATA_CACHE_FILE": str(rss_file.with_name("metadata.db")),
+        "BENCH_RSS_FILE": str(rss_file),
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(PROJECT_ROOT), os.environ.get("PYTHONPATH")])),
+    }
+    if args.backend:
+        env["GMAIL_BACKEND"] = args.backend
+    if args.no_cache:
+        env.update(GMAIL_METADATA_CACHE_SIZE="0", GMAIL_QUERY_CACHE_TTL="0", GMAIL_INCREMENTAL_SYNC="0")
+    params = StdioServerParameters(command=sys.executable, args=["-c", CHILD_SCRIPT], env=env, cwd=PROJECT_ROOT)
+
+    launched = time.perf_counter()
+    async with stdio_client(params, errlog=errlog) as (read_stream, write_stream):
+        async with ClientSession(read_stream, write_stream) as session:
+            await session.initialize()
+            initialized = time.perf_counter()
+            await session.list_tools()
+            listed = time.perf_counter()
+
+            calls = _workload(args)
+            # The server builds its Gmail client in the background; the first call may wait for it
+            await session.call_tool(*calls[0])
+            first_called = time.perf_counter()
+            await _drive(session, calls[:args.warmup], args.concurrency)
+            before = emulator.stats.snapshot()
+            latencies, errors, wall = await _drive(session, calls, args.concurrency)
+            after = emulator.stats.snapshot()
+
+    latencies.sort()
+    quota_units = after["quota_units"] - before["quota_units"]
+    return {
+        "startup_ms": {
+            "initialize": (initialized - launched) * 1000,
+            "list_tools": (listed - initialized) * 1000,
+            "first_call": (first_called - listed) * 1000,
+        },
+        "calls": len(latencies),
+        "errors": errors,
+        "latency_ms": {
+            "p50": _percentile(latencies, 0.50),
+            "p95": _percentile(latencies, 0.95),
+            "p99": _percentile(latencies, 0.99),
+            "mean": statistics.mean(latencies),
+            "max": latencies[-1],
+        },
+        "throughput_per_s": len(latencies) / wall,
+        "quota_units": quota_units,
+        "quota_units_per_call": quota_units / len(latencies),
+        "gmail_http_requests": after["http_requests"] - before["http_requests"],
+        "gmail_errors_injected": sum(after["errors"].values()) - sum(before["errors"].values()),
+    }
+
+
+def _read_peak_rss(rss_file: Path, timeout: float = 5.0) -> int | None:
+    """Waits for the exiting server to report its peak RSS in bytes; None if it never does."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            return json.loads(rss_file.read_text())["peak_rss_bytes"]
+        except (FileNotFoundError, ValueError):
+            # Not written yet, or caught mid-write
+            time.sleep(0.05)
+    return None
+
+
+def _lookup(report: dict, path: str):
+    value = report
+    for key in path.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def _compare(report: dict, baseline: dict, max_regression_pct: float) -> dict:
+    """Returns per-metric % changes versus baseline and which ones regressed beyond the threshold."""
+    changes, regressions = {}, []
+    for path, higher_is_better in COMPARED_METRICS.items():
+        current, previous = _lookup(report, path), _lookup(baseline, path)
+        if current is None or not previous:
+            continue
+        change = 100.0 * (current - previous) / previous
+        changes[path] = round(change, 2)
+        if (-change if higher_is_better else change) > max_regression_pct:
+            regressions.append(path)
+    return {"baseline_commit": baseline.get("commit"), "change_pct": changes, "regressions": regressions}
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tool", choices=["list_unread", "search_emails", "mixed"], default="mixed", help="Tool to call (default: mixed)")
+    parser.add_argument("--queries", nargs="+", default=DEFAULT_QUERIES, help="search_emails queries, used in turn")
+    parser.add_argument("--calls", type=int, default=200, help="Measured tool calls (default: 200)")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured calls issued first (default: 10)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent callers (default: 8)")
+    parser.add_argument("--max-results", type=int, default=10, help="max_results per call (default: 10)")
+    parser.add_argument("--backend", choices=["threaded", "async"], help="GMAIL_BACKEND for the server (default: its own default)")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the metadata cache, query cache and incremental sync")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="Extra server environment, e.g. GMAIL_POOL_SIZE=16")
+    parser.add_argument("--messages", type=int, default=5000, help="Emulated mailbox size (default: 5000)")
+    parser.add_argument("--seed", type=int, default=0, help="Mailbox and fault seed (default: 0)")
+    parser.add_argument("--latency-ms", type=float, default=30.0, help="Emulated Gmail latency per HTTP request (default: 30)")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="Uniform +/- spread around the latency (default: 10)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of Gmail calls answered 429 (default: 0)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of Gmail calls answered 500/503 (default: 0)")
+    parser.add_argument("--deliver-interval", type=float, default=0.0, help="Deliver new mail every N seconds (default: never)")
+    parser.add_argument("--server-log", type=Path, help="Write the server's stderr here (default: discarded)")
+    parser.add_argument("--output", type=Path, help="Also write the JSON report to this file")
+    parser.add_argument("--baseline", type=Path, help="Earlier report to compare against")
+    parser.add_argument("--max-regression-pct", type=float, default=10.0, help="Allowed regression per metric versus --baseline (default: 10)")
+    args = parser.parse_args()
+
+    faults = FaultProfile(args.latency_ms / 1000, args.jitter_ms / 1000, args.throttle_rate, args.error_rate, seed=args.seed)
+    mailbox = SyntheticMailbox(args.messages, seed=args.seed)
+    with tempfile.TemporaryDirectory() as scratch, \
+            GmailEmulator(mailbox, faults, deliver_interval=args.deliver_interval) as emulator, \
+            open(args.server_log or os.devnull, "w") as errlog:
+        rss_file = Path(scratch) / "rss.json"
+        results = asyncio.run(_run(args, emulator, rss_file, errlog))
+        peak_rss = _read_peak_rss(rss_file)
+
+    report = {
+        "benchmark": "e2e",
+        "commit": _git_commit(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "server_log")},
+        **results,
+        "server_peak_rss_mb": peak_rss / (1024 * 1024) if peak_rss else None,
+    }
+    if args.baseline:
+        report["comparison"] = _compare(report, json.loads(args.baseline.read_text()), args.max_regression_pct)
+
+    text = json.dumps(report, indent=2, default=str)
+    print(text)
+    if args.output:
+        args.output.write_text(text + "\n")
+    return 1 if report.get("comparison", {}).get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
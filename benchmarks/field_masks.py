@@ -0,0 +1,83 @@
+# benchmarks/field_masks.py
+"""
+Measures how many response bytes the partial-response field masks save.
+
+For a sample of real messages, each Gmail call the server makes is issued
+twice -- once with its `fields=` mask and once without -- and the response
+body sizes are compared. Sizes are of the decoded JSON body; with gzip on
+the wire the absolute numbers shrink but the ratio is similar.
+
+Requires a valid token in secrets/ (run the server once to create it).
+
+Usage:
+    uv run python benchmarks/field_masks.py --messages 50
+"""
+import argparse
+import json
+import statistics
+import sys
+
+from mcp_server.gmail import gmail_client
+from mcp_server.gmail.gmail_client import GmailApiClient
+from mcp_server.gmail.server import get_credentials
+
+
+def _body_size(request) -> int:
+    """Executes a googleapiclient request and returns the raw response body length."""
+    resp, content = request.http.request(request.uri, method=request.method, headers=request.headers)
+    if resp.status >= 400:
+        raise RuntimeError(f"HTTP {resp.status} for {request.uri}")
+    return len(content)
+
+
+def _compare(make_request, fields: str) -> dict:
+    """Sizes one call with and without its field mask."""
+    return {"full": _body_size(make_request()), "masked": _body_size(make_request(fields=fields))}
+
+
+def _summarize(samples: list[dict]) -> dict:
+    full = [sample["full"] for sample in samples]
+    masked = [sample["masked"] for sample in samples]
+    return {
+        "calls": len(samples),
+        "mean_full_bytes": statistics.mean(full),
+        "mean_masked_bytes": statistics.mean(masked),
+        "reduction_pct": 100.0 * (1 - sum(masked) / sum(full)),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20, help="Number of messages to sample (default: 20)")
+    args = parser.parse_args()
+
+    client = GmailApiClient(get_credentials(), pool_size=1)
+    service = client.service
+    users = service.users()
+
+    list_call = lambda **kw: users.messages().list(userId="me", maxResults=args.messages, **kw)
+    list_sample = _compare(list_call, gmail_client.LIST_FIELDS)
+    message_ids = [msg_ref["id"] for msg_ref in list_call(fields=gmail_client.LIST_FIELDS).execute().get("messages", [])]
+
+    get_samples = []
+    for message_id in message_ids:
+        get_call = lambda **kw: users.messages().get(
+            userId="me", id=message_id, format="metadata", metadataHeaders=gmail_client.METADATA_HEADERS, **kw
+        )
+        get_samples.append(_compare(get_call, gmail_client.MESSAGE_FIELDS))
+
+    profile_sample = _compare(lambda **kw: users.getProfile(userId="me", **kw), gmail_client.PROFILE_FIELDS)
+    client.close()
+
+    report = {
+        "benchmark": "field_masks",
+        "messages.list": _summarize([list_sample]),
+        "messages.get": _summarize(get_samples) if get_samples else None,
+        "users.getProfile": _summarize([profile_sample]),
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
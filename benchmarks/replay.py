@@ -0,0 +1,112 @@
+# benchmarks/replay.py
+"""
+Replays a recorded cassette through the tool handlers, with no network.
+
+A cassette recorded with GMAIL_RECORD_FILE holds the server's redacted
+Gmail exchanges and the tool calls that caused them. This script re-issues
+those tool calls through _execute_tool at their recorded arrival times, with
+Gmail answered from the cassette, and reports per-call latency percentiles
+and throughput. Replaying the same cassette on two commits compares them on
+identical, production-shaped traffic.
+
+Server settings (GMAIL_BACKEND, caches, quota pacing, ...) are read from
+the usual GMAIL_* environment variables.
+
+Usage:
+    GMAIL_RECORD_FILE=traffic.jsonl.gz uv run gmail-server    # record
+    uv run python benchmarks/replay.py traffic.jsonl.gz --time-scale 1 --arrival-scale 0.1
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from google.oauth2.credentials import Credentials
+
+from mcp_server.gmail import server
+from mcp_server.gmail.cassette import Cassette
+
+
+def _percentile(sorted_values: list[float], quantile: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    return sorted_values[min(len(sorted_values) - 1, max(0, round(quantile * len(sorted_values)) - 1))]
+
+
+def _is_error(result) -> bool:
+    try:
+        return "error" in json.loads(result[0].text)
+    except (IndexError, ValueError, AttributeError, TypeError):
+        return True
+
+
+async def _replay(cassette: Cassette, arrival_scale: float) -> tuple[list[float], int, float]:
+    """Issues the recorded tool calls; returns (latencies in ms, error count, wall time in s)."""
+    client = await asyncio.to_thread(server._create_client, Credentials(token=server.EMULATOR_TOKEN), cassette)
+    # Passing the cassette keeps redacted details out of the real metadata cache
+    mailbox = server._create_mailbox(client, cassette=cassette)
+    latencies: list[float] = []
+    errors = 0
+    start = time.perf_counter()
+
+    async def issue(call: dict) -> None:
+        nonlocal errors
+        await asyncio.sleep(max(0.0, start + call["t"] * arrival_scale - time.perf_counter()))
+        issued = time.perf_counter()
+        result = await server._execute_tool(call["tool"], call["args"], mailbox)
+        latencies.append((time.perf_counter() - issued) * 1000)
+        errors += _is_error(result)
+
+    try:
+        first = cassette.tool_calls[0]["t"]
+        await asyncio.gather(*(issue({**call, "t": call["t"] - first}) for call in cassette.tool_calls))
+    finally:
+        await mailbox.close()
+    return latencies, errors, time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cassette", type=Path, help="Cassette recorded with GMAIL_RECORD_FILE")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiplier for recorded Gmail latencies; 0 answers immediately (default: 1)")
+    parser.add_argument("--arrival-scale", type=float, default=1.0, help="Multiplier for the gaps between tool calls; 0 issues them all at once (default: 1)")
+    parser.add_argument("--output", type=Path, help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    cassette = Cassette(args.cassette, mode="replay", time_scale=args.time_scale)
+    if not cassette.tool_calls:
+        print(f"{args.cassette} has no recorded tool calls.", file=sys.stderr)
+        return 1
+    latencies, errors, wall = asyncio.run(_replay(cassette, args.arrival_scale))
+    latencies.sort()
+
+    report = {
+        "benchmark": "replay",
+        "cassette": str(args.cassette),
+        "backend": server.BACKEND,
+        "time_scale": args.time_scale,
+        "arrival_scale": args.arrival_scale,
+        "calls": len(latencies),
+        "errors": errors,
+        # Requests the cassette had no answer for; non-zero means the traffic diverged from the recording
+        "unrecorded_requests": cassette.misses,
+        "latency_ms": {
+            "p50": _percentile(latencies, 0.50),
+            "p95": _percentile(latencies, 0.95),
+            "p99": _percentile(latencies, 0.99),
+            "mean": statistics.mean(latencies),
+            "max": latencies[-1],
+        },
+        "throughput_per_s": len(latencies) / wall,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        args.output.write_text(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
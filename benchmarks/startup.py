@@ -0,0 +1,70 @@
+# benchmarks/startup.py
+"""
+Cold-start benchmark for the Gmail MCP server.
+
+Each run starts a fresh interpreter that imports the server module and
+constructs a GmailApiClient (with placeholder credentials, so no OAuth or
+Gmail traffic is involved) and reports how long that took. The script
+exits non-zero when the median exceeds the budget, so it can gate CI.
+
+Usage:
+    uv run python benchmarks/startup.py --runs 10 --budget-ms 1500
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Runs in the child interpreter; prints import and construction times in ms
+CHILD_SCRIPT = """
+import json, time
+start = time.perf_counter()
+from google.oauth2.credentials import Credentials
+from mcp_server.gmail import server
+imported = time.perf_counter()
+client = server.GmailApiClient(Credentials(token="placeholder"), pool_size=1)
+built = time.perf_counter()
+client.close()
+print(json.dumps({"import_ms": (imported - start) * 1000, "client_ms": (built - imported) * 1000}))
+"""
+
+
+def _run_once() -> dict:
+    """Starts one child interpreter and returns its timings."""
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+    )
+    # Logs go to stderr, so the timings are the last line of stdout
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["total_ms"] = timings["import_ms"] + timings["client_ms"]
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Number of cold starts to measure (default: 5)")
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="Median cold-start budget in ms (default: 1500)")
+    args = parser.parse_args()
+
+    runs = [_run_once() for _ in range(args.runs)]
+    report = {
+        "benchmark": "startup",
+        "runs": args.runs,
+        "budget_ms": args.budget_ms,
+    }
+    for key in ("import_ms", "client_ms", "total_ms"):
+        values = [run[key] for run in runs]
+        report[key] = {"median": statistics.median(values), "min": min(values), "max": max(values)}
+    report["within_budget"] = report["total_ms"]["median"] <= args.budget_ms
+
+    print(json.dumps(report, indent=2))
+    return 0 if report["within_budget"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+# src/mcp_server/gmail/accounts.py
+import asyncio
+import contextlib
+import logging
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from .mailbox import Mailbox
+from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_OPEN = 32
+# A Gmail address; also used as a file name, so no path separators or leading dots
+_ACCOUNT_PATTERN = re.compile(r"^[a-z0-9][a-z0-9._%+-]*@[a-z0-9][a-z0-9.-]*$")
+
+
+def normalize_account(account: str) -> str:
+    """
+    Returns the canonical (lower-case) form of an account address.
+
+    Raises:
+        ValueError: If account is not a plausible Gmail address.
+    """
+    normalized = account.strip().lower() if isinstance(account, str) else ""
+    if len(normalized) > 254 or not _ACCOUNT_PATTERN.match(normalized):
+        raise ValueError(f"Invalid account: {account!r} (expected a Gmail address)")
+    return normalized
+
+
+def account_token_file(accounts_dir: Path, account: str) -> Path:
+    """Returns where an account's OAuth token is stored."""
+    return accounts_dir / f"{normalize_account(account)}.json"
+
+
+@dataclass
+class _Entry:
+    mailbox: Mailbox
+    # Tool calls currently using the mailbox; only unused entries are evicted
+    leases: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class AccountPool:
+    """
+    Per-account mailboxes for one server process, opened on first use.
+
+    Each account gets its own credentials, client, quota limiter and
+    caches, built by open_mailbox the first time a tool call names it;
+    concurrent first calls share one open. Mailboxes no call is using are
+    closed least-recently-used first once more than max_open are open, and
+    after idle_timeout seconds without use.
+    """
+
+    def __init__(self, open_mailbox: Callable[[str], Awaitable[Mailbox]], max_open: int = DEFAULT_MAX_OPEN, idle_timeout: float = 0.0):
+        """
+        Args:
+            open_mailbox: Builds the mailbox for a normalized account address.
+            max_open: Open mailboxes kept before LRU eviction; calls in
+                progress can push the pool past it temporarily.
+            idle_timeout: Seconds after which an unused mailbox is closed (0 disables).
+
+        Raises:
+            ValueError: If max_open is less than 1.
+        """
+        if max_open < 1:
+            raise ValueError(f"max_open must be at least 1, got {max_open}.")
+        self.max_open = max_open
+        self.idle_timeout = idle_timeout
+        self._open_mailbox = open_mailbox
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._opening = SingleFlight()
+        self._sweeper: Optional[asyncio.Task] = None
+        self.opened = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def start(self) -> None:
+        """Starts closing idle mailboxes in the background, if idle_timeout is set."""
+        if self.idle_timeout > 0 and self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep(), name="gmail-account-sweeper")
+
+    async def acquire(self, account: str) -> Mailbox:
+        """
+        Returns the account's mailbox, opening it if needed; pair with release().
+
+        Raises:
+            ValueError: If the account address is invalid.
+            Exception: Whatever open_mailbox raises (e.g. the account is not authorized).
+        """
+        account = normalize_account(account)
+        entry = self._entries.get(account)
+        if entry is None:
+            mailbox = await self._opening.do(account, lambda: self._open_mailbox(account))
+            # Every caller that shared the open gets here; the first one registers it
+            entry = self._entries.get(account)
+            if entry is None:
+                entry = self._entries[account] = _Entry(mailbox)
+                self.opened += 1
+                logger.info("Opened account %s (%d open).", account, len(self._entries))
+        self._entries.move_to_end(account)
+        entry.leases += 1
+        try:
+            await self._evict()
+        except BaseException:
+            # Cancelled while closing another account; the caller won't release
+            self.release(account)
+            raise
+        return entry.mailbox
+
+    def release(self, account: str) -> None:
+        """Marks one acquire() of the account as finished."""
+        entry = self._entries.get(normalize_account(account))
+        if entry:
+            entry.leases -= 1
+            entry.last_used = time.monotonic()
+
+    def _victims(self) -> List[Tuple[str, str]]:
+        """Picks unused entries to close, least recently used first, with the reason."""
+        excess = len(self._entries) - self.max_open
+        now = time.monotonic()
+        victims = []
+        for account, entry in self._entries.items():
+            if entry.leases:
+                continue
+            if excess > 0:
+                victims.append((account, "over capacity"))
+                excess -= 1
+            elif self.idle_timeout > 0 and now - entry.last_used >= self.idle_timeout:
+                victims.append((account, "idle"))
+        return victims
+
+    async def _evict(self) -> None:
+        victims = self._victims()
+        # Unregister first, so callers arriving during close() open a fresh mailbox
+        entries = [(account, reason, self._entries.pop(account)) for account, reason in victims]
+        for account, reason, entry in entries:
+            self.evicted += 1
+            logger.info("Closing account %s (%s).", account, reason)
+            try:
+                await entry.mailbox.close()
+            except Exception as e:
+                logger.warning("Error closing account %s: %s", account, e)
+
+    async def _sweep(self) -> None:
+        while True:
+            await asyncio.sleep(self.idle_timeout / 2)
+            await self._evict()
+
+    async def close(self) -> None:
+        """Stops the sweeper and closes every mailbox."""
+        if self._sweeper:
+            self._sweeper.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._sweeper
+            self._sweeper = None
+        entries = list(self._entries.values())
+        self._entries.clear()
+        for entry in entries:
+            await entry.mailbox.close()
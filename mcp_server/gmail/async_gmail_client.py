@@ -0,0 +1,276 @@
+# src/mcp_server/gmail/async_gmail_client.py
+import asyncio
+import importlib.util
+import logging
+from typing import Optional, List, Dict, Any, AsyncIterator, Tuple
+
+import httplib2
+import httpx
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from googleapiclient.errors import HttpError
+
+from .gmail_client import (
+    MAX_PAGE_SIZE, METADATA_HEADERS, LIST_FIELDS, MESSAGE_FIELDS, PROFILE_FIELDS, HISTORY_FIELDS,
+    ListPosition, MessageIdPage, parse_message_details, slice_list_page,
+)
+from .cancellation import CancellationStats
+from .cassette import Cassette
+from .metrics import GMAIL_RETRIES, gmail_request
+from .rate_limit import QUOTA_UNITS, QuotaLimiter, is_throttle_error
+from .retry import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+GMAIL_API_ROOT = "https://gmail.googleapis.com/"
+# Requests are relative to the signed-in user's resources under the API root
+GMAIL_API_PATH = "gmail/v1/users/me/"
+DEFAULT_MAX_CONNECTIONS = 8
+# Request timeout (seconds) for the shared connection pool
+HTTP_TIMEOUT = 60.0
+# h2 comes with the httpx[http2] dependency; without it (a trimmed install) httpx falls back to HTTP/1.1
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def _to_http_error(response: httpx.Response) -> HttpError:
+    """Wraps a failed httpx response in the same HttpError the threaded client raises."""
+    resp = httplib2.Response({
+        **response.headers,
+        "status": str(response.status_code),
+        "reason": response.reason_phrase,
+    })
+    return HttpError(resp, response.content, uri=str(response.request.url))
+
+
+def _endpoint_name(path: str) -> str:
+    """Names a request path like the threaded client's method IDs, e.g. "messages/abc" -> "messages.get"."""
+    if path.startswith("messages/"):
+        return "messages.get"
+    return {"messages": "messages.list", "history": "history.list", "profile": "getProfile"}.get(path, path)
+
+
+class AsyncGmailApiClient:
+    """
+    Handles interactions with the Gmail API using native asyncio.
+
+    Mirrors the GmailApiClient surface, but every API method is a coroutine
+    that talks to the Gmail REST endpoints over one shared httpx connection
+    pool (multiplexed over HTTP/2 when available), with no thread hop per call.
+    """
+
+    def __init__(self, credentials: Credentials, max_connections: int = DEFAULT_MAX_CONNECTIONS, limiter: Optional[QuotaLimiter] = None, retry_policy: Optional[RetryPolicy] = None, api_root: Optional[str] = None, cassette: Optional[Cassette] = None):
+        """
+        Initializes the async Gmail API client.
+
+        Args:
+            credentials: Valid Google OAuth2 credentials.
+            max_connections: Maximum number of pooled connections to Gmail.
+            limiter: Optional quota limiter for this mailbox (see GmailApiClient);
+                get_messages_details_batch acquires it itself, once per message.
+            retry_policy: Backoff and retry budget for transient errors; defaults to RetryPolicy().
+            api_root: Optional root URL to send requests to instead of Gmail (see GmailApiClient).
+            cassette: Optional cassette to record traffic into or replay it from (see GmailApiClient).
+
+        Raises:
+            ValueError: If invalid or missing credentials are provided.
+        """
+        if not credentials or not credentials.valid:
+            raise ValueError("Invalid or missing credentials provided to AsyncGmailApiClient.")
+        self.limiter = limiter
+        self._retry = retry_policy if retry_policy is not None else RetryPolicy()
+        self._credentials = credentials
+        self._refresh_lock = asyncio.Lock()
+        # Requests aborted on the wire because their tool call was cancelled
+        self.cancellation = CancellationStats()
+        transport: httpx.AsyncBaseTransport = httpx.AsyncHTTPTransport(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        if cassette:
+            transport = cassette.async_transport(transport)
+        self._http = httpx.AsyncClient(
+            base_url=(api_root or GMAIL_API_ROOT).rstrip("/") + "/" + GMAIL_API_PATH,
+            transport=transport,
+            timeout=HTTP_TIMEOUT,
+        )
+        logger.info("Async Gmail API client ready (http2=%s, max_connections=%s).", HTTP2_AVAILABLE, max_connections)
+
+    async def _auth_headers(self) -> Dict[str, str]:
+        """Returns the Authorization header, refreshing the token once if it has expired."""
+        if not self._credentials.valid:
+            async with self._refresh_lock:
+                # Another caller may have refreshed while we waited for the lock
+                if not self._credentials.valid:
+                    logger.info("Access token expired, refreshing...")
+                    await asyncio.to_thread(self._credentials.refresh, Request())
+        return {"Authorization": f"Bearer {self._credentials.token}"}
+
+    def _note_failed_attempt(self, error: Exception) -> None:
+        """Reports a failed attempt that is about to be retried."""
+        if self.limiter and is_throttle_error(error):
+            self.limiter.on_throttle()
+
+    async def _get_once(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        with gmail_request(_endpoint_name(path)):
+            try:
+                response = await self._http.get(path, params=params, headers=await self._auth_headers())
+            except asyncio.CancelledError:
+                # httpx closes the connection, so the request really is abandoned
+                self.cancellation.record("aborted")
+                raise
+            if response.is_error:
+                raise _to_http_error(response)
+            return response.json()
+
+    async def _get(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Performs a GET against the Gmail API and decodes the JSON body,
+        retrying transient failures.
+
+        Raises:
+            HttpError: If Gmail answers with an error status.
+        """
+        params = {key: value for key, value in params.items() if value is not None}
+        endpoint = _endpoint_name(path)
+
+        def _on_retry(error: Exception) -> None:
+            GMAIL_RETRIES.inc(endpoint=endpoint)
+            self._note_failed_attempt(error)
+
+        return await self._retry.call_async(lambda: self._get_once(path, params), on_retry=_on_retry,
+                                            limiter=self.limiter, units=QUOTA_UNITS[f"users.{endpoint}"])
+
+    async def iter_message_id_pages(self, query: Optional[str] = None, label_ids: Optional[List[str]] = None, max_results: int = 10, start: Optional[ListPosition] = None) -> AsyncIterator[MessageIdPage]:
+        """
+        Lists message IDs matching the criteria, one API page at a time.
+
+        Async counterpart of GmailApiClient.iter_message_id_pages.
+
+        Raises:
+            HttpError: If an API call fails.
+        """
+        remaining = max_results
+        position = start or ListPosition()
+        while remaining > 0 and position is not None:
+            try:
+                response = await self._get("messages", {
+                    "q": query,
+                    "labelIds": label_ids,
+                    "maxResults": min(remaining + position.skip, MAX_PAGE_SIZE),
+                    "pageToken": position.page_token,
+                    "fields": LIST_FIELDS,
+                })
+            except HttpError as error:
+                logger.error("API Error listing messages: %s", error)
+                raise error
+
+            page = slice_list_page(response, position, remaining)
+            logger.debug("Fetched a page of %s message IDs.", len(page.messages))
+            yield page
+            remaining -= len(page.messages)
+            position = page.end
+
+    async def list_message_ids(self, query: Optional[str] = None, label_ids: Optional[List[str]] = None, max_results: int = 10) -> List[Dict[str, str]]:
+        """
+        Lists message IDs matching the criteria.
+
+        Async counterpart of GmailApiClient.list_message_ids.
+
+        Raises:
+            HttpError: If the API call fails.
+        """
+        logger.debug("Listing messages with query='%s', labels=%s, max_results=%s", query, label_ids, max_results)
+        messages = []
+        async for page in self.iter_message_id_pages(query=query, label_ids=label_ids, max_results=max_results):
+            messages.extend(page.messages)
+        logger.debug("Found %s message IDs.", len(messages))
+        return messages
+
+    async def get_history_id(self) -> str:
+        """Async counterpart of GmailApiClient.get_history_id."""
+        profile = await self._get("profile", {"fields": PROFILE_FIELDS})
+        return profile["historyId"]
+
+    async def list_history(self, start_history_id: str) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Async counterpart of GmailApiClient.list_history.
+
+        Raises:
+            HttpError: If the API call fails (404 when start_history_id is too old).
+        """
+        records: List[Dict[str, Any]] = []
+        page_token = None
+        while True:
+            response = await self._get("history", {
+                "startHistoryId": start_history_id,
+                "pageToken": page_token,
+                "fields": HISTORY_FIELDS,
+            })
+            records.extend(response.get("history", []))
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                logger.debug("Fetched %s history records since %s.", len(records), start_history_id)
+                return records, response["historyId"]
+
+    async def get_message_details(self, message_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Fetches and parses details for a specific message ID.
+
+        Async counterpart of GmailApiClient.get_message_details; returns None
+        if the message cannot be fetched or parsed.
+        """
+        return await self._get_message_details(message_id, paced=False)
+
+    async def _get_message_details(self, message_id: str, paced: bool) -> Optional[Dict[str, Any]]:
+        """
+        Implements get_message_details; with paced set, the messages.get holds
+        its own quota and concurrency slot, which also reports a 429 for it.
+        """
+        logger.debug("Fetching details for message ID: %s", message_id)
+        path = f"messages/{message_id}"
+        params = {
+            "format": "metadata",
+            "metadataHeaders": METADATA_HEADERS,
+            "fields": MESSAGE_FIELDS,
+        }
+        paced = paced and self.limiter is not None
+        try:
+            if paced:
+                async with self.limiter.slot(QUOTA_UNITS["users.messages.get"]):
+                    msg = await self._get(path, params)
+            else:
+                msg = await self._get(path, params)
+            details = parse_message_details(message_id, msg)
+            logger.debug("Successfully fetched details for message ID: %s", message_id)
+            return details
+        except HttpError as error:
+            logger.error("API Error fetching message %s: %s", message_id, error)
+            # The slot has already reported a paced throttle
+            if not paced and self.limiter and is_throttle_error(error):
+                self.limiter.on_throttle()
+            return None
+        except Exception as e:
+            # Transport errors (timeouts, resets) and parsing errors
+            logger.error("Unexpected error processing message %s: %s", message_id, e)
+            return None
+
+    async def get_messages_details_batch(self, message_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Fetches and parses details for many message IDs concurrently.
+
+        Instead of multipart batch requests, each messages.get is issued as
+        its own request over the shared pool; with HTTP/2 they are
+        multiplexed over the same connection. Unlike the other methods, this
+        one paces itself: each request takes its own slot from the limiter,
+        so callers must not hold one around it.
+
+        Returns:
+            A dictionary mapping each requested ID to its parsed details, or None.
+        """
+        unique_ids = list(dict.fromkeys(message_ids))
+        details = await asyncio.gather(*(self._get_message_details(message_id, paced=True) for message_id in unique_ids))
+        return dict(zip(unique_ids, details))
+
+    async def close(self) -> None:
+        """Closes the shared connection pool."""
+        await self._http.aclose()
@@ -0,0 +1,93 @@
+# src/mcp_server/gmail/batch_format.py
+import email.parser
+import json
+import random
+from typing import Any, Dict, List, Tuple, Union
+
+
+def _parse_multipart(content_type: str, body: Union[str, bytes]) -> List[Any]:
+    if isinstance(body, str):
+        body = body.encode()
+    envelope = email.parser.BytesParser().parsebytes(b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body)
+    if not envelope.is_multipart():
+        raise ValueError("Batch body is not multipart/mixed")
+    return envelope.get_payload()
+
+
+def _content_id(part) -> str:
+    # googleapiclient leaves a space in Content-ID so long values can be folded; unfold them
+    return " ".join(part.get("Content-ID", "").split()).strip("<>")
+
+
+def parse_batch_request(content_type: str, body: Union[str, bytes]) -> List[Tuple[str, str, str]]:
+    """
+    Splits a multipart/mixed batch request into its calls.
+
+    Returns:
+        (Content-ID without angle brackets, HTTP method, request target) per part, in order.
+
+    Raises:
+        ValueError: If the body is not multipart/mixed.
+    """
+    calls = []
+    for part in _parse_multipart(content_type, body):
+        request_line = part.get_payload().lstrip().split("\n", 1)[0].strip()
+        method, target, _ = request_line.split(" ", 2)
+        calls.append((_content_id(part), method, target))
+    return calls
+
+
+def parse_batch_response(content_type: str, body: Union[str, bytes]) -> List[Tuple[str, int, Any]]:
+    """
+    Splits a multipart/mixed batch response into its answers.
+
+    Returns:
+        (Content-ID without angle brackets, HTTP status, decoded JSON body or None) per part.
+
+    Raises:
+        ValueError: If the body is not multipart/mixed.
+    """
+    answers = []
+    for part in _parse_multipart(content_type, body):
+        payload = part.get_payload()
+        status_line, _, rest = payload.partition("\n")
+        content = rest.split("\r\n\r\n", 1)[1] if "\r\n\r\n" in rest else rest.split("\n\n", 1)[-1]
+        try:
+            decoded = json.loads(content) if content.strip() else None
+        except ValueError:
+            decoded = None
+        answers.append((_content_id(part), int(status_line.split(" ", 2)[1]), decoded))
+    return answers
+
+
+def build_batch_response(answers: List[Tuple[str, int, Any]]) -> Tuple[str, bytes]:
+    """
+    Renders answers as a multipart/mixed batch response, the way Gmail does.
+
+    Args:
+        answers: (request Content-ID without angle brackets, HTTP status, JSON body) per part.
+
+    Returns:
+        (Content-Type header, body).
+    """
+    boundary = f"batch_{random.getrandbits(64):016x}"
+    chunks = []
+    for content_id, status, answer in answers:
+        chunks.append(
+            f"--{boundary}\r\nContent-Type: application/http\r\n"
+            f"Content-ID: <response-{content_id}>\r\n\r\n"
+            f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}\r\n"
+            f"Content-Type: application/json; charset=UTF-8\r\n\r\n"
+            f"{json.dumps(answer)}\r\n"
+        )
+    chunks.append(f"--{boundary}--\r\n")
+    return f"multipart/mixed; boundary={boundary}", "".join(chunks).encode()
+
+
+def gmail_error_body(status: int, reason: str, message: str) -> Dict[str, Any]:
+    """Returns a Gmail-style JSON error body."""
+    return {"error": {
+        "code": status,
+        "message": message,
+        "errors": [{"message": message, "domain": "global", "reason": reason}],
+    }}
@@ -0,0 +1,94 @@
+# src/mcp_server/gmail/cancellation.py
+import threading
+from typing import Any, Callable, Optional
+
+
+class CallCancelled(Exception):
+    """Raised on a worker thread when the call it is serving has been cancelled."""
+
+
+class CancelToken:
+    """
+    Tells a blocking call running on a worker thread to stop.
+
+    A thread cannot be interrupted mid-request, so the call checks its
+    token at checkpoints instead: between batch requests, and while
+    sleeping before a retry (which the token cuts short).
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        """Asks the call to stop at its next checkpoint."""
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self) -> None:
+        """
+        Raises:
+            CallCancelled: If the call has been cancelled.
+        """
+        if self._event.is_set():
+            raise CallCancelled()
+
+    def sleep(self, seconds: float) -> None:
+        """
+        Sleeps for seconds, waking up early if the call is cancelled.
+
+        Raises:
+            CallCancelled: If the call is cancelled before or during the sleep.
+        """
+        if self._event.wait(seconds):
+            raise CallCancelled()
+
+
+_NEVER_CANCELLED = CancelToken()
+_local = threading.local()
+
+
+def current_token() -> CancelToken:
+    """Returns the token of the call the current thread is serving (one that never fires outside run_with_token)."""
+    return getattr(_local, "token", None) or _NEVER_CANCELLED
+
+
+def run_with_token(token: CancelToken, func: Callable[[], Any]) -> Any:
+    """Runs func on the current thread with token as its current_token()."""
+    _local.token = token
+    try:
+        return func()
+    finally:
+        _local.token = None
+
+
+class CancellationStats:
+    """
+    Counts Gmail work belonging to tool calls that were cancelled.
+
+    dropped: calls that were still queued and never started.
+    aborted: calls that were running and stopped early.
+    wasted: calls that were running and completed anyway; their results were discarded.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self.aborted = 0
+        self.wasted = 0
+
+    def record(self, outcome: str) -> None:
+        """Increments one counter ("dropped", "aborted" or "wasted"); safe to call from any thread."""
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def record_abandoned(self, error: Optional[BaseException]) -> None:
+        """Records how a call that was running when it was cancelled ended."""
+        self.record("aborted" if isinstance(error, CallCancelled) else "wasted")
+
+    def stats(self) -> dict:
+        """Returns the counters."""
+        with self._lock:
+            return {"dropped": self.dropped, "aborted": self.aborted, "wasted": self.wasted}
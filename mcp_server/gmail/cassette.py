@@ -0,0 +1,355 @@
+# src/mcp_server/gmail/cassette.py
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Mapping, Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import httplib2
+import httpx
+
+from .batch_format import build_batch_response, gmail_error_body, parse_batch_request, parse_batch_response
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_VERSION = 1
+# Query parameters that don't change Gmail's answer (googleapiclient adds alt=json, httpx doesn't)
+IGNORED_PARAMS = {"alt", "prettyPrint"}
+# Credentials a client may pass as query parameters instead of a header; never stored
+CREDENTIAL_PARAMS = {"access_token", "oauth_token", "key"}
+# Response fields holding message content or addresses; replaced by same-length placeholders
+REDACTED_FIELDS = {"snippet", "data", "raw", "emailAddress"}
+REDACTED_QUERY_PREFIX = "redacted:"
+# Response headers kept in the cassette (Retry-After drives backoff on replay)
+KEPT_HEADERS = ("content-type", "retry-after")
+# Headers that no longer describe a body once it has been decoded and re-sent
+_ENCODING_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+Headers = Mapping[str, str]
+Body = Union[str, bytes, None]
+
+
+def redact_query(query: str) -> str:
+    """Replaces a Gmail search query with a stable digest; redacted queries are returned unchanged."""
+    if query.startswith(REDACTED_QUERY_PREFIX):
+        return query
+    return REDACTED_QUERY_PREFIX + hashlib.sha256(query.encode()).hexdigest()[:16]
+
+
+def redact_account(account: str) -> str:
+    """Replaces an account address with a stable placeholder address; placeholders are returned unchanged."""
+    if account.endswith("@redacted.invalid"):
+        return account
+    return f"{hashlib.sha256(account.strip().lower().encode()).hexdigest()[:16]}@redacted.invalid"
+
+
+def _blank(value: str) -> str:
+    # Same length, so replayed responses are as large as the recorded ones
+    return "x" * len(value)
+
+
+def redact_body(value: Any) -> Any:
+    """Blanks message content in a decoded Gmail response, keeping IDs, labels, cursors and sizes."""
+    if isinstance(value, list):
+        return [redact_body(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "name" in value and isinstance(value.get("value"), str):
+        # A message header: keep its name, blank its value
+        return {**value, "value": _blank(value["value"])}
+    return {
+        key: _blank(item) if key in REDACTED_FIELDS and isinstance(item, str) else redact_body(item)
+        for key, item in value.items()
+    }
+
+
+def request_key(method: str, uri: str) -> str:
+    """
+    Identifies a request independently of the client that made it.
+
+    Parameters are sorted, and ones that don't affect the answer are
+    dropped, as are credentials. Search queries are redacted, so recorded
+    and replayed requests match without the query text ever being stored.
+    """
+    url = urlsplit(uri)
+    params = sorted(
+        (name, redact_query(value) if name == "q" else value)
+        for name, value in parse_qsl(url.query, keep_blank_values=True)
+        if name not in IGNORED_PARAMS and name not in CREDENTIAL_PARAMS
+    )
+    return f"{method} {url.path}" + (f"?{urlencode(params)}" if params else "")
+
+
+def _is_batch(key: str) -> bool:
+    return key.startswith("POST /batch")
+
+
+def _header(headers: Headers, name: str) -> Optional[str]:
+    return next((value for key, value in headers.items() if key.lower() == name), None)
+
+
+def _decode(content: bytes) -> Any:
+    try:
+        return json.loads(content) if content else None
+    except ValueError:
+        # Not JSON (e.g. an HTML error page from a proxy); nothing worth keeping
+        return None
+
+
+class Cassette:
+    """
+    Gmail HTTP exchanges recorded to, or replayed from, a gzipped JSON-lines file.
+
+    Recording keeps each exchange's timing, status and redacted JSON body
+    (message content, addresses, search queries and credentials never reach
+    the disk), plus the tool calls that caused them. Replay answers each
+    request with the next recorded answer for the same request key, after
+    the recorded duration multiplied by time_scale. The last answer for a
+    key is reused once the others are used up.
+    """
+
+    def __init__(self, path: Path, mode: str = "replay", time_scale: float = 1.0):
+        """
+        Args:
+            path: The cassette file.
+            mode: "record" (the file is overwritten) or "replay".
+            time_scale: Replay only; 1.0 keeps the recorded latencies, 0.1 replays
+                them ten times faster and 0 answers immediately.
+
+        Raises:
+            ValueError: If mode is unknown or the file is not a cassette.
+            OSError: If the file cannot be opened.
+        """
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode '{mode}' (expected 'record' or 'replay').")
+        self.path = Path(path)
+        self.mode = mode
+        self.time_scale = time_scale
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._file = None
+        # Recorded tool calls, oldest first: {"t": seconds since recording started, "tool": ..., "args": ...}
+        self.tool_calls: List[Dict[str, Any]] = []
+        self._answers: Dict[str, Deque[Dict[str, Any]]] = {}
+        # Replayed requests with no recorded answer
+        self.misses = 0
+        if mode == "record":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = gzip.open(self.path, "wt", encoding="utf-8")
+            self._write({"version": CASSETTE_VERSION, "recorded_at": datetime.now(timezone.utc).isoformat()})
+            logger.info("Recording Gmail traffic to %s", self.path)
+        else:
+            self._load()
+            logger.info("Replaying %s Gmail answers and %s tool calls from %s (time scale %s)",
+                        sum(len(answers) for answers in self._answers.values()), len(self.tool_calls), self.path, time_scale)
+
+    def close(self) -> None:
+        """Finishes writing a recording."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # --- Recording ---
+    def _write(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            # Calls still finishing after close() are dropped
+            if self._file is not None:
+                self._file.write(line)
+
+    def _now(self) -> float:
+        return round(time.monotonic() - self._started, 6)
+
+    def record_tool_call(self, name: str, arguments: Dict[str, Any]) -> None:
+        """
+        Records a tool call, with its query redacted.
+
+        Cursors are dropped: they embed the query in the clear, so a replayed
+        call starts from the first page instead. So is debug_profile, so a
+        replay does not write profiles. Account addresses become stable
+        placeholders, which keeps calls to different mailboxes apart.
+        """
+        arguments = {key: value for key, value in arguments.items() if key not in ("cursor", "debug_profile")}
+        if isinstance(arguments.get("query"), str):
+            arguments["query"] = redact_query(arguments["query"])
+        if isinstance(arguments.get("account"), str):
+            arguments["account"] = redact_account(arguments["account"])
+        self._write({"t": self._now(), "tool": name, "args": arguments})
+
+    def record_http(self, method: str, uri: str, request_headers: Headers, request_body: Body, started: float, duration: float, status: int, response_headers: Headers, content: bytes) -> None:
+        """Records one HTTP exchange; batch requests are recorded part by part."""
+        key = request_key(method, uri)
+        entry: Dict[str, Any] = {
+            "t": round(started - self._started, 6),
+            "d": round(duration, 6),
+            "k": key,
+            "s": status,
+            "h": {name: value for name in KEPT_HEADERS if (value := _header(response_headers, name)) is not None},
+        }
+        if _is_batch(key) and status < 300:
+            try:
+                calls = {content_id: request_key(part_method, target) for content_id, part_method, target
+                         in parse_batch_request(_header(request_headers, "content-type") or "", request_body or b"")}
+                entry["parts"] = [
+                    {"k": calls.get(content_id.removeprefix("response-"), ""), "d": entry["d"], "s": part_status, "b": redact_body(body)}
+                    for content_id, part_status, body in parse_batch_response(entry["h"].get("content-type", ""), content)
+                ]
+            except ValueError as e:
+                logger.warning("Could not record batch exchange %s: %s", key, e)
+                return
+        else:
+            entry["b"] = redact_body(_decode(content))
+        self._write(entry)
+
+    # --- Replay ---
+    def _load(self) -> None:
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline() or "{}")
+            if header.get("version") != CASSETTE_VERSION:
+                raise ValueError(f"{self.path} is not a version {CASSETTE_VERSION} cassette.")
+            for line in f:
+                entry = json.loads(line)
+                if "tool" in entry:
+                    self.tool_calls.append(entry)
+                    continue
+                self._answers.setdefault(entry["k"], deque()).append(entry)
+                for part in entry.get("parts", ()):
+                    self._answers.setdefault(part["k"], deque()).append(part)
+
+    def _next_answer(self, key: str, count_miss: bool = True) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            answers = self._answers.get(key)
+            if not answers:
+                self.misses += count_miss
+                return None
+            return answers.popleft() if len(answers) > 1 else answers[0]
+
+    def _not_recorded(self, key: str) -> Tuple[int, Dict[str, Any]]:
+        logger.warning("No recorded answer for %s", key)
+        return 404, gmail_error_body(404, "notFound", f"No recorded answer for {key}")
+
+    def answer(self, method: str, uri: str, request_headers: Headers, request_body: Body) -> Tuple[float, int, Dict[str, str], bytes]:
+        """
+        Looks up the recorded answer to a request.
+
+        Unrecorded requests are answered 404, and counted in misses.
+
+        Returns:
+            (seconds to wait before answering, status, headers, body).
+        """
+        key = request_key(method, uri)
+        if _is_batch(key):
+            return self._answer_batch(key, request_headers, request_body)
+        entry = self._next_answer(key)
+        if entry is None:
+            status, body = self._not_recorded(key)
+            return 0.0, status, {"content-type": "application/json"}, json.dumps(body).encode()
+        content = json.dumps(entry["b"]).encode() if entry.get("b") is not None else b""
+        # Batch parts have no headers of their own
+        return entry["d"] * self.time_scale, entry["s"], {"content-type": "application/json", **entry.get("h", {})}, content
+
+    def _answer_batch(self, key: str, request_headers: Headers, request_body: Body) -> Tuple[float, int, Dict[str, str], bytes]:
+        """
+        Answers a batch request part by part.
+
+        A cassette recorded by the async client has no batch envelopes, only
+        the individual calls; the batch then takes as long as its slowest call.
+        """
+        envelope = self._next_answer(key, count_miss=False)
+        if envelope is not None and envelope["s"] >= 300:
+            # The whole batch was rejected when it was recorded
+            return (envelope["d"] * self.time_scale, envelope["s"], {"content-type": "application/json", **envelope["h"]},
+                    json.dumps(envelope.get("b")).encode())
+        answers, durations = [], []
+        for content_id, method, target in parse_batch_request(_header(request_headers, "content-type") or "", request_body or b""):
+            part_key = request_key(method, target)
+            part = self._next_answer(part_key)
+            if part is None:
+                answers.append((content_id, *self._not_recorded(part_key)))
+            else:
+                answers.append((content_id, part["s"], part["b"]))
+                durations.append(part["d"])
+        duration = envelope["d"] if envelope is not None else max(durations, default=0.0)
+        content_type, content = build_batch_response(answers)
+        return duration * self.time_scale, 200, {"content-type": content_type}, content
+
+    # --- Transports ---
+    def http(self, timeout: Optional[float] = None) -> httplib2.Http:
+        """Returns an httplib2 transport for GmailApiClient that records into or replays from this cassette."""
+        return (RecordingHttp if self.mode == "record" else ReplayHttp)(self, timeout=timeout)
+
+    def async_transport(self, transport: httpx.AsyncBaseTransport) -> httpx.AsyncBaseTransport:
+        """Wraps (when recording) or replaces (when replaying) an httpx transport for AsyncGmailApiClient."""
+        return RecordingTransport(self, transport) if self.mode == "record" else ReplayTransport(self)
+
+
+class RecordingHttp(httplib2.Http):
+    """An httplib2.Http that records every exchange into a cassette."""
+
+    def __init__(self, cassette: Cassette, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._cassette = cassette
+
+    def request(self, uri, method="GET", body=None, headers=None, *args, **kwargs):
+        started = time.monotonic()
+        response, content = super().request(uri, method, body, headers, *args, **kwargs)
+        self._cassette.record_http(method, uri, headers or {}, body, started, time.monotonic() - started,
+                                   response.status, response, content)
+        return response, content
+
+
+class ReplayHttp(httplib2.Http):
+    """An httplib2.Http that answers from a cassette without touching the network."""
+
+    def __init__(self, cassette: Cassette, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._cassette = cassette
+
+    def request(self, uri, method="GET", body=None, headers=None, *args, **kwargs):
+        delay, status, response_headers, content = self._cassette.answer(method, uri, headers or {}, body)
+        time.sleep(delay)
+        return httplib2.Response({"status": str(status), **response_headers}), content
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """An httpx transport that records every exchange made through the wrapped one."""
+
+    def __init__(self, cassette: Cassette, transport: httpx.AsyncBaseTransport):
+        self._cassette = cassette
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.monotonic()
+        response = await self._transport.handle_async_request(request)
+        try:
+            content = await response.aread()
+        finally:
+            await response.aclose()
+        self._cassette.record_http(request.method, str(request.url), request.headers, request.content,
+                                   started, time.monotonic() - started, response.status_code, response.headers, content)
+        # The body has been decoded, so it is re-sent without its transfer encoding
+        headers = [(name, value) for name, value in response.headers.items() if name.lower() not in _ENCODING_HEADERS]
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """An httpx transport that answers from a cassette without touching the network."""
+
+    def __init__(self, cassette: Cassette):
+        self._cassette = cassette
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        delay, status, headers, content = self._cassette.answer(request.method, str(request.url), request.headers, request.content)
+        await asyncio.sleep(delay)
+        return httpx.Response(status, headers=headers, content=content, request=request)
@@ -0,0 +1,200 @@
+# src/mcp_server/gmail/credential_manager.py
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from google.auth import _helpers
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+
+from .metrics import TOKEN_REFRESHES
+
+logger = logging.getLogger(__name__)
+
+# Refresh this many seconds before the access token expires
+DEFAULT_REFRESH_MARGIN = 600.0
+# google-auth treats a token as expired this early, and then refreshes it inside the request
+_LIBRARY_THRESHOLD = _helpers.REFRESH_THRESHOLD.total_seconds()
+# Background retry delays after a failed refresh (exponential, capped)
+RETRY_DELAY = 5.0
+MAX_RETRY_DELAY = 120.0
+
+
+def save_credentials(credentials: Credentials, path: Path) -> None:
+    """
+    Writes credentials to a token file atomically.
+
+    The JSON goes to a private temporary file in the same directory, which
+    then replaces the target, so a crash or a concurrent reader never sees
+    a truncated token file.
+
+    Raises:
+        OSError: If the file cannot be written.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # mkstemp creates the file readable by the owner only
+    fd, temporary = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(credentials.to_json())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(temporary)
+        raise
+
+
+class ManagedCredentials(Credentials):
+    """
+    User credentials whose refreshes are single-flight and persisted.
+
+    googleapiclient, google-auth-httplib2 and the async client all call
+    refresh() directly, from any thread, when they find the token stale or
+    get a 401. Callers that arrive while a refresh is running wait for it and
+    reuse its token instead of starting their own.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Where refreshed tokens are saved, if anywhere
+        self.token_file: Optional[Path] = None
+        self._flight = threading.Lock()
+        self._generation = 0
+
+    @classmethod
+    def wrap(cls, credentials: Credentials, token_file: Optional[Path] = None) -> "ManagedCredentials":
+        """
+        Returns managed credentials holding the same tokens.
+
+        Raises:
+            ValueError: If the credentials have no refresh token or client secrets.
+        """
+        managed = cls.from_authorized_user_info(json.loads(credentials.to_json()))
+        managed.token_file = token_file
+        return managed
+
+    def refresh(self, request, trigger: str = "request") -> None:
+        """
+        Refreshes the access token, or waits for the refresh already running.
+
+        Args:
+            request: A google.auth transport request.
+            trigger: Metric label: "request" when a caller found the token
+                stale, "background" for CredentialManager's early refresh.
+
+        Raises:
+            google.auth.exceptions.RefreshError: If Google rejects the refresh.
+        """
+        generation = self._generation
+        with self._flight:
+            if self._generation != generation:
+                # Refreshed while we waited
+                return
+            started = time.perf_counter()
+            try:
+                super().refresh(request)
+            except Exception:
+                TOKEN_REFRESHES.inc(trigger=trigger, outcome="error")
+                raise
+            self._generation += 1
+            TOKEN_REFRESHES.inc(trigger=trigger, outcome="ok")
+            logger.info("Access token refreshed (%s) in %.0f ms; valid until %s UTC.",
+                        trigger, (time.perf_counter() - started) * 1000, self.expiry)
+            if self.token_file:
+                try:
+                    save_credentials(self, self.token_file)
+                except OSError as e:
+                    # The new token is still usable from memory
+                    logger.error("Error saving token file %s: %s", self.token_file, e)
+
+
+class CredentialManager:
+    """
+    Refreshes OAuth credentials ahead of expiry from a background task.
+
+    The token is renewed `margin` seconds before it expires, well before
+    google-auth would consider it stale, so tool calls keep using a valid
+    token and never wait on the token endpoint. Failed refreshes are retried
+    with backoff; if they keep failing until the token goes stale, requests
+    fall back to refreshing it themselves (still single-flight).
+    """
+
+    def __init__(self, credentials: Credentials, token_file: Optional[Path] = None, margin: float = DEFAULT_REFRESH_MARGIN):
+        """
+        Args:
+            credentials: Valid user credentials with a refresh token.
+            token_file: Where refreshed tokens are saved, if anywhere.
+            margin: Seconds before expiry to refresh. Raised to just past
+                google-auth's own early-expiry window if set below it.
+
+        Raises:
+            ValueError: If the credentials have no refresh token or client secrets.
+        """
+        self.credentials = ManagedCredentials.wrap(credentials, token_file)
+        if margin <= _LIBRARY_THRESHOLD:
+            logger.warning("Token refresh margin %.0fs is inside google-auth's %.0fs expiry window; using %.0fs.",
+                           margin, _LIBRARY_THRESHOLD, _LIBRARY_THRESHOLD + RETRY_DELAY)
+            margin = _LIBRARY_THRESHOLD + RETRY_DELAY
+        self.margin = margin
+        self._task: Optional[asyncio.Task] = None
+
+    def seconds_until_refresh(self) -> Optional[float]:
+        """Seconds until the next background refresh is due (<= 0: now); None if the token never expires."""
+        expiry = self.credentials.expiry
+        if expiry is None:
+            return None
+        # expiry is a naive UTC datetime
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return (expiry - now).total_seconds() - self.margin
+
+    def start(self) -> None:
+        """Starts the background refresh task on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="gmail-token-refresh")
+
+    async def close(self) -> None:
+        """Stops the background refresh task."""
+        if self._task:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        failures = 0
+        refreshed = False
+        while True:
+            delay = self.seconds_until_refresh()
+            if delay is None:
+                logger.info("Access token has no expiry; background refresh stopped.")
+                return
+            if refreshed and delay <= 0:
+                # Google issued a token shorter-lived than the margin; refresh it halfway to
+                # google-auth's threshold rather than spinning on the token endpoint
+                delay = max(RETRY_DELAY, (delay + self.margin - _LIBRARY_THRESHOLD) / 2)
+            if delay > 0:
+                logger.debug("Next background token refresh in %.0fs.", delay)
+                await asyncio.sleep(delay)
+                refreshed = False
+                # A request may have refreshed the token meanwhile; re-check
+                continue
+            try:
+                await asyncio.to_thread(self.credentials.refresh, Request(), "background")
+            except Exception as e:
+                failures += 1
+                retry_in = min(MAX_RETRY_DELAY, RETRY_DELAY * 2 ** (failures - 1))
+                logger.warning("Background token refresh failed (attempt %d), retrying in %.0fs: %s", failures, retry_in, e)
+                await asyncio.sleep(retry_in)
+                continue
+            failures = 0
+            refreshed = True
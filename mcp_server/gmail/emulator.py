@@ -0,0 +1,701 @@
+# src/mcp_server/gmail/emulator.py
+"""
+A local stand-in for the Gmail REST API, for offline benchmarks and load tests.
+
+Serves users.messages.list/get, users.history.list, users.getProfile,
+users.labels.list/get and multipart batch requests over a synthetic
+mailbox. Latency, jitter and 429/5xx responses can be injected. Quota units
+are charged like Gmail charges them, and GET /emulator/stats reports them.
+
+Point the server at it with GMAIL_API_ROOT (OAuth is skipped), or pass
+api_root to GmailApiClient / AsyncGmailApiClient.
+
+Usage:
+    uv run python -m mcp_server.gmail.emulator --messages 5000 --port 8025 --latency-ms 40 --jitter-ms 20
+    GMAIL_API_ROOT=http://127.0.0.1:8025/ uv run gmail-server
+"""
+import argparse
+import base64
+import email.utils
+import json
+import logging
+import random
+import re
+import signal
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from .batch_format import build_batch_response, gmail_error_body, parse_batch_request
+from .logging_config import configure_logging
+from .rate_limit import QUOTA_UNITS
+
+# Named explicitly: under `python -m`, __name__ is "__main__", outside the package logger
+logger = logging.getLogger("mcp_server.gmail.emulator")
+
+API_PREFIX = "/gmail/v1/users/"
+# googleapiclient posts batches to the discovery document's batchPath; Gmail also accepts the per-API path
+BATCH_PATHS = {"/batch", "/batch/gmail/v1"}
+# Gmail rejects batches with more parts than this
+MAX_BATCH_PARTS = 100
+MAX_LIST_RESULTS = 500
+DEFAULT_LIST_RESULTS = 100
+EMAIL_ADDRESS = "emulator@example.com"
+# Quota units per call, as Gmail charges them (labels calls cost 1 unit)
+EMULATOR_QUOTA_UNITS = {**QUOTA_UNITS, "users.labels.list": 1, "users.labels.get": 1}
+
+SYSTEM_LABELS = ["INBOX", "SENT", "UNREAD", "STARRED", "IMPORTANT",
+                 "CATEGORY_PERSONAL", "CATEGORY_SOCIAL", "CATEGORY_PROMOTIONS", "CATEGORY_UPDATES"]
+_SENDERS = ["Ada Lovelace", "Alan Turing", "Grace Hopper", "Edsger Dijkstra", "Barbara Liskov",
+            "Donald Knuth", "Margaret Hamilton", "Ken Thompson", "Frances Allen", "John McCarthy"]
+_DOMAINS = ["example.com", "example.org", "mail.example.net", "lists.example.com"]
+_WORDS = ["quarterly", "report", "invoice", "meeting", "update", "review", "release", "notes", "budget",
+          "travel", "schedule", "draft", "proposal", "reminder", "weekly", "digest", "launch", "offer"]
+_QUERY_TERM = re.compile(r'(-?)(?:(\w+):)?("[^"]*"|\S+)')
+_FIELD_PATH = re.compile(r"[\w*]+(?:/[\w*]+)*")
+
+
+class GmailApiError(Exception):
+    """An error answer, rendered in Gmail's JSON error format."""
+
+    def __init__(self, status: int, reason: str, message: str):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+        self.message = message
+
+    def body(self) -> Dict[str, Any]:
+        return gmail_error_body(self.status, self.reason, self.message)
+
+
+# --- Partial responses ---
+def parse_fields(mask: str) -> Dict[str, Any]:
+    """
+    Parses a `fields=` mask such as "messages/id,payload/headers(name,value)".
+
+    Returns:
+        A tree of selected keys; a leaf (None) selects the whole value.
+
+    Raises:
+        GmailApiError: If the mask is malformed.
+    """
+    mask = mask.replace(" ", "")
+    tree, position = _parse_field_list(mask, 0)
+    if position != len(mask):
+        raise _invalid_fields(mask)
+    return tree
+
+
+def _invalid_fields(mask: str) -> GmailApiError:
+    return GmailApiError(400, "invalidParameter", f"Invalid field selection {mask}")
+
+
+def _parse_field_list(mask: str, position: int) -> Tuple[Dict[str, Any], int]:
+    tree: Dict[str, Any] = {}
+    while True:
+        match = _FIELD_PATH.match(mask, position)
+        if not match:
+            raise _invalid_fields(mask)
+        position = match.end()
+        subtree = None
+        if mask.startswith("(", position):
+            subtree, position = _parse_field_list(mask, position + 1)
+            if not mask.startswith(")", position):
+                raise _invalid_fields(mask)
+            position += 1
+        names = match.group().split("/")
+        for name in reversed(names[1:]):
+            subtree = {name: subtree}
+        _merge_fields(tree, names[0], subtree)
+        if not mask.startswith(",", position):
+            return tree, position
+        position += 1
+
+
+def _merge_fields(tree: Dict[str, Any], name: str, subtree: Optional[Dict[str, Any]]) -> None:
+    if name not in tree:
+        tree[name] = subtree
+    elif tree[name] is None or subtree is None:
+        # Selecting a key outright wins over selecting parts of it
+        tree[name] = None
+    else:
+        for key, value in subtree.items():
+            _merge_fields(tree[name], key, value)
+
+
+def apply_fields(value: Any, tree: Optional[Dict[str, Any]]) -> Any:
+    """Keeps only the parts of a response selected by a parse_fields tree."""
+    if tree is None or "*" in tree:
+        return value
+    if isinstance(value, list):
+        return [apply_fields(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {key: apply_fields(value[key], subtree) for key, subtree in tree.items() if key in value}
+
+
+# --- Synthetic mailbox ---
+@dataclass
+class SyntheticMessage:
+    id: str
+    thread_id: str
+    label_ids: Set[str]
+    # Milliseconds since the epoch, as Gmail's internalDate
+    internal_date: int
+    headers: Dict[str, str]
+    snippet: str
+    body: str
+
+    def matches(self, terms: List[Tuple[bool, Optional[str], str]]) -> bool:
+        return all(self._matches_term(operator, value) != negated for negated, operator, value in terms)
+
+    def _matches_term(self, operator: Optional[str], value: str) -> bool:
+        value = value.lower()
+        if operator == "is":
+            return {"read": "UNREAD" not in self.label_ids}.get(value, value.upper() in self.label_ids)
+        if operator in ("in", "label"):
+            return value == "anywhere" or value.upper().replace("-", "_") in self.label_ids
+        if operator == "category":
+            return f"CATEGORY_{value.upper()}" in self.label_ids
+        if operator in ("from", "to", "subject"):
+            return value in self.headers[operator.capitalize()].lower()
+        text = " ".join((self.headers["Subject"], self.headers["From"], self.snippet)).lower()
+        return f"{operator}:{value}" in text if operator else value in text
+
+    def resource(self, message_format: str, metadata_headers: Iterable[str], history_id: int) -> Dict[str, Any]:
+        """Renders the message as a messages.get response in the given format."""
+        resource = {
+            "id": self.id,
+            "threadId": self.thread_id,
+            "labelIds": sorted(self.label_ids),
+            "snippet": self.snippet,
+            "sizeEstimate": len(self.body) + 64 * len(self.headers),
+            "historyId": str(history_id),
+            "internalDate": str(self.internal_date),
+        }
+        if message_format == "minimal":
+            return resource
+        if message_format == "metadata":
+            wanted = {name.lower() for name in metadata_headers}
+            headers = [{"name": name, "value": value} for name, value in self.headers.items()
+                       if not wanted or name.lower() in wanted]
+            return {**resource, "payload": {"mimeType": "text/plain", "headers": headers}}
+        if message_format == "full":
+            data = base64.urlsafe_b64encode(self.body.encode()).decode()
+            headers = [{"name": name, "value": value} for name, value in self.headers.items()]
+            return {**resource, "payload": {"mimeType": "text/plain", "headers": headers,
+                                            "body": {"size": len(self.body), "data": data}}}
+        raise GmailApiError(400, "invalidArgument", f"Unsupported format: {message_format}")
+
+
+class SyntheticMailbox:
+    """
+    A generated mailbox that records changes as Gmail history records.
+
+    Contents are derived from the seed, so two mailboxes built with the
+    same arguments are identical. Methods are thread-safe.
+    """
+
+    def __init__(self, size: int = 1000, unread_ratio: float = 0.2, seed: int = 0):
+        """
+        Args:
+            size: Number of messages to generate.
+            unread_ratio: Fraction of generated messages labelled UNREAD.
+            seed: Seed for the generator.
+        """
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._unread_ratio = unread_ratio
+        # Newest first, like messages.list
+        self._order: List[str] = []
+        self._messages: Dict[str, SyntheticMessage] = {}
+        self._history: List[Dict[str, Any]] = []
+        self.history_id = 100_000
+        # Oldest checkpoint history.list can still answer from; older ones get a 404
+        self._history_floor = self.history_id
+        now = int(time.time() * 1000)
+        for index in range(size):
+            self._add(self._generate(now - index * 600_000), newest=False)
+
+    def _generate(self, internal_date: int) -> SyntheticMessage:
+        rng = self._rng
+        name = rng.choice(_SENDERS)
+        address = f"{name.split()[0].lower()}@{rng.choice(_DOMAINS)}"
+        subject = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(2, 6))).capitalize()
+        body = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(20, 400)))
+        labels = {"INBOX", rng.choice(SYSTEM_LABELS[5:])}
+        if rng.random() < self._unread_ratio:
+            labels.add("UNREAD")
+        if rng.random() < 0.05:
+            labels.add("STARRED")
+        if rng.random() < 0.2:
+            labels.add("IMPORTANT")
+        message_id = format(rng.getrandbits(64), "016x")
+        thread_id = message_id
+        if self._order and rng.random() < 0.3:
+            # Some messages are replies in an existing thread
+            thread_id = self._messages[rng.choice(self._order)].thread_id
+        return SyntheticMessage(
+            id=message_id,
+            thread_id=thread_id,
+            label_ids=labels,
+            internal_date=internal_date,
+            headers={
+                "From": f"{name} <{address}>",
+                "To": EMAIL_ADDRESS,
+                "Subject": subject,
+                "Date": email.utils.formatdate(internal_date / 1000),
+            },
+            snippet=body[:140],
+            body=body,
+        )
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def _add(self, message: SyntheticMessage, newest: bool = True) -> None:
+        self._messages[message.id] = message
+        if newest:
+            self._order.insert(0, message.id)
+        else:
+            self._order.append(message.id)
+
+    def _record(self, change: str, message: SyntheticMessage, label_ids: Iterable[str] = ()) -> None:
+        self.history_id += 1
+        ref = {"id": message.id, "threadId": message.thread_id, "labelIds": sorted(message.label_ids)}
+        entry = {"message": ref}
+        if label_ids:
+            entry["labelIds"] = sorted(label_ids)
+        self._history.append({"id": str(self.history_id), "messages": [ref], change: [entry]})
+
+    # --- Mutations (for tests and load generators) ---
+    def deliver(self, count: int = 1, unread: bool = True) -> List[str]:
+        """Adds count new messages at the top of the mailbox and returns their IDs."""
+        with self._lock:
+            ids = []
+            for _ in range(count):
+                message = self._generate(int(time.time() * 1000))
+                message.label_ids.discard("UNREAD")
+                if unread:
+                    message.label_ids.add("UNREAD")
+                self._add(message)
+                self._record("messagesAdded", message)
+                ids.append(message.id)
+            return ids
+
+    def modify(self, message_id: str, add: Iterable[str] = (), remove: Iterable[str] = ()) -> None:
+        """Adds and removes labels on a message, e.g. remove=["UNREAD"] to mark it read."""
+        with self._lock:
+            message = self._messages[message_id]
+            added, removed = set(add) - message.label_ids, set(remove) & message.label_ids
+            message.label_ids |= added
+            message.label_ids -= removed
+            if added:
+                self._record("labelsAdded", message, added)
+            if removed:
+                self._record("labelsRemoved", message, removed)
+
+    def delete(self, message_id: str) -> None:
+        """Permanently deletes a message."""
+        with self._lock:
+            message = self._messages.pop(message_id)
+            self._order.remove(message_id)
+            self._record("messagesDeleted", message)
+
+    def truncate_history(self) -> None:
+        """Forgets all history records, so older checkpoints get a 404 like expired Gmail history."""
+        with self._lock:
+            self._history.clear()
+            self._history_floor = self.history_id
+
+    # --- API ---
+    def list(self, query: Optional[str], label_ids: List[str], page_token: Optional[str], max_results: int) -> Dict[str, Any]:
+        terms = [(negated == "-", operator.lower() or None, value.strip('"'))
+                 for negated, operator, value in _QUERY_TERM.findall(query or "")]
+        try:
+            offset = int(page_token) if page_token else 0
+        except ValueError:
+            raise GmailApiError(400, "invalidArgument", "Invalid pageToken")
+        with self._lock:
+            matching = [self._messages[message_id] for message_id in self._order
+                        if set(label_ids) <= self._messages[message_id].label_ids
+                        and self._messages[message_id].matches(terms)]
+        page = matching[offset:offset + max_results]
+        response: Dict[str, Any] = {"resultSizeEstimate": len(matching)}
+        if page:
+            response["messages"] = [{"id": message.id, "threadId": message.thread_id} for message in page]
+        if offset + max_results < len(matching):
+            response["nextPageToken"] = str(offset + max_results)
+        return response
+
+    def get(self, message_id: str, format: str, metadata_headers: List[str]) -> Dict[str, Any]:
+        with self._lock:
+            message = self._messages.get(message_id)
+            if message is None:
+                raise GmailApiError(404, "notFound", "Requested entity was not found.")
+            return message.resource(format, metadata_headers, self.history_id)
+
+    def history(self, start_history_id: Optional[str], page_token: Optional[str], max_results: int) -> Dict[str, Any]:
+        if not start_history_id or not start_history_id.isdigit():
+            raise GmailApiError(400, "invalidArgument", "Invalid startHistoryId")
+        start = int(start_history_id)
+        offset = int(page_token) if page_token and page_token.isdigit() else 0
+        with self._lock:
+            if start < self._history_floor:
+                raise GmailApiError(404, "notFound", "Requested entity was not found.")
+            records = [record for record in self._history if int(record["id"]) > start]
+            response: Dict[str, Any] = {"historyId": str(self.history_id)}
+        page = records[offset:offset + max_results]
+        if page:
+            response["history"] = page
+        if offset + max_results < len(records):
+            response["nextPageToken"] = str(offset + max_results)
+        return response
+
+    def profile(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "emailAddress": EMAIL_ADDRESS,
+                "messagesTotal": len(self._messages),
+                "threadsTotal": len({message.thread_id for message in self._messages.values()}),
+                "historyId": str(self.history_id),
+            }
+
+    def label(self, label_id: str) -> Dict[str, Any]:
+        if label_id not in SYSTEM_LABELS:
+            raise GmailApiError(404, "notFound", "Requested entity was not found.")
+        with self._lock:
+            labelled = [message for message in self._messages.values() if label_id in message.label_ids]
+        unread = sum("UNREAD" in message.label_ids for message in labelled)
+        return {
+            "id": label_id, "name": label_id, "type": "system",
+            "messagesTotal": len(labelled), "messagesUnread": unread,
+            "threadsTotal": len({message.thread_id for message in labelled}),
+            "threadsUnread": len({message.thread_id for message in labelled if "UNREAD" in message.label_ids}),
+        }
+
+    def labels(self) -> Dict[str, Any]:
+        return {"labels": [{"id": label_id, "name": label_id, "type": "system"} for label_id in SYSTEM_LABELS]}
+
+
+# --- Fault injection ---
+@dataclass
+class FaultProfile:
+    """Latency and errors the emulator adds to each call."""
+
+    # Added to every HTTP request (once per batch, not per part), in seconds
+    latency: float = 0.0
+    # Uniform +/- spread around latency, in seconds
+    jitter: float = 0.0
+    # Fraction of calls (batch parts included) answered 429 rateLimitExceeded
+    throttle_rate: float = 0.0
+    # Fraction of calls answered 500 backendError or 503
+    server_error_rate: float = 0.0
+    seed: Optional[int] = None
+    _rng: random.Random = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._rng = random.Random(self.seed)
+
+    def delay(self) -> float:
+        return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+    def injected_error(self) -> Optional[GmailApiError]:
+        roll = self._rng.random()
+        if roll < self.throttle_rate:
+            return GmailApiError(429, "rateLimitExceeded", "Too many concurrent requests for user (injected)")
+        if roll < self.throttle_rate + self.server_error_rate:
+            if self._rng.random() < 0.5:
+                return GmailApiError(503, "backendError", "The service is currently unavailable (injected)")
+            return GmailApiError(500, "backendError", "Backend Error (injected)")
+        return None
+
+
+class EmulatorStats:
+    """Per-method call, quota and error counters; thread-safe."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.http_requests = 0
+        self.batch_requests = 0
+        self.calls: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record_request(self, batch: bool = False) -> None:
+        with self._lock:
+            self.http_requests += 1
+            self.batch_requests += int(batch)
+
+    def record_call(self, method: str, status: int) -> None:
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+        if status >= 400:
+            self.record_error(status)
+
+    def record_error(self, status: int) -> None:
+        with self._lock:
+            self.errors[str(status)] = self.errors.get(str(status), 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "http_requests": self.http_requests,
+                "batch_requests": self.batch_requests,
+                "calls": dict(self.calls),
+                "quota_units": sum(EMULATOR_QUOTA_UNITS.get(method, 0) * count for method, count in self.calls.items()),
+                "errors": dict(self.errors),
+            }
+
+
+# --- HTTP server ---
+def _single(params: Dict[str, List[str]], name: str) -> Optional[str]:
+    values = params.get(name)
+    return values[-1] if values else None
+
+
+def _max_results(params: Dict[str, List[str]]) -> int:
+    value = _single(params, "maxResults")
+    try:
+        return min(max(int(value), 1), MAX_LIST_RESULTS) if value else DEFAULT_LIST_RESULTS
+    except ValueError:
+        raise GmailApiError(400, "invalidArgument", "Invalid maxResults")
+
+
+class GmailEmulator:
+    """
+    Serves a SyntheticMailbox over HTTP in the shape of the Gmail REST API.
+
+    Example:
+        with GmailEmulator(SyntheticMailbox(size=500)) as emulator:
+            client = GmailApiClient(Credentials(token="emulator"), api_root=emulator.api_root)
+    """
+
+    def __init__(self, mailbox: SyntheticMailbox, faults: Optional[FaultProfile] = None, host: str = "127.0.0.1", port: int = 0, deliver_interval: float = 0.0):
+        """
+        Args:
+            mailbox: The mailbox to serve.
+            faults: Latency and errors to inject; none by default.
+            host: Address to bind.
+            port: Port to bind; 0 picks a free one (see api_root).
+            deliver_interval: If positive, deliver one unread message this
+                often (seconds), so history.list has changes to report.
+        """
+        self.mailbox = mailbox
+        self.faults = faults or FaultProfile()
+        self.stats = EmulatorStats()
+        self._host = host
+        self._port = port
+        self._deliver_interval = deliver_interval
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._stopped = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def api_root(self) -> str:
+        """Root URL to give clients, e.g. "http://127.0.0.1:8025/"."""
+        if self._httpd is None:
+            raise RuntimeError("The emulator is not running.")
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> "GmailEmulator":
+        """Binds the port and serves requests on background threads."""
+        self._httpd = ThreadingHTTPServer((self._host, self._port), _RequestHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.emulator = self
+        self._threads = [threading.Thread(target=self._httpd.serve_forever, name="gmail-emulator", daemon=True)]
+        if self._deliver_interval > 0:
+            self._threads.append(threading.Thread(target=self._deliver_loop, name="gmail-emulator-mail", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        logger.info("Gmail emulator serving %s messages at %s", len(self.mailbox), self.api_root)
+        return self
+
+    def stop(self) -> None:
+        """Stops serving and releases the port."""
+        self._stopped.set()
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self) -> "GmailEmulator":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _deliver_loop(self) -> None:
+        while not self._stopped.wait(self._deliver_interval):
+            self.mailbox.deliver()
+
+    def call(self, method: str, path: str, query: str) -> Tuple[int, Dict[str, Any]]:
+        """
+        Answers one API call (a plain request or a batch part), injecting errors.
+
+        Returns:
+            (HTTP status, JSON body).
+        """
+        name = "unknown"
+        try:
+            name, handler = self._route(method, path)
+            error = self.faults.injected_error()
+            if error is not None:
+                raise error
+            params = parse_qs(query)
+            response = handler(params)
+            fields = _single(params, "fields")
+            status, body = 200, apply_fields(response, parse_fields(fields)) if fields else response
+        except GmailApiError as e:
+            status, body = e.status, e.body()
+        self.stats.record_call(name, status)
+        return status, body
+
+    def _route(self, method: str, path: str):
+        """Maps a request to (Gmail method name, handler taking the query parameters)."""
+        if method != "GET" or not path.startswith(API_PREFIX):
+            raise GmailApiError(404, "notFound", f"No emulated method for {method} {path}")
+        user_id, _, resource = path[len(API_PREFIX):].partition("/")
+        if user_id not in ("me", EMAIL_ADDRESS):
+            raise GmailApiError(403, "forbidden", "Delegation denied")
+        mailbox = self.mailbox
+        parts = resource.split("/")
+        if parts == ["messages"]:
+            return "users.messages.list", lambda params: mailbox.list(
+                _single(params, "q"), params.get("labelIds", []), _single(params, "pageToken"), _max_results(params))
+        if len(parts) == 2 and parts[0] == "messages":
+            return "users.messages.get", lambda params: mailbox.get(
+                parts[1], _single(params, "format") or "full", params.get("metadataHeaders", []))
+        if parts == ["history"]:
+            return "users.history.list", lambda params: mailbox.history(
+                _single(params, "startHistoryId"), _single(params, "pageToken"), _max_results(params))
+        if parts == ["profile"]:
+            return "users.getProfile", lambda params: mailbox.profile()
+        if parts == ["labels"]:
+            return "users.labels.list", lambda params: mailbox.labels()
+        if len(parts) == 2 and parts[0] == "labels":
+            return "users.labels.get", lambda params: mailbox.label(parts[1])
+        raise GmailApiError(404, "notFound", f"No emulated method for {method} {path}")
+
+    def batch(self, content_type: str, body: bytes) -> Tuple[str, bytes]:
+        """
+        Answers a multipart/mixed batch request.
+
+        Returns:
+            (Content-Type, body) of the multipart/mixed response.
+
+        Raises:
+            GmailApiError: If the envelope is malformed or has too many parts.
+        """
+        try:
+            calls = parse_batch_request(content_type, body)
+        except ValueError as e:
+            raise GmailApiError(400, "badRequest", str(e))
+        if len(calls) > MAX_BATCH_PARTS:
+            raise GmailApiError(400, "badRequest", f"Too many requests in batch (max {MAX_BATCH_PARTS})")
+        answers = []
+        for content_id, method, target in calls:
+            url = urlsplit(target)
+            answers.append((content_id, *self.call(method, url.path, url.query)))
+        return build_batch_response(answers)
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like Gmail; clients reuse their connections
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def emulator(self) -> GmailEmulator:
+        return self.server.emulator
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if url.path == "/emulator/stats":
+            self._send(200, "application/json", json.dumps(self.emulator.stats.snapshot()).encode())
+            return
+        self._serve(lambda: self._json_call(url))
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        url = urlsplit(self.path)
+        if url.path in BATCH_PATHS:
+            self._serve(lambda: (200, *self.emulator.batch(self.headers.get("Content-Type", ""), body)), batch=True)
+        else:
+            self._serve(lambda: self._json_call(url))
+
+    def _json_call(self, url) -> Tuple[int, str, bytes]:
+        status, body = self.emulator.call(self.command, url.path, url.query)
+        return status, "application/json; charset=UTF-8", json.dumps(body).encode()
+
+    def _serve(self, answer: Callable[[], Tuple[int, str, bytes]], batch: bool = False) -> None:
+        """Sends answer() after the injected latency, unless the request is unauthenticated or throttled."""
+        emulator = self.emulator
+        emulator.stats.record_request(batch)
+        time.sleep(emulator.faults.delay())
+        try:
+            if not self.headers.get("Authorization", "").startswith("Bearer "):
+                raise GmailApiError(401, "authError", "Request is missing required authentication credential.")
+            if batch:
+                # A batch envelope can itself be throttled, before any of its parts run
+                error = emulator.faults.injected_error()
+                if error is not None:
+                    raise error
+            self._send(*answer())
+        except GmailApiError as e:
+            emulator.stats.record_error(e.status)
+            self._send(e.status, "application/json; charset=UTF-8", json.dumps(e.body()).encode())
+
+    def _send(self, status: int, content_type: str, body: bytes) -> None:
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            if status == 429:
+                self.send_header("Retry-After", "1")
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client hung up first, e.g. a cancelled request on the async backend
+            logger.debug("%s - client disconnected before the response was sent", self.address_string())
+            self.close_connection = True
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # Requests are logged at DEBUG through the package logger, never to stdout
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8025, help="Port to bind (default: 8025)")
+    parser.add_argument("--messages", type=int, default=1000, help="Synthetic mailbox size (default: 1000)")
+    parser.add_argument("--unread-ratio", type=float, default=0.2, help="Fraction of messages that are unread (default: 0.2)")
+    parser.add_argument("--seed", type=int, default=0, help="Mailbox and fault seed (default: 0)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latency added to each HTTP request (default: 0)")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform +/- spread around the latency (default: 0)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of calls answered 429 (default: 0)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered 500/503 (default: 0)")
+    parser.add_argument("--deliver-interval", type=float, default=0.0, help="Deliver an unread message every N seconds (default: never)")
+    args = parser.parse_args()
+
+    configure_logging("INFO")
+    # Stop cleanly (and print the stats) on SIGTERM as well as Ctrl-C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    faults = FaultProfile(args.latency_ms / 1000, args.jitter_ms / 1000, args.throttle_rate, args.error_rate, seed=args.seed)
+    emulator = GmailEmulator(SyntheticMailbox(args.messages, args.unread_ratio, args.seed), faults,
+                             args.host, args.port, args.deliver_interval).start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.stop()
+        print(json.dumps(emulator.stats.snapshot(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
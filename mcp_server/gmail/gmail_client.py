@@ -1,32 +1,214 @@
 # src/mcp_server/gmail/gmail_client.py
-import sys
-from typing import Optional, List, Dict, Any
+import logging
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Iterator, Callable, NamedTuple, Tuple
 
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build, Resource
+from googleapiclient.discovery import Resource
 from googleapiclient.errors import HttpError
 
+from .cancellation import current_token
+from .cassette import Cassette
+from .metrics import GMAIL_RETRIES, GMAIL_THROTTLED, gmail_request
+from .rate_limit import QUOTA_UNITS, QuotaLimiter, is_throttle_error
+from .retry import RetryPolicy, is_retryable_error
+from .service_pool import ServicePool, DEFAULT_POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Gmail accepts at most 100 calls per batch request
+MAX_BATCH_SIZE = 100
+# messages.list never returns more than 500 IDs per page
+MAX_PAGE_SIZE = 500
+METADATA_HEADERS = ["Subject", "From", "Date"]
+
+# Partial-response masks: only request what the tools actually read
+# messages.list: just the IDs and the cursor (threadId and resultSizeEstimate are unused)
+LIST_FIELDS = "messages/id,nextPageToken"
+# messages.get: what parse_message_details reads (no labelIds, sizeEstimate, historyId, internalDate, ...)
+MESSAGE_FIELDS = "snippet,payload/headers(name,value)"
+# users.getProfile: only the history checkpoint
+PROFILE_FIELDS = "historyId"
+# users.history.list: what UnreadView.apply_history reads
+HISTORY_FIELDS = (
+    "history(messagesAdded/message(id,labelIds),messagesDeleted/message/id,"
+    "labelsAdded/message(id,labelIds),labelsRemoved/message(id,labelIds)),"
+    "historyId,nextPageToken"
+)
+
+
+class ListPosition(NamedTuple):
+    """A point in a messages.list result set: the pageToken to list from (None for the start) and how many IDs to skip."""
+
+    page_token: Optional[str] = None
+    skip: int = 0
+
+
+class MessageIdPage(NamedTuple):
+    """One page of listed message IDs and where the listing stands after it."""
+
+    messages: List[Dict[str, str]]
+    # Where listing resumes after this page; None if the result set is exhausted
+    end: Optional[ListPosition]
+
+
+def slice_list_page(response: Dict[str, Any], position: ListPosition, remaining: int) -> MessageIdPage:
+    """
+    Applies a position's skip and the remaining budget to one messages.list response.
+
+    A skip larger than the page carries over to the next page, so any
+    position can be resumed from, at the cost of listing the skipped IDs.
+    """
+    listed = response.get("messages", [])
+    skip = min(position.skip, len(listed))
+    messages = listed[skip:skip + remaining]
+    consumed = skip + len(messages)
+    next_page_token = response.get("nextPageToken")
+    if consumed < len(listed):
+        end = ListPosition(position.page_token, consumed)
+    elif next_page_token:
+        end = ListPosition(next_page_token, position.skip - skip)
+    else:
+        end = None
+    return MessageIdPage(messages, end)
+
+
+def parse_message_details(message_id: str, msg: Dict[str, Any]) -> Dict[str, Any]:
+    """Extracts the fields exposed by the tools from a raw messages.get response."""
+    headers = msg.get("payload", {}).get("headers", [])
+    subject = next((h["value"] for h in headers if h["name"] == "Subject"), "No Subject")
+    sender = next((h["value"] for h in headers if h["name"] == "From"), "Unknown")
+    date = next((h["value"] for h in headers if h["name"] == "Date"), "Unknown")
+    snippet = msg.get("snippet", "")
+    return {
+        "id": message_id, # Use the requested ID
+        "subject": subject,
+        "from": sender,
+        "date": date,
+        "snippet": snippet,
+    }
+
+
 class GmailApiClient:
     """Handles interactions with the Gmail API."""
 
-    def __init__(self, credentials: Credentials):
+    def __init__(self, credentials: Credentials, pool_size: int = DEFAULT_POOL_SIZE, discovery_file: Optional[Path] = None, limiter: Optional[QuotaLimiter] = None, retry_policy: Optional[RetryPolicy] = None, api_root: Optional[str] = None, cassette: Optional[Cassette] = None):
         """
         Initializes the Gmail API client.
 
+        The blocking methods below are meant to be run through run_in_pool,
+        which executes them on a bounded set of worker threads that each own
+        their own HTTP transport and service.
+
         Args:
             credentials: Valid Google OAuth2 credentials.
+            pool_size: Number of worker threads / concurrent Gmail API calls.
+            discovery_file: Optional on-disk discovery document; defaults to the bundled copy.
+            limiter: Optional quota limiter for this mailbox. Callers acquire it
+                around each call; the client reports throttled attempts to it.
+            retry_policy: Backoff and retry budget for transient errors; defaults to RetryPolicy().
+            api_root: Optional root URL to send requests to instead of Gmail,
+                e.g. the local emulator (see emulator.py).
+            cassette: Optional cassette to record Gmail traffic into, or to
+                replay it from instead of calling Gmail.
 
         Raises:
             ValueError: If invalid or missing credentials are provided.
+            RuntimeError: If the Gmail service cannot be built.
         """
         if not credentials or not credentials.valid:
             raise ValueError("Invalid or missing credentials provided to GmailApiClient.")
-        try:
-            self.service: Resource = build("gmail", "v1", credentials=credentials)
-            print("Gmail API service built successfully.")
-        except Exception as e:
-            print(f"Error building Gmail service: {e}", file=sys.stderr)
-            raise RuntimeError(f"Could not build Gmail service: {e}") from e
+        self.limiter = limiter
+        self._retry = retry_policy if retry_policy is not None else RetryPolicy()
+        self._pool = ServicePool(credentials, size=pool_size, discovery_file=discovery_file,
+                                 api_root=api_root, cassette=cassette)
+        # Work dropped, aborted or wasted because its tool call was cancelled
+        self.cancellation = self._pool.cancellation
+        self._pool.warm_up()
+        logger.info("Gmail API service pool ready (%s workers).", pool_size)
+
+    @property
+    def service(self) -> Resource:
+        """The Gmail service owned by the calling worker thread."""
+        return self._pool.get_service()
+
+    async def run_in_pool(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Runs one of this client's blocking methods on the service pool.
+
+        Example:
+            details = await client.run_in_pool(client.get_message_details, message_id)
+        """
+        return await self._pool.run(func, *args, **kwargs)
+
+    def close(self) -> None:
+        """Shuts down the service pool."""
+        self._pool.shutdown()
+
+    def _note_failed_attempt(self, error: Exception) -> None:
+        """Reports a failed attempt that is about to be retried (or given up on in a batch)."""
+        if self.limiter and is_throttle_error(error):
+            self.limiter.on_throttle()
+
+    def _execute(self, request) -> Dict[str, Any]:
+        """Executes a googleapiclient request, retrying transient failures."""
+        # e.g. "gmail.users.messages.list" -> "messages.list"
+        endpoint = request.methodId.removeprefix("gmail.users.")
+
+        def _attempt() -> Dict[str, Any]:
+            with gmail_request(endpoint):
+                return request.execute()
+
+        def _on_retry(error: Exception) -> None:
+            GMAIL_RETRIES.inc(endpoint=endpoint)
+            self._note_failed_attempt(error)
+
+        return self._retry.call(_attempt, on_retry=_on_retry,
+                                limiter=self.limiter, units=QUOTA_UNITS[f"users.{endpoint}"])
+
+    def iter_message_id_pages(self, query: Optional[str] = None, label_ids: Optional[List[str]] = None, max_results: int = 10, start: Optional[ListPosition] = None) -> Iterator[MessageIdPage]:
+        """
+        Lists message IDs matching the criteria, one API page at a time.
+
+        Follows nextPageToken until max_results IDs have been produced or the
+        result set is exhausted. Pages are fetched lazily, so a consumer can
+        start working on one page before the next one is requested.
+
+        Args:
+            query: Gmail search query (e.g., 'from:me').
+            label_ids: List of label IDs (e.g., ['UNREAD']).
+            max_results: Maximum number of messages to return across all pages.
+            start: Where to resume a previous listing (default: the beginning).
+
+        Yields:
+            MessageIdPage objects; messages may be empty, but end is always
+            where the listing resumes after the page.
+
+        Raises:
+            HttpError: If an API call fails.
+        """
+        remaining = max_results
+        position = start or ListPosition()
+        while remaining > 0 and position is not None:
+            try:
+                response = self._execute(self.service.users().messages().list(
+                    userId="me",
+                    q=query,
+                    labelIds=label_ids,
+                    maxResults=min(remaining + position.skip, MAX_PAGE_SIZE),
+                    pageToken=position.page_token,
+                    fields=LIST_FIELDS
+                ))
+            except HttpError as error:
+                logger.error("API Error listing messages: %s", error)
+                # Let HttpError propagate - the caller (_execute_tool) might handle it
+                raise error
+
+            page = slice_list_page(response, position, remaining)
+            logger.debug("Fetched a page of %s message IDs.", len(page.messages))
+            yield page
+            remaining -= len(page.messages)
+            position = page.end
 
     def list_message_ids(self, query: Optional[str] = None, label_ids: Optional[List[str]] = None, max_results: int = 10) -> List[Dict[str, str]]:
         """
@@ -38,28 +220,69 @@ class GmailApiClient:
             max_results: Maximum number of messages to return.
 
         Returns:
-            A list of message dictionaries (e.g., [{'id': '...', 'threadId': '...'}]),
+            A list of message dictionaries (e.g., [{'id': '...'}]),
             or an empty list if none found.
 
         Raises:
             HttpError: If the API call fails.
         """
-        print(f"Listing messages with query='{query}', labels={label_ids}, max_results={max_results}")
-        try:
-            request = self.service.users().messages().list(
+        logger.debug("Listing messages with query='%s', labels=%s, max_results=%s", query, label_ids, max_results)
+        messages = [
+            msg_ref
+            for page in self.iter_message_id_pages(query=query, label_ids=label_ids, max_results=max_results)
+            for msg_ref in page.messages
+        ]
+        logger.debug("Found %s message IDs.", len(messages))
+        return messages
+
+    def get_history_id(self) -> str:
+        """
+        Returns the mailbox's current historyId (from users.getProfile).
+
+        Raises:
+            HttpError: If the API call fails.
+        """
+        profile = self._execute(self.service.users().getProfile(userId="me", fields=PROFILE_FIELDS))
+        return profile["historyId"]
+
+    def list_history(self, start_history_id: str) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Lists mailbox changes since start_history_id, following all pages.
+
+        Args:
+            start_history_id: The checkpoint to list changes from.
+
+        Returns:
+            (history records oldest first, the mailbox's current historyId).
+
+        Raises:
+            HttpError: If the API call fails; a 404 means start_history_id
+                is too old and a full resync is needed.
+        """
+        records: List[Dict[str, Any]] = []
+        page_token = None
+        while True:
+            response = self._execute(self.service.users().history().list(
                 userId="me",
-                q=query,
-                labelIds=label_ids,
-                maxResults=max_results
-            )
-            response = request.execute()
-            messages = response.get("messages", [])
-            print(f"Found {len(messages)} message IDs.")
-            return messages
-        except HttpError as error:
-             print(f"API Error listing messages: {error}", file=sys.stderr)
-             # Let HttpError propagate - the caller (_execute_tool) might handle it
-             raise error
+                startHistoryId=start_history_id,
+                pageToken=page_token,
+                fields=HISTORY_FIELDS
+            ))
+            records.extend(response.get("history", []))
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                logger.debug("Fetched %s history records since %s.", len(records), start_history_id)
+                return records, response["historyId"]
+
+    def _message_get_request(self, message_id: str):
+        """Builds (but does not execute) a metadata-only messages.get request."""
+        return self.service.users().messages().get(
+            userId="me",
+            id=message_id,
+            format="metadata",
+            metadataHeaders=METADATA_HEADERS,
+            fields=MESSAGE_FIELDS
+        )
 
     def get_message_details(self, message_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -72,34 +295,103 @@ class GmailApiClient:
             A dictionary containing parsed details (id, subject, from, date, snippet)
             or None if the message cannot be fetched or parsed due to errors.
         """
-        print(f"Fetching details for message ID: {message_id}")
+        logger.debug("Fetching details for message ID: %s", message_id)
         try:
-            msg = self.service.users().messages().get(
-                userId="me",
-                id=message_id,
-                format="metadata",
-                metadataHeaders=["Subject", "From", "Date"]
-            ).execute()
-
-            headers = msg.get("payload", {}).get("headers", [])
-            subject = next((h["value"] for h in headers if h["name"] == "Subject"), "No Subject")
-            sender = next((h["value"] for h in headers if h["name"] == "From"), "Unknown")
-            date = next((h["value"] for h in headers if h["name"] == "Date"), "Unknown")
-            snippet = msg.get("snippet", "")
-
-            print(f"Successfully fetched details for message ID: {message_id}")
-            return {
-                "id": message_id, # Use the requested ID
-                "subject": subject,
-                "from": sender,
-                "date": date,
-                "snippet": snippet,
-            }
+            msg = self._execute(self._message_get_request(message_id))
+            details = parse_message_details(message_id, msg)
+            logger.debug("Successfully fetched details for message ID: %s", message_id)
+            return details
         except HttpError as error:
             # Log HttpError specifically (e.g., 404 Not Found) and return None
-            print(f"API Error fetching message {message_id}: {error}", file=sys.stderr)
+            logger.error("API Error fetching message %s: %s", message_id, error)
             return None
         except Exception as e:
             # Catch any other unexpected errors during processing/parsing
-            print(f"Unexpected error processing message {message_id}: {e}", file=sys.stderr)
-            return None
\ No newline at end of file
+            logger.error("Unexpected error processing message %s: %s", message_id, e)
+            return None
+
+    def get_messages_details_batch(self, message_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Fetches and parses details for many message IDs using batch requests.
+
+        Up to MAX_BATCH_SIZE messages.get calls are packed into each HTTP
+        request, so N messages cost ceil(N / MAX_BATCH_SIZE) round-trips
+        instead of N.
+
+        Args:
+            message_ids: The IDs of the messages to fetch. Duplicates are fetched once.
+
+        Returns:
+            A dictionary mapping each requested ID to its parsed details
+            (same shape as get_message_details), or to None if that message
+            could not be fetched or parsed.
+        """
+        unique_ids = list(dict.fromkeys(message_ids))
+        results: Dict[str, Optional[Dict[str, Any]]] = {}
+        # Messages that failed transiently in the current round, to be re-batched
+        transient: Dict[str, Exception] = {}
+
+        def _on_response(request_id: str, response: Dict[str, Any], exception: Optional[Exception]) -> None:
+            if exception is not None:
+                if is_throttle_error(exception):
+                    GMAIL_THROTTLED.inc(endpoint="messages.get")
+                self._note_failed_attempt(exception)
+                if is_retryable_error(exception):
+                    transient[request_id] = exception
+                else:
+                    logger.error("API Error fetching message %s: %s", request_id, exception)
+                    results[request_id] = None
+                return
+            try:
+                results[request_id] = parse_message_details(request_id, response)
+            except Exception as e:
+                logger.error("Unexpected error processing message %s: %s", request_id, e)
+                results[request_id] = None
+
+        self._retry.budget.deposit()
+        pending = unique_ids
+        attempt = 0
+        while pending:
+            transient.clear()
+            for start in range(0, len(pending), MAX_BATCH_SIZE):
+                # Stop between batch requests once the tool call is cancelled
+                current_token().check()
+                chunk = pending[start:start + MAX_BATCH_SIZE]
+                logger.debug("Fetching details for %s messages in one batch request", len(chunk))
+                batch = self.service.new_batch_http_request(callback=_on_response)
+                for message_id in chunk:
+                    batch.add(self._message_get_request(message_id), request_id=message_id)
+                try:
+                    with gmail_request("batch"):
+                        batch.execute()
+                except Exception as error:
+                    # The batch envelope itself failed; every message in it is affected
+                    if not isinstance(error, HttpError) and not is_retryable_error(error):
+                        raise
+                    self._note_failed_attempt(error)
+                    for message_id in chunk:
+                        if is_retryable_error(error):
+                            transient.setdefault(message_id, error)
+                        else:
+                            logger.error("API Error executing batch request: %s", error)
+                            results.setdefault(message_id, None)
+
+            if not transient:
+                break
+            # One retry round is one more batch request, so it costs one budget token
+            delay = self._retry.retry_delay(attempt, transient.values())
+            if delay is None:
+                for message_id, error in transient.items():
+                    logger.error("API Error fetching message %s: %s", message_id, error)
+                    results[message_id] = None
+                break
+            if self.limiter:
+                # The retry round is paced by the same quota as the first one
+                delay = max(delay, self.limiter.charge_blocking(QUOTA_UNITS["users.messages.get"] * len(transient)))
+            logger.warning("%s messages failed transiently; retry %s in %.2fs", len(transient), attempt + 1, delay)
+            GMAIL_RETRIES.inc(len(transient), endpoint="messages.get")
+            current_token().sleep(delay)
+            pending = list(transient)
+            attempt += 1
+
+        return results
@@ -0,0 +1,54 @@
+# src/mcp_server/gmail/logging_config.py
+import json
+import logging
+import sys
+from pathlib import Path
+from typing import Optional
+
+# Root of every logger in the package (modules use logging.getLogger(__name__))
+PACKAGE_LOGGER = "mcp_server"
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line, for log shippers."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def configure_logging(level: str = "INFO", log_file: Optional[Path] = None, log_format: str = "text") -> None:
+    """
+    Routes the package's logs to stderr (or a file), never stdout.
+
+    stdout carries the MCP stdio transport, so anything written there
+    would corrupt the protocol stream.
+
+    Args:
+        level: Minimum level name, e.g. "DEBUG" or "WARNING". Records below
+            it are discarded before their message is formatted.
+        log_file: Append to this file instead of writing to stderr.
+        log_format: "text" for human-readable lines, "json" for one JSON object per line.
+
+    Raises:
+        ValueError: If level or log_format is not recognized.
+    """
+    if log_format not in ("text", "json"):
+        raise ValueError(f"Unknown log format '{log_format}' (expected 'text' or 'json').")
+    handler = logging.FileHandler(log_file) if log_file else logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT))
+
+    logger = logging.getLogger(PACKAGE_LOGGER)
+    logger.setLevel(level.upper())
+    logger.handlers[:] = [handler]
+    # Don't duplicate records through whatever the root logger has configured
+    logger.propagate = False
@@ -0,0 +1,43 @@
+# src/mcp_server/gmail/mailbox.py
+import inspect
+from dataclasses import dataclass, field
+from typing import Optional, Union
+
+from .async_gmail_client import AsyncGmailApiClient
+from .credential_manager import CredentialManager
+from .gmail_client import GmailApiClient
+from .metadata_cache import MessageMetadataCache
+from .query_cache import QueryCache
+from .singleflight import SingleFlight
+from .unread_sync import UnreadView
+
+GmailClient = Union[GmailApiClient, AsyncGmailApiClient]
+
+
+@dataclass
+class Mailbox:
+    """Everything the tools need to serve one Gmail mailbox."""
+
+    client: GmailClient
+    # Optional message metadata cache placed in front of detail fetches
+    cache: Optional[MessageMetadataCache] = None
+    # Optional history-synced view used to answer list_unread
+    unread_view: Optional[UnreadView] = None
+    # Optional historyId-validated cache of search_emails listings
+    query_cache: Optional[QueryCache] = None
+    # Coalesces concurrent identical tool calls
+    tool_calls: SingleFlight = field(default_factory=SingleFlight)
+    # Coalesces concurrent detail fetches for the same message ID
+    detail_fetches: SingleFlight = field(default_factory=SingleFlight)
+    # Optional background refresher of the client's OAuth token
+    credentials: Optional[CredentialManager] = None
+
+    async def close(self) -> None:
+        """Stops the token refresher and releases the client and cache."""
+        if self.credentials:
+            await self.credentials.close()
+        closing = self.client.close()
+        if inspect.isawaitable(closing):
+            await closing
+        if self.cache:
+            self.cache.close()
@@ -0,0 +1,139 @@
+# src/mcp_server/gmail/metadata_cache.py
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 10000
+# Seconds to wait for another process's write lock; past it the cache is skipped, not waited on
+DEFAULT_BUSY_TIMEOUT = 0.25
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    details TEXT NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_last_access ON messages (last_access);
+"""
+
+
+class MessageMetadataCache:
+    """
+    Persistent cache of parsed message details, keyed by message ID.
+
+    Subject/From/Date/snippet never change for a given message, so entries
+    never go stale; the table is only bounded by evicting the least recently
+    used rows once it grows past max_entries. Backed by SQLite in WAL mode
+    so lookups stay cheap while other processes share the same file.
+
+    Methods block on SQLite, so async callers should run them in a thread.
+    Database errors (e.g. another process holding the write lock past the
+    busy timeout) are logged and treated as misses or dropped writes.
+    """
+
+    def __init__(self, path: Path, max_entries: int = DEFAULT_MAX_ENTRIES, busy_timeout: float = DEFAULT_BUSY_TIMEOUT):
+        """
+        Opens (creating if needed) the cache database.
+
+        Args:
+            path: Location of the SQLite database file.
+            max_entries: Number of messages kept before LRU eviction kicks in.
+            busy_timeout: Seconds to wait for a lock held by another connection.
+
+        Raises:
+            ValueError: If max_entries is less than 1.
+            sqlite3.Error: If the database cannot be opened.
+        """
+        if max_entries < 1:
+            raise ValueError(f"Metadata cache size must be at least 1, got {max_entries}.")
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), timeout=busy_timeout, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Losing the last few writes on power failure only costs a re-fetch
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        logger.info("Message metadata cache opened at %s (max %s entries).", path, max_entries)
+
+    def get_many(self, message_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Looks up cached details and marks the hits as recently used.
+
+        Returns:
+            A dictionary containing only the IDs that were found in the cache.
+        """
+        ids = list(dict.fromkeys(message_ids))
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            try:
+                rows = self._conn.execute(
+                    f"SELECT id, details FROM messages WHERE id IN ({placeholders})", ids
+                ).fetchall()
+            except sqlite3.Error as e:
+                logger.warning("Error reading message metadata cache, treating as misses: %s", e)
+                rows = []
+            if rows:
+                try:
+                    self._conn.execute(
+                        f"UPDATE messages SET last_access = ? WHERE id IN ({','.join('?' * len(rows))})",
+                        [time.time(), *(row[0] for row in rows)],
+                    )
+                except sqlite3.Error as e:
+                    # The rows are still good; only their eviction order goes stale
+                    logger.warning("Error updating message metadata cache access times: %s", e)
+            self.hits += len(rows)
+            self.misses += len(ids) - len(rows)
+        return {message_id: json.loads(details) for message_id, details in rows}
+
+    def put_many(self, details_by_id: Dict[str, Dict[str, Any]]) -> None:
+        """Stores parsed details, then evicts least recently used rows over max_entries."""
+        if not details_by_id:
+            return
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO messages (id, details, last_access) VALUES (?, ?, ?)",
+                    [(message_id, json.dumps(details), now) for message_id, details in details_by_id.items()],
+                )
+                (count,) = self._conn.execute("SELECT COUNT(*) FROM messages").fetchone()
+                if count > self.max_entries:
+                    self._conn.execute(
+                        "DELETE FROM messages WHERE id IN "
+                        "(SELECT id FROM messages ORDER BY last_access LIMIT ?)",
+                        (count - self.max_entries,),
+                    )
+                self._conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                # A failed cache write only costs a re-fetch later
+                logger.warning("Error writing message metadata cache: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss counters and the current number of cached messages."""
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM messages").fetchone()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": entries,
+                "max_entries": self.max_entries,
+            }
+
+    def close(self) -> None:
+        """Closes the database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,291 @@
+# src/mcp_server/gmail/metrics.py
+import abc
+import asyncio
+import bisect
+import contextlib
+import logging
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .rate_limit import is_throttle_error
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from a cache hit to a slow retried batch
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Serialized tool response sizes in bytes
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric(abc.ABC):
+    """Base for metrics keyed by label values; updates are thread-safe."""
+
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abc.abstractmethod
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """Returns (sample name, labels, value) triples for exposition."""
+
+
+class Counter(_Metric):
+    """A monotonically increasing count."""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    """A value that goes up and down, e.g. calls in flight."""
+
+    type = "gauge"
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    @contextlib.contextmanager
+    def track_in_progress(self, **labels: str) -> Iterator[None]:
+        """Counts the enclosed block as in progress while it runs."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    """Counts observations into cumulative buckets, plus their sum."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts with a final +Inf bucket, sum)
+        self._values: Dict[LabelValues, Tuple[List[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextlib.contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observes the wall-clock duration of the enclosed block, even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        samples = []
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else _format_value(bound)
+                samples.append((f"{self.name}_bucket", {**labels, "le": le}, cumulative))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+    def summaries(self) -> List[Tuple[Dict[str, str], dict]]:
+        """Returns (labels, {count, sum, mean, p50, p95, p99}) per label set; quantiles are bucket estimates."""
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        summaries = []
+        for key, counts, total in items:
+            count = sum(counts)
+            summary = {"count": count, "sum": total, "mean": total / count if count else 0.0}
+            for quantile in (0.5, 0.95, 0.99):
+                summary[f"p{round(quantile * 100)}"] = self._estimate_quantile(counts, quantile)
+            summaries.append((dict(zip(self.labelnames, key)), summary))
+        return summaries
+
+    def _estimate_quantile(self, counts: List[int], quantile: float) -> Optional[float]:
+        """Interpolates linearly inside the bucket holding the quantile, as Prometheus' histogram_quantile does."""
+        total = sum(counts)
+        if not total:
+            return None
+        rank = quantile * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                if index == len(self.buckets):
+                    # Beyond the last finite bucket: the best bound we have
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricsRegistry:
+    """
+    A set of metrics rendered in the Prometheus text exposition format.
+
+    Besides metrics updated in place, callback gauges read a value at
+    scrape time, which suits counters kept elsewhere (cache hits, the
+    limiter's concurrency limit).
+    """
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._callbacks: List[Tuple[str, str, str, Callable[[], List[Tuple[Dict[str, str], float]]]]] = []
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def register_callback(self, name: str, help: str, func: Callable[[], List[Tuple[Dict[str, str], float]]], metric_type: str = "gauge") -> None:
+        """Adds a metric whose (labels, value) samples are read from func at scrape time."""
+        self._callbacks = [callback for callback in self._callbacks if callback[0] != name]
+        self._callbacks.append((name, metric_type, help, func))
+
+    def _add(self, metric: _Metric):
+        self._metrics.append(metric)
+        return metric
+
+    def _families(self) -> List[Tuple[str, str, str, List[Tuple[str, Dict[str, str], float]]]]:
+        families = [(metric.name, metric.type, metric.help, metric.samples()) for metric in self._metrics]
+        for name, metric_type, help, func in self._callbacks:
+            try:
+                samples = [(name, labels, value) for labels, value in func()]
+            except Exception as e:
+                logger.warning("Metrics callback %s failed: %s", name, e)
+                continue
+            families.append((name, metric_type, help, samples))
+        return families
+
+    def render(self) -> str:
+        """Returns every metric in the Prometheus text format (version 0.0.4)."""
+        lines = []
+        for name, metric_type, help, samples in self._families():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for sample_name, labels, value in samples:
+                label_text = ",".join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+                lines.append(f"{sample_name}{{{label_text}}} {_format_value(value)}" if label_text else f"{sample_name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        """Returns every metric as JSON-friendly data; histograms are summarized with estimated quantiles."""
+        snapshot = {}
+        for metric in self._metrics:
+            if isinstance(metric, Histogram):
+                snapshot[metric.name] = [{**labels, **summary} for labels, summary in metric.summaries()]
+            else:
+                snapshot[metric.name] = [{**labels, "value": value} for _, labels, value in metric.samples()]
+        for name, _, _, samples in self._families()[len(self._metrics):]:
+            snapshot[name] = [{**labels, "value": value} for _, labels, value in samples]
+        return snapshot
+
+
+async def serve_metrics(registry: MetricsRegistry, host: str, port: int) -> asyncio.AbstractServer:
+    """
+    Starts a minimal HTTP server answering GET /metrics with registry.render().
+
+    Returns:
+        The listening server; close() it on shutdown.
+
+    Raises:
+        OSError: If the address cannot be bound.
+    """
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            # Drain the headers; the request has no body we care about
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, body = "200 OK", registry.render().encode()
+            else:
+                status, body = "404 Not Found", b"Not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info("Serving Prometheus metrics on http://%s:%s/metrics", host, port)
+    return server
+
+
+# --- Process-wide metrics ---
+REGISTRY = MetricsRegistry()
+TOOL_LATENCY = REGISTRY.histogram("gmail_mcp_tool_duration_seconds", "Time to answer a tool call.", ["tool"])
+TOOLS_IN_FLIGHT = REGISTRY.gauge("gmail_mcp_tools_in_flight", "Tool calls being answered.", ["tool"])
+TOOL_ERRORS = REGISTRY.counter("gmail_mcp_tool_errors_total", "Tool calls answered with an error.", ["tool", "kind"])
+RESPONSE_BYTES = REGISTRY.histogram("gmail_mcp_response_bytes", "Serialized size of tool results.", ["tool"], buckets=SIZE_BUCKETS)
+GMAIL_LATENCY = REGISTRY.histogram("gmail_api_request_duration_seconds", "Duration of each Gmail HTTP request (one attempt).", ["endpoint"])
+GMAIL_IN_FLIGHT = REGISTRY.gauge("gmail_api_requests_in_flight", "Gmail HTTP requests on the wire.", ["endpoint"])
+GMAIL_RETRIES = REGISTRY.counter("gmail_api_retries_total", "Gmail calls (or batched messages) retried after a transient error.", ["endpoint"])
+GMAIL_THROTTLED = REGISTRY.counter("gmail_api_throttled_total", "Gmail responses that signalled throttling (429, 503, 403 rateLimitExceeded).", ["endpoint"])
+# trigger="request" means a call found the token stale and waited for the refresh
+TOKEN_REFRESHES = REGISTRY.counter("gmail_oauth_token_refreshes_total", "OAuth access token refreshes, by trigger and outcome.", ["trigger", "outcome"])
+
+
+@contextlib.contextmanager
+def gmail_request(endpoint: str) -> Iterator[None]:
+    """Times one Gmail HTTP request (one attempt) and counts it in flight, and throttling responses."""
+    with GMAIL_IN_FLIGHT.track_in_progress(endpoint=endpoint), GMAIL_LATENCY.time(endpoint=endpoint):
+        try:
+            yield
+        except Exception as e:
+            if is_throttle_error(e):
+                GMAIL_THROTTLED.inc(endpoint=endpoint)
+            raise
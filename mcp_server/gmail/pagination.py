@@ -0,0 +1,74 @@
+# src/mcp_server/gmail/pagination.py
+import base64
+import binascii
+import json
+from dataclasses import dataclass, field
+from typing import List, NamedTuple, Optional, Tuple
+
+from .gmail_client import ListPosition
+
+
+@dataclass
+class Listing:
+    """
+    The messages one tool call has produced so far, in listing order.
+
+    Pages are added only after every earlier page, so `messages` is always
+    a prefix of the result set and `next_position` says exactly where to
+    resume -- whether the call finished or was cut short by its deadline.
+    """
+
+    # Where listing resumes; starts at the requested position, None once the result set is exhausted
+    next_position: Optional[ListPosition] = field(default_factory=ListPosition)
+    # (message_id, details) pairs; details is None when the message could not be fetched
+    messages: List[Tuple[str, Optional[dict]]] = field(default_factory=list)
+    # True if the deadline fired before the requested messages were all fetched
+    partial: bool = False
+    # ID of the last message before next_position, used to re-find the position in a list that has shifted
+    anchor: Optional[str] = None
+
+    def add_page(self, fetched: List[Tuple[str, Optional[dict]]], end: Optional[ListPosition]) -> None:
+        """Appends one completed page and moves the resume position past it."""
+        self.messages.extend(fetched)
+        self.next_position = end
+        if fetched:
+            self.anchor = fetched[-1][0]
+
+
+class Cursor(NamedTuple):
+    """Where a tool call resumes: its query, listing position and the last message ID it returned."""
+
+    query: str
+    position: ListPosition = ListPosition()
+    anchor: Optional[str] = None
+
+    def listing(self) -> Listing:
+        """Returns an empty Listing starting at this cursor."""
+        return Listing(self.position, anchor=self.anchor)
+
+
+def encode_cursor(tool: str, cursor: Cursor) -> str:
+    """Returns an opaque string resuming the given tool call at cursor."""
+    state = {"tool": tool, "q": cursor.query, "t": cursor.position.page_token, "s": cursor.position.skip, "a": cursor.anchor}
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, tool: str) -> Cursor:
+    """
+    Decodes a string issued by encode_cursor.
+
+    Raises:
+         ValueError: If the cursor is malformed or was issued by another tool.
+    """
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        query, page_token, skip, anchor = state["q"], state["t"], state["s"], state.get("a")
+        if not isinstance(query, str) or not isinstance(skip, int) or skip < 0:
+            raise ValueError("bad field types")
+        if any(value is not None and not isinstance(value, str) for value in (page_token, anchor)):
+            raise ValueError("bad page token or anchor")
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+    if state.get("tool") != tool:
+        raise ValueError(f"Cursor was issued by '{state.get('tool')}', not '{tool}'")
+    return Cursor(query, ListPosition(page_token, skip), anchor)
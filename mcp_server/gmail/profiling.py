@@ -0,0 +1,179 @@
+# src/mcp_server/gmail/profiling.py
+import asyncio
+import contextlib
+import cProfile
+import functools
+import itertools
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from types import CodeType
+from typing import AsyncIterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# "sampling" writes collapsed stacks only; "cprofile" also writes a deterministic .prof
+PROFILE_MODES = ("sampling", "cprofile")
+
+
+@functools.lru_cache(maxsize=4096)
+def _frame_label(code: CodeType) -> str:
+    # ';' separates frames in the collapsed format, so it must not appear in a label
+    return f"{code.co_qualname} ({Path(code.co_filename).name}:{code.co_firstlineno})".replace(";", ":")
+
+
+class StackSampler:
+    """
+    Samples the stack of every thread at a fixed interval, from its own daemon thread.
+
+    Samples are wall-clock: a thread blocked on a socket or waiting for
+    work is counted where it waits, which is what a slow call needs to show.
+    Stacks are kept in collapsed form ("thread;outer;...;inner" -> count),
+    as read by flamegraph.pl, speedscope and similar tools.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="gmail-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Counter[str]:
+        """Stops sampling and returns the collapsed stacks."""
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _sample(self, own_ident: int) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            labels.append(names.get(ident, f"thread-{ident}").replace(";", ":"))
+            self.stacks[";".join(reversed(labels))] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        own_ident = threading.get_ident()
+        while True:
+            self._sample(own_ident)
+            if self._stop.wait(self.interval):
+                return
+
+
+def write_collapsed(stacks: Counter[str], path: Path) -> None:
+    """Writes collapsed stacks, one "frames count" line each, most frequent first."""
+    path.write_text("".join(f"{stack} {count}\n" for stack, count in stacks.most_common()))
+
+
+class CallProfiler:
+    """
+    Profiles a sampled fraction of tool calls and writes one dump set per call.
+
+    Every profiled call gets <stamp>-<pid>-<seq>-<tool>.collapsed from a
+    StackSampler covering all threads (event loop and Gmail workers). In
+    "cprofile" mode it also gets a .prof (pstats) file from cProfile, which
+    adds noticeable overhead. cProfile hooks in through sys.monitoring, which
+    is interpreter-wide, so although it is enabled from the event loop
+    thread it records the pool workers' calls as well.
+
+    Both profiles see everything the process does while the call runs, so
+    calls running alongside it show up too. Only one call is profiled at a
+    time; calls that would overlap it run unprofiled. Stopping the sampler
+    and writing the dumps happen in a worker thread, so finishing a profile
+    does not stall the event loop for the other calls.
+    """
+
+    def __init__(self, directory: Path, rate: float = 0.0, mode: str = "sampling", interval: float = 0.005):
+        """
+        Args:
+            directory: Where dumps are written; created on first use.
+            rate: Fraction of calls profiled without being asked (0 to 1).
+            mode: One of PROFILE_MODES.
+            interval: Seconds between stack samples.
+
+        Raises:
+            ValueError: If mode is unknown, or rate or interval is out of range.
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {mode!r}; expected one of {PROFILE_MODES}.")
+        if not 0 <= rate <= 1:
+            raise ValueError(f"Profile rate must be between 0 and 1, got {rate}.")
+        if interval <= 0:
+            raise ValueError(f"Profile interval must be positive, got {interval}.")
+        self.directory = directory
+        self.rate = rate
+        self.mode = mode
+        self.interval = interval
+        self._busy = threading.Lock()
+        self._sequence = itertools.count(1)
+
+    def _wanted(self, force: bool) -> bool:
+        return force or (self.rate > 0 and random.random() < self.rate)
+
+    @contextlib.asynccontextmanager
+    async def profile(self, tool: str, force: bool = False) -> AsyncIterator[Optional[Path]]:
+        """
+        Profiles the body of the async with-block if this call is sampled (or forced).
+
+        Yields:
+            The dump path without its suffix, or None if the call is not profiled.
+            Failing to write the dumps is logged, never raised.
+        """
+        if not self._wanted(force):
+            yield None
+            return
+        if not self._busy.acquire(blocking=False):
+            logger.debug("Not profiling '%s': another call is being profiled.", tool)
+            yield None
+            return
+        try:
+            sampler = StackSampler(self.interval)
+            sampler.start()
+            deterministic = None
+            if self.mode == "cprofile":
+                deterministic = cProfile.Profile()
+                try:
+                    deterministic.enable()
+                except ValueError as e:
+                    # Another profiler (e.g. a debugger) already owns the interpreter hooks
+                    logger.warning("Deterministic profiling unavailable, sampling only: %s", e)
+                    deterministic = None
+            # The pid keeps stems unique when several server processes share the directory
+            stem = self.directory / f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{next(self._sequence):06d}-{re.sub(r'[^A-Za-z0-9_-]', '_', tool)}"
+            started = time.perf_counter()
+            try:
+                yield stem
+            finally:
+                elapsed = time.perf_counter() - started
+                if deterministic:
+                    deterministic.disable()
+                await asyncio.to_thread(self._finish, stem, sampler, deterministic)
+                logger.info("Profiled '%s' (%.1f ms, %d samples): %s.*", tool, elapsed * 1000, sampler.samples, stem)
+        finally:
+            self._busy.release()
+
+    def _finish(self, stem: Path, sampler: StackSampler, deterministic: Optional[cProfile.Profile]) -> None:
+        # Joins the sampler thread and does file I/O, so it runs off the event loop
+        stacks = sampler.stop()
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            write_collapsed(stacks, Path(f"{stem}.collapsed"))
+            if deterministic:
+                deterministic.dump_stats(f"{stem}.prof")
+        except OSError as e:
+            logger.warning("Could not write profile %s: %s", stem, e)
@@ -0,0 +1,113 @@
+# src/mcp_server/gmail/query_cache.py
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional
+
+DEFAULT_TTL = 300.0
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+DEFAULT_FRESHNESS = 1.0
+# Rough per-entry and per-ID bookkeeping overhead used for the memory budget
+_ENTRY_OVERHEAD = 200
+_ID_OVERHEAD = 60
+
+
+@dataclass
+class _Entry:
+    message_ids: List[str]
+    history_id: str
+    # True if the listing ended before max_results, i.e. these are all the matches
+    complete: bool
+    stored_at: float
+    size: int
+
+
+class QueryCache:
+    """
+    Caches the ordered message IDs matching each search query.
+
+    A query's results can only change when the mailbox does, so each entry
+    records the mailbox historyId it was computed at and is served only
+    while the mailbox is still at that historyId. Checking that costs one
+    users.getProfile call; the observed historyId is trusted for
+    `freshness` seconds so bursts of cached queries skip even that.
+
+    Entries also expire after `ttl` seconds, and the least recently used
+    ones are evicted to stay within `max_bytes`. Expired entries are swept
+    on every put, so queries that are never repeated don't keep holding
+    the budget.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES, freshness: float = DEFAULT_FRESHNESS):
+        """
+        Args:
+            ttl: Seconds an entry may be served, even if the mailbox is unchanged.
+            max_bytes: Approximate memory budget for all entries.
+            freshness: Seconds an observed mailbox historyId is trusted without re-checking.
+        """
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.freshness = freshness
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._history_id: Optional[str] = None
+        self._history_id_seen_at = 0.0
+
+    def fresh_history_id(self) -> Optional[str]:
+        """Returns the last observed mailbox historyId if it is recent enough to trust."""
+        if self._history_id is not None and time.monotonic() - self._history_id_seen_at < self.freshness:
+            return self._history_id
+        return None
+
+    def note_history_id(self, history_id: str) -> None:
+        """Records the mailbox historyId just observed (from getProfile or a history sync)."""
+        self._history_id = history_id
+        self._history_id_seen_at = time.monotonic()
+
+    def get(self, query: str, max_results: int, history_id: str) -> Optional[List[str]]:
+        """
+        Returns up to max_results cached IDs for query, or None on a miss.
+
+        Entries computed at a different historyId, older than the TTL, or
+        holding too few IDs for max_results count as misses; stale ones are
+        dropped.
+        """
+        entry = self._entries.get(query)
+        if entry is not None and (entry.history_id != history_id or time.monotonic() - entry.stored_at > self.ttl):
+            self._remove(query)
+            entry = None
+        if entry is None or (not entry.complete and len(entry.message_ids) < max_results):
+            self.misses += 1
+            return None
+        self._entries.move_to_end(query)
+        self.hits += 1
+        return entry.message_ids[:max_results]
+
+    def put(self, query: str, message_ids: List[str], history_id: str, complete: bool) -> None:
+        """Stores the listing of query taken at history_id, evicting expired entries, then LRU ones over the memory budget."""
+        self._sweep()
+        size = _ENTRY_OVERHEAD + len(query) + sum(len(message_id) + _ID_OVERHEAD for message_id in message_ids)
+        if size > self.max_bytes:
+            return
+        self._remove(query)
+        self._entries[query] = _Entry(message_ids, history_id, complete, time.monotonic(), size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def _sweep(self) -> None:
+        # LRU order is not storage order, so every entry is checked; a put follows a Gmail listing anyway
+        expired_before = time.monotonic() - self.ttl
+        for query in [query for query, entry in self._entries.items() if entry.stored_at < expired_before]:
+            self._remove(query)
+
+    def _remove(self, query: str) -> None:
+        entry = self._entries.pop(query, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and current memory use."""
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self._bytes}
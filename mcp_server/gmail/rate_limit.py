@@ -0,0 +1,198 @@
+# src/mcp_server/gmail/rate_limit.py
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from googleapiclient.errors import HttpError
+
+# Gmail's per-user limit is 15,000 quota units per minute
+DEFAULT_QUOTA_UNITS_PER_SECOND = 250
+DEFAULT_MAX_CONCURRENCY = 16
+
+# Quota units charged by Gmail per method call (a batch costs the sum of its calls)
+QUOTA_UNITS = {
+    "users.getProfile": 1,
+    "users.history.list": 2,
+    "users.messages.list": 5,
+    "users.messages.get": 5,
+}
+
+# Statuses Gmail uses to say "slow down"
+THROTTLE_STATUSES = {429, 503}
+
+
+def is_throttle_error(error: Exception) -> bool:
+    """Returns True if the error is Gmail rejecting a call for rate or load reasons."""
+    if not isinstance(error, HttpError):
+        return False
+    if error.resp.status in THROTTLE_STATUSES:
+        return True
+    # Per-user rate limits can also come back as 403 rateLimitExceeded
+    return error.resp.status == 403 and "rateLimitExceeded" in str(error.content)
+
+
+class TokenBucket:
+    """Token bucket measured in Gmail quota units, refilled continuously."""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: Units added per second.
+            capacity: Maximum units that can accumulate (the burst size).
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        # Held while waiting, so callers are served in arrival order
+        self._lock = asyncio.Lock()
+        # Guards the balance itself, which charge() also updates from pool worker threads
+        self._balance_lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, units: float) -> None:
+        """
+        Waits until `units` tokens are available and takes them.
+
+        A call costing more than the bucket holds (e.g. a large batch) waits
+        for a full bucket and then drives it negative, so the calls after it
+        wait to pay off the excess instead of it never proceeding.
+        """
+        needed = min(units, self.capacity)
+        async with self._lock:
+            while True:
+                with self._balance_lock:
+                    self._refill()
+                    shortfall = needed - self._tokens
+                    if shortfall <= 0:
+                        self._tokens -= units
+                        return
+                await asyncio.sleep(shortfall / self.rate)
+
+    def charge(self, units: float) -> float:
+        """
+        Takes `units` tokens immediately, going into debt if they are not there.
+
+        For blocking callers (pool worker threads), which cannot wait on the
+        event loop: safe from any thread, and the calls acquiring after it
+        pay off the debt as with acquire().
+
+        Returns:
+            Seconds the caller should wait before sending, as acquire() would have.
+        """
+        needed = min(units, self.capacity)
+        with self._balance_lock:
+            self._refill()
+            wait = max(0.0, needed - self._tokens) / self.rate
+            self._tokens -= units
+        return wait
+
+
+class AdaptiveConcurrency:
+    """
+    Concurrency limit tuned by additive-increase / multiplicative-decrease.
+
+    Each successful call raises the limit by 1/limit (about +1 per full
+    window of calls); a throttled call halves it, at most once per cooldown
+    so one burst of 429s doesn't collapse the limit to the minimum.
+    """
+
+    def __init__(self, maximum: int, minimum: int = 1, decrease_factor: float = 0.5, cooldown: float = 1.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.limit = float(maximum)
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self) -> None:
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def on_throttle(self) -> None:
+        # May be called from pool worker threads; only touches plain floats
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(self.minimum, self.limit * self.decrease_factor)
+
+
+class QuotaLimiter:
+    """
+    Paces Gmail calls for one mailbox by quota units and adaptive concurrency.
+
+    One instance is shared by every tool call using the same mailbox, since
+    Gmail enforces its limits per user.
+    """
+
+    def __init__(self, units_per_second: float = DEFAULT_QUOTA_UNITS_PER_SECOND, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        """
+        Args:
+            units_per_second: Sustained quota units per second (also the burst size).
+            max_concurrency: Upper bound for the adaptive in-flight call limit.
+        """
+        self.bucket = TokenBucket(rate=units_per_second, capacity=units_per_second)
+        self.concurrency = AdaptiveConcurrency(maximum=max_concurrency)
+        self.throttled = 0
+
+    @asynccontextmanager
+    async def slot(self, units: float) -> AsyncIterator[None]:
+        """
+        Holds quota and a concurrency slot for the duration of one call.
+
+        Example:
+            async with limiter.slot(QUOTA_UNITS["users.messages.list"]):
+                page = await client.list_message_ids(...)
+        """
+        await self.bucket.acquire(units)
+        await self.concurrency.acquire()
+        try:
+            yield
+        except Exception as e:
+            if is_throttle_error(e):
+                self.on_throttle()
+            raise
+        else:
+            self.concurrency.on_success()
+        finally:
+            await self.concurrency.release()
+
+    async def charge(self, units: float) -> None:
+        """
+        Takes quota for a retry of a call that already holds a concurrency slot.
+
+        Waits like slot() does; blocking code uses charge_blocking() instead.
+        """
+        await self.bucket.acquire(units)
+
+    def charge_blocking(self, units: float) -> float:
+        """
+        Takes quota for a retry from a pool worker thread, without waiting.
+
+        Returns:
+            Seconds the caller should wait before sending the retry.
+        """
+        return self.bucket.charge(units)
+
+    def on_throttle(self) -> None:
+        """Records a throttled call (including one inside a batch) and backs off."""
+        self.throttled += 1
+        self.concurrency.on_throttle()
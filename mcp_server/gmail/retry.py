@@ -0,0 +1,177 @@
+# src/mcp_server/gmail/retry.py
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+import httpx
+from googleapiclient.errors import HttpError
+
+from .cancellation import current_token
+from .rate_limit import QuotaLimiter, is_throttle_error
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BASE_DELAY = 0.5
+DEFAULT_MAX_DELAY = 30.0
+
+# Server-side failures worth retrying; throttling (429/503/rateLimitExceeded) is covered by is_throttle_error
+RETRYABLE_STATUSES = {500, 502, 504}
+# Network-level failures worth retrying, for both backends
+TRANSIENT_EXCEPTIONS = (TimeoutError, ConnectionError, httpx.TransportError)
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Returns True for errors that are likely to succeed if the call is repeated."""
+    if isinstance(error, HttpError):
+        return is_throttle_error(error) or error.resp.status in RETRYABLE_STATUSES
+    return isinstance(error, TRANSIENT_EXCEPTIONS)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Returns the Retry-After delay (in seconds) Gmail sent with the error, if any."""
+    if not isinstance(error, HttpError):
+        return None
+    value = error.resp.get("retry-after")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        # HTTP-date form; not worth parsing for Gmail, fall back to backoff
+        return None
+
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of overall traffic.
+
+    Every first attempt deposits `ratio` tokens and every retry withdraws
+    one, plus a small steady trickle so an idle client can still retry. When
+    Gmail is overloaded and most calls fail, retries stop once the budget
+    is spent instead of multiplying the load.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, max_tokens: float = 20.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._updated = time.monotonic()
+        # Shared by pool worker threads and the event loop
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def deposit(self) -> None:
+        """Records a first attempt."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Takes one retry token; returns False if the budget is exhausted."""
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, Retry-After support and a shared retry budget."""
+
+    def __init__(self, max_attempts: int = DEFAULT_MAX_ATTEMPTS, base_delay: float = DEFAULT_BASE_DELAY,
+                 max_delay: float = DEFAULT_MAX_DELAY, budget: Optional[RetryBudget] = None):
+        """
+        Args:
+            max_attempts: Attempts per call, including the first (1 disables retries).
+            base_delay: Backoff ceiling in seconds for the first retry; doubles per retry.
+            max_delay: Upper bound in seconds for any single wait, including Retry-After.
+            budget: Retry budget shared by every call made with this policy.
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget if budget is not None else RetryBudget()
+
+    def retry_delay(self, attempt: int, errors: Iterable[Exception]) -> Optional[float]:
+        """
+        Decides whether to retry after a failed attempt, and how long to wait.
+
+        Args:
+            attempt: Zero-based index of the attempt that just failed.
+            errors: The error(s) from that attempt (several for a batch).
+
+        Returns:
+            The delay in seconds, or None if the call should not be retried
+            (non-transient error, attempts exhausted or budget spent).
+        """
+        errors = list(errors)
+        if not errors or not all(is_retryable_error(error) for error in errors):
+            return None
+        if attempt + 1 >= self.max_attempts or not self.budget.withdraw():
+            return None
+        # Full jitter: uniform over [0, base * 2^attempt]
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = max((_retry_after(error) or 0.0 for error in errors), default=0.0)
+        return min(self.max_delay, max(delay, retry_after))
+
+    def call(self, func: Callable[[], Any], on_retry: Optional[Callable[[Exception], None]] = None,
+             limiter: Optional[QuotaLimiter] = None, units: float = 0) -> Any:
+        """
+        Calls func, retrying transient failures with blocking sleeps.
+
+        Args:
+            func: Zero-argument callable, e.g. a googleapiclient request's execute.
+            on_retry: Called with the error before each retry.
+            limiter: Quota limiter the first attempt was paced by; each retry
+                is charged `units` to it before being sent.
+            units: Quota units one attempt costs.
+
+        Raises:
+            Exception: The last error once the call is not retried any more.
+        """
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                return func()
+            except Exception as e:
+                delay = self.retry_delay(attempt, [e])
+                if delay is None:
+                    raise
+                if limiter:
+                    # Waits out the backoff and the quota debt together
+                    delay = max(delay, limiter.charge_blocking(units))
+                logger.warning("Transient Gmail error (%s); retry %s in %.2fs", e, attempt + 1, delay)
+                if on_retry:
+                    on_retry(e)
+                # Cut short if the call is cancelled while backing off
+                current_token().sleep(delay)
+                attempt += 1
+
+    async def call_async(self, func: Callable[[], Awaitable[Any]], on_retry: Optional[Callable[[Exception], None]] = None,
+                         limiter: Optional[QuotaLimiter] = None, units: float = 0) -> Any:
+        """Async counterpart of call; func returns a fresh awaitable on each attempt."""
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                return await func()
+            except Exception as e:
+                delay = self.retry_delay(attempt, [e])
+                if delay is None:
+                    raise
+                logger.warning("Transient Gmail error (%s); retry %s in %.2fs", e, attempt + 1, delay)
+                if on_retry:
+                    on_retry(e)
+                await asyncio.sleep(delay)
+                if limiter:
+                    await limiter.charge(units)
+                attempt += 1
@@ -1,9 +1,17 @@
 # src/mcp_server/gmail/server.py
+import argparse
 import json
 import asyncio
+import contextlib
+import inspect
+import logging
+import math
+import os
 import sys
+import threading
+import time
 from pathlib import Path
-from typing import List
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional
 
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
@@ -17,10 +25,29 @@ from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
 
 # Import the new client
-from .gmail_client import GmailApiClient
+from .gmail_client import GmailApiClient, ListPosition, MessageIdPage, MAX_BATCH_SIZE
+from .async_gmail_client import AsyncGmailApiClient
+from .accounts import AccountPool, account_token_file, normalize_account
+from .cassette import Cassette
+from .credential_manager import CredentialManager, save_credentials
+from .mailbox import Mailbox, GmailClient
+from .logging_config import configure_logging
+from .metadata_cache import MessageMetadataCache
+from .metrics import REGISTRY, RESPONSE_BYTES, TOOL_ERRORS, TOOL_LATENCY, TOOLS_IN_FLIGHT, serve_metrics
+from .profiling import CallProfiler
+from .pagination import Cursor, Listing, decode_cursor, encode_cursor
+from .query_cache import QueryCache
+from .unread_sync import UnreadView
+from .rate_limit import QuotaLimiter, QUOTA_UNITS
+from .service_pool import load_discovery_document
+from .retry import RetryPolicy
+from .streaming import ProgressStream
+from googleapiclient.discovery import build_from_document
 # Import HttpError to potentially catch errors propagated from the client
 from googleapiclient.errors import HttpError
 
+logger = logging.getLogger(__name__)
+
 
 # --- Constants ---
 SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
@@ -30,103 +57,267 @@ BASE_DIR = Path(__file__).resolve().parent.parent.parent
 SECRETS_DIR = BASE_DIR / "secrets"
 TOKEN_FILE = SECRETS_DIR / "token.json"
 CREDENTIALS_FILE = SECRETS_DIR / "credentials.json"
+# Worker threads (each with its own HTTP transport) used for Gmail API calls
+POOL_SIZE = int(os.environ.get("GMAIL_POOL_SIZE", "8"))
+# Optional pinned Gmail discovery document; the copy bundled with googleapiclient is used otherwise
+DISCOVERY_FILE = Path(os.environ["GMAIL_DISCOVERY_FILE"]) if os.environ.get("GMAIL_DISCOVERY_FILE") else None
+# "threaded" (googleapiclient on a thread pool) or "async" (httpx, no threads)
+BACKEND = os.environ.get("GMAIL_BACKEND", "threaded")
+# On-disk message metadata cache; a size of 0 disables it
+METADATA_CACHE_FILE = Path(os.environ.get("GMAIL_METADATA_CACHE_FILE", BASE_DIR / "cache" / "message_metadata.db"))
+METADATA_CACHE_SIZE = int(os.environ.get("GMAIL_METADATA_CACHE_SIZE", "10000"))
+# Keep list_unread current from the History API instead of re-listing on every poll
+INCREMENTAL_SYNC = os.environ.get("GMAIL_INCREMENTAL_SYNC", "1") != "0"
+# search_emails result cache: entry TTL in seconds (0 disables), memory budget, and how long
+# an observed mailbox historyId is trusted before re-checking it
+QUERY_CACHE_TTL = float(os.environ.get("GMAIL_QUERY_CACHE_TTL", "300"))
+QUERY_CACHE_MAX_BYTES = int(os.environ.get("GMAIL_QUERY_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+QUERY_CACHE_FRESHNESS = float(os.environ.get("GMAIL_QUERY_CACHE_FRESHNESS", "1"))
+# Per-mailbox pacing: sustained quota units per second (0 disables) and the adaptive concurrency ceiling
+QUOTA_UNITS_PER_SECOND = float(os.environ.get("GMAIL_QUOTA_UNITS_PER_SECOND", "250"))
+MAX_CONCURRENCY = int(os.environ.get("GMAIL_MAX_CONCURRENCY", "16"))
+# Attempts per Gmail call for transient errors (429/5xx/network), including the first; 1 disables retries
+MAX_ATTEMPTS = int(os.environ.get("GMAIL_MAX_ATTEMPTS", "4"))
+# Default per-call deadline in seconds (0 disables); past it, tools return what they have plus a cursor
+TOOL_DEADLINE = float(os.environ.get("GMAIL_TOOL_DEADLINE", "0"))
+# Largest max_results a single call may use (0 disables the cap); callers page past it with next_cursor
+MAX_RESULTS_LIMIT = int(os.environ.get("GMAIL_MAX_RESULTS_LIMIT", "100"))
+# Logging goes to stderr (stdout is the MCP transport) unless a file is given; format is "text" or "json"
+LOG_LEVEL = os.environ.get("GMAIL_LOG_LEVEL", "INFO")
+LOG_FILE = Path(os.environ["GMAIL_LOG_FILE"]) if os.environ.get("GMAIL_LOG_FILE") else None
+LOG_FORMAT = os.environ.get("GMAIL_LOG_FORMAT", "text")
+# Optional Prometheus endpoint (http://HOST:PORT/metrics); unset or 0 disables it
+METRICS_PORT = int(os.environ.get("GMAIL_METRICS_PORT", "0"))
+METRICS_HOST = os.environ.get("GMAIL_METRICS_HOST", "127.0.0.1")
+# Optional Gmail API root URL, e.g. the local emulator (python -m mcp_server.gmail.emulator).
+# OAuth is skipped when it is set: the emulator accepts any bearer token.
+API_ROOT = os.environ.get("GMAIL_API_ROOT") or None
+EMULATOR_TOKEN = "emulator"
+# Record redacted Gmail traffic and tool calls to a cassette, or replay Gmail from one (OAuth is
+# skipped); replayed latencies are multiplied by the time scale (0 answers immediately)
+RECORD_FILE = Path(os.environ["GMAIL_RECORD_FILE"]) if os.environ.get("GMAIL_RECORD_FILE") else None
+REPLAY_FILE = Path(os.environ["GMAIL_REPLAY_FILE"]) if os.environ.get("GMAIL_REPLAY_FILE") else None
+REPLAY_TIME_SCALE = float(os.environ.get("GMAIL_REPLAY_TIME_SCALE", "1"))
+# Per-call profiling: fraction of tool calls profiled (0 disables; the debug_profile argument forces it),
+# "sampling" (collapsed stacks of all threads) or "cprofile" (adds a .prof), sample interval and output directory
+PROFILE_RATE = float(os.environ.get("GMAIL_PROFILE_RATE", "0"))
+PROFILE_MODE = os.environ.get("GMAIL_PROFILE_MODE", "sampling")
+PROFILE_INTERVAL_MS = float(os.environ.get("GMAIL_PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = Path(os.environ.get("GMAIL_PROFILE_DIR", BASE_DIR / "profiles"))
+# Refresh the OAuth access token in the background this many seconds before it expires
+TOKEN_REFRESH_MARGIN = float(os.environ.get("GMAIL_TOKEN_REFRESH_MARGIN", "600"))
+# Seconds the browser OAuth flow waits for the user to finish signing in (0 waits forever)
+OAUTH_TIMEOUT = float(os.environ.get("GMAIL_OAUTH_TIMEOUT", "300"))
+# Extra mailboxes selected with the tools' account argument: token directory (filled by
+# gmail-server --authorize ADDRESS), open mailboxes kept before LRU eviction, and idle seconds before closing one
+ACCOUNTS_DIR = Path(os.environ.get("GMAIL_ACCOUNTS_DIR", SECRETS_DIR / "accounts"))
+MAX_OPEN_ACCOUNTS = int(os.environ.get("GMAIL_MAX_OPEN_ACCOUNTS", "32"))
+ACCOUNT_IDLE_TIMEOUT = float(os.environ.get("GMAIL_ACCOUNT_IDLE_TIMEOUT", "900"))
+
+
+def _open_cassette() -> Optional[Cassette]:
+    """
+    Opens the configured record or replay cassette, if any.
+
+    Raises:
+        RuntimeError: If both are configured or the cassette cannot be opened.
+    """
+    if RECORD_FILE and REPLAY_FILE:
+        raise RuntimeError("Set GMAIL_RECORD_FILE or GMAIL_REPLAY_FILE, not both.")
+    try:
+        if RECORD_FILE:
+            return Cassette(RECORD_FILE, mode="record")
+        if REPLAY_FILE:
+            return Cassette(REPLAY_FILE, mode="replay", time_scale=REPLAY_TIME_SCALE)
+    except (OSError, ValueError) as e:
+        raise RuntimeError(f"Could not open cassette: {e}") from e
+    return None
+
+
+def _create_client(creds: Credentials, cassette: Optional[Cassette] = None) -> GmailClient:
+    """Builds the Gmail client for the configured BACKEND."""
+    limiter = QuotaLimiter(QUOTA_UNITS_PER_SECOND, MAX_CONCURRENCY) if QUOTA_UNITS_PER_SECOND > 0 else None
+    retry_policy = RetryPolicy(max_attempts=MAX_ATTEMPTS)
+    if BACKEND == "threaded":
+        return GmailApiClient(credentials=creds, pool_size=POOL_SIZE, discovery_file=DISCOVERY_FILE,
+                              limiter=limiter, retry_policy=retry_policy, api_root=API_ROOT, cassette=cassette)
+    if BACKEND == "async":
+        # POOL_SIZE bounds pooled connections instead of threads here
+        return AsyncGmailApiClient(credentials=creds, max_connections=POOL_SIZE,
+                                   limiter=limiter, retry_policy=retry_policy, api_root=API_ROOT, cassette=cassette)
+    raise RuntimeError(f"Unknown GMAIL_BACKEND '{BACKEND}' (expected 'threaded' or 'async').")
+
+
+def _open_metadata_cache(account: Optional[str] = None) -> Optional[MessageMetadataCache]:
+    """Opens the (default or per-account) message metadata cache, or returns None if it is disabled or unusable."""
+    if METADATA_CACHE_SIZE <= 0:
+        logger.info("Message metadata cache disabled.")
+        return None
+    path = METADATA_CACHE_FILE
+    if account:
+        path = path.with_name(f"{path.stem}-{account}{path.suffix}")
+    try:
+        return MessageMetadataCache(path, max_entries=METADATA_CACHE_SIZE)
+    except Exception as e:
+        # The cache is an optimization; run without it rather than fail startup
+        logger.warning("Could not open message metadata cache, continuing without it: %s", e)
+        return None
+
+
+def _create_mailbox(client: GmailClient, credentials: Optional[CredentialManager] = None, account: Optional[str] = None, cassette: Optional[Cassette] = None) -> Mailbox:
+    """
+    Wraps a client with the configured caches and views, and its token refresher if any.
+
+    With a cassette there is no metadata cache: a recording must contain
+    every messages.get it will be asked to answer, and replayed details are
+    redacted, so they must never land in the persistent cache.
+    """
+    if cassette:
+        logger.info("Message metadata cache disabled while a cassette is in use.")
+    return Mailbox(
+        client=client,
+        credentials=credentials,
+        cache=None if cassette else _open_metadata_cache(account),
+        unread_view=UnreadView() if INCREMENTAL_SYNC else None,
+        query_cache=QueryCache(QUERY_CACHE_TTL, QUERY_CACHE_MAX_BYTES, QUERY_CACHE_FRESHNESS) if QUERY_CACHE_TTL > 0 else None,
+    )
 
 # --- Credentials Function ---
-def get_credentials():
-    """Get valid user credentials from storage or through OAuth flow."""
+class _StderrAppFlow(InstalledAppFlow):
+    """InstalledAppFlow that shows the authorization URL on stderr; stdout carries the MCP protocol."""
+
+    def authorization_url(self, **kwargs):
+        url, state = super().authorization_url(**kwargs)
+        print(f"Please visit this URL to authorize this application: {url}", file=sys.stderr, flush=True)
+        return url, state
+
+
+def get_credentials(token_file: Path = TOKEN_FILE, interactive: bool = True):
+    """
+    Get valid user credentials from storage or through OAuth flow.
+
+    Args:
+        token_file: Token to load, refresh and save (the default account's, or one under ACCOUNTS_DIR).
+        interactive: Whether the browser OAuth flow may run when there is no usable token.
+    """
     creds = None
-    print(f"Secrets directory: {SECRETS_DIR}")
-    SECRETS_DIR.mkdir(parents=True, exist_ok=True) # Ensure parent dirs exist
+    logger.debug("Token file: %s", token_file)
 
     # Load existing credentials from JSON file
-    if TOKEN_FILE.exists():
-        print(f"Token file found at {TOKEN_FILE}, attempting to load.")
+    if token_file.exists():
+        logger.info("Token file found at %s, attempting to load.", token_file)
         try:
-            creds = Credentials.from_authorized_user_file(str(TOKEN_FILE), SCOPES)
-            print("Credentials loaded from token file.")
+            creds = Credentials.from_authorized_user_file(str(token_file), SCOPES)
+            logger.info("Credentials loaded from token file.")
         except Exception as e:
-            print(f"Error loading credentials from token file: {e}", file=sys.stderr)
+            logger.error("Error loading credentials from token file: %s", e)
             creds = None # Ensure creds is None if loading failed
     else:
-        print(f"Token file not found at {TOKEN_FILE}.")
+        logger.info("Token file not found at %s.", token_file)
 
     # If no valid credentials, go through OAuth flow or refresh
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
-            print("Credentials expired, attempting to refresh...")
+            logger.info("Credentials expired, attempting to refresh...")
             try:
                 creds.refresh(Request())
-                print("Credentials refreshed successfully.")
+                logger.info("Credentials refreshed successfully.")
             except Exception as e:
-                print(f"Failed to refresh token: {e}", file=sys.stderr)
+                logger.error("Failed to refresh token: %s", e)
                 # Force re-auth if refresh fails
                 creds = None
-                print("Refresh failed, proceeding to OAuth flow.")
+                logger.info("Refresh failed, proceeding to OAuth flow.")
         else:
              # This branch is hit if no creds loaded, or creds are invalid without refresh token
-             print("No valid credentials found, initiating OAuth flow.")
+             logger.info("No valid credentials found, initiating OAuth flow.")
 
         # Re-check creds after potential refresh attempt or if initial load failed
         if not creds or not creds.valid:
+            if not interactive:
+                raise RuntimeError(f"No usable token in {token_file}; authorize the account with gmail-server --authorize ADDRESS.")
             if not CREDENTIALS_FILE.exists():
-                print(f"Credentials file missing at {CREDENTIALS_FILE}", file=sys.stderr)
+                logger.error("Credentials file missing at %s", CREDENTIALS_FILE)
                 raise FileNotFoundError(
                     f"Credentials file not found at {CREDENTIALS_FILE}. "
                     "Please download OAuth 2.0 Client ID credentials (Desktop app) "
                     "from Google Cloud Console and save as 'credentials.json' in the 'secrets' directory."
                 )
 
-            print(f"Using credentials file: {CREDENTIALS_FILE}")
+            logger.info("Using credentials file: %s", CREDENTIALS_FILE)
             try:
-                flow = InstalledAppFlow.from_client_secrets_file(
+                flow = _StderrAppFlow.from_client_secrets_file(
                     str(CREDENTIALS_FILE), SCOPES
                 )
-                print("Starting local server for OAuth authentication...")
-                # run_local_server will print instructions and open a browser
-                creds = flow.run_local_server(port=0)
-                print("OAuth flow completed, credentials obtained.")
+                logger.info("Starting local server for OAuth authentication...")
+                # The default prompt is printed to stdout; _StderrAppFlow shows the URL instead
+                creds = flow.run_local_server(port=0, authorization_prompt_message=None,
+                                              timeout_seconds=OAUTH_TIMEOUT or None)
+                logger.info("OAuth flow completed, credentials obtained.")
             except Exception as e:
-                 print(f"Error during OAuth flow: {e}", file=sys.stderr)
+                 logger.error("Error during OAuth flow: %s", e)
                  raise RuntimeError(f"OAuth flow failed: {e}") from e
 
         # Save the potentially new or refreshed credentials
         if creds:
              try:
-                 with open(TOKEN_FILE, "w") as token:
-                     token.write(creds.to_json())
-                 print(f"Credentials saved to {TOKEN_FILE}")
+                 save_credentials(creds, token_file)
+                 logger.info("Credentials saved to %s", token_file)
              except Exception as e:
-                 print(f"Error saving token file {TOKEN_FILE}: {e}", file=sys.stderr)
+                 logger.error("Error saving token file %s: %s", token_file, e)
                  # Don't raise here, we might still have valid creds in memory
 
     # Final check
     if not creds or not creds.valid:
          raise RuntimeError("Failed to obtain valid credentials after all attempts.")
 
-    print("Credentials ready.")
+    logger.info("Credentials ready.")
     return creds
 
 
 # --- Tool Definitions (Removed 'required' field) ---
+def _max_results_cap_note() -> str:
+    return f", at most {MAX_RESULTS_LIMIT} per call" if MAX_RESULTS_LIMIT > 0 else ""
+
+
 async def _get_tool_definitions() -> list[Tool]:
     """Returns the list of tool definitions."""
     return [
         Tool(
             name="list_unread",
-            description="List unread Gmail message snippets.",
+            description="List unread Gmail message snippets, newest first. If the result has a next_cursor, pass it as cursor to get the next page.",
             inputSchema={
                 "type": "object",
                 "properties": {
                     "max_results": {
                         "type": "integer",
-                        "description": "Maximum number of messages to return (default: 10)",
-                    }
+                        "description": f"Maximum number of messages to return (default: 10{_max_results_cap_note()})",
+                    },
+                    "stream": {
+                        "type": "boolean",
+                        "description": "Send messages in progress notifications as they arrive and return only a summary (requires a progressToken)",
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": "next_cursor from a previous result, to continue after the messages it returned",
+                    },
+                    "deadline_seconds": {
+                        "type": "number",
+                        "description": "Return what has been fetched after this many seconds, with a cursor for the rest",
+                    },
+                    "debug_profile": {
+                        "type": "boolean",
+                        "description": "Profile this call; the dumps are written to the server's profile directory",
+                    },
+                    "account": {
+                        "type": "string",
+                        "description": "Gmail address of another authorized mailbox to use (default: the server's own account)",
+                    },
                 },
             },
         ),
         Tool(
             name="search_emails",
-            description="Search emails with a Gmail query.",
+            description="Search emails with a Gmail query. If the result has a next_cursor, pass it as cursor to get the next page.",
             inputSchema={
                 "type": "object",
                 "properties": {
@@ -136,120 +327,697 @@ async def _get_tool_definitions() -> list[Tool]:
                     },
                     "max_results": {
                         "type": "integer",
-                        "description": "Maximum number of messages to return (default: 10)",
+                        "description": f"Maximum number of messages to return (default: 10{_max_results_cap_note()})",
+                    },
+                    "stream": {
+                        "type": "boolean",
+                        "description": "Send messages in progress notifications as they arrive and return only a summary (requires a progressToken)",
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": "next_cursor from a previous result, to continue after the messages it returned",
+                    },
+                    "deadline_seconds": {
+                        "type": "number",
+                        "description": "Return what has been fetched after this many seconds, with a cursor for the rest",
+                    },
+                    "debug_profile": {
+                        "type": "boolean",
+                        "description": "Profile this call; the dumps are written to the server's profile directory",
+                    },
+                    "account": {
+                        "type": "string",
+                        "description": "Gmail address of another authorized mailbox to use (default: the server's own account)",
                     },
                 },
                 # "required": ["query"], # REMOVED this line to fix Pydantic validation
             },
         ),
+        Tool(
+            name="server_stats",
+            description="Report server latency, Gmail API, retry, throttling and cache metrics.",
+            inputSchema={"type": "object", "properties": {}},
+        ),
     ]
 
 
 # --- Execute Tool (Uses GmailApiClient) ---
-async def _execute_tool(name: str, arguments: dict, client: GmailApiClient) -> list[TextContent]:
+# Callback receiving each page of (message_id, details) pairs as soon as it is fetched
+OnPage = Callable[[list[tuple[str, Optional[dict]]]], Awaitable[None]]
+
+
+def _quota_slot(client: GmailClient, units: int) -> contextlib.AbstractAsyncContextManager:
+    """Returns the client's quota slot for a call costing `units`, or a no-op if it has no limiter."""
+    if client.limiter is None:
+        return contextlib.nullcontext()
+    return client.limiter.slot(units)
+
+
+async def _call_client(client: GmailClient, method: Callable[..., Any], *args: Any, quota_units: int, **kwargs: Any) -> Any:
+    """
+    Awaits a client method, paced by the client's quota limiter.
+
+    Async methods are awaited directly; blocking ones run on the client's
+    service pool. Quota is acquired before the call is dispatched, so a
+    throttled call waits on the event loop rather than holding a worker.
+    """
+    async with _quota_slot(client, quota_units):
+        if inspect.iscoroutinefunction(method):
+            return await method(*args, **kwargs)
+        return await client.run_in_pool(method, *args, **kwargs)
+
+
+async def _iter_pages(client: GmailClient, **list_kwargs) -> AsyncIterator[MessageIdPage]:
+    """
+    Iterates client.iter_message_id_pages from async code for either backend.
+
+    Each step is charged as one messages.list call. Iteration stops once a
+    page shows the listing is complete, so the step that would only
+    discover the end (and make no request) is never taken or charged.
+    """
+    list_units = QUOTA_UNITS["users.messages.list"]
+    # Mirrors the clients' own loop condition: every step taken here makes a request
+    remaining = list_kwargs.get("max_results", 10)
+    position = list_kwargs.get("start") or ListPosition()
+    pages = client.iter_message_id_pages(**list_kwargs)
+    while remaining > 0 and position is not None:
+        if inspect.isasyncgen(pages):
+            async with _quota_slot(client, list_units):
+                page = await anext(pages, None)
+        else:
+            # Each next() issues a blocking messages.list call
+            page = await _call_client(client, next, pages, None, quota_units=list_units)
+        if page is None:
+            break
+        yield page
+        remaining -= len(page.messages)
+        position = page.end
+
+
+async def _fetch_and_cache(mailbox: Mailbox, ids: list[str]) -> dict[str, Optional[dict]]:
+    """Batch-fetches details and writes the successes to the metadata cache."""
+    batch = mailbox.client.get_messages_details_batch
+    if inspect.iscoroutinefunction(batch):
+        # The async client sends one request per message and paces each one itself
+        fetched = await batch(ids)
+    else:
+        fetched = await _call_client(mailbox.client, batch, ids, quota_units=QUOTA_UNITS["users.messages.get"] * len(ids))
+    if mailbox.cache:
+        # SQLite may wait on another process's lock; keep that off the event loop
+        await asyncio.to_thread(mailbox.cache.put_many, {message_id: details for message_id, details in fetched.items() if details})
+    return fetched
+
+
+async def _fetch_details(mailbox: Mailbox, ids: list[str]) -> dict[str, Optional[dict]]:
+    """
+    Returns details for the given IDs, serving cache hits locally.
+
+    Only cache misses are sent to Gmail (as one batch); successfully fetched
+    details are written back to the cache. Messages that another tool call
+    is already fetching are awaited from that fetch instead of requested
+    again; a batch is cancelled only once no call is waiting on it.
+    """
+    cache = mailbox.cache
+    cached = await asyncio.to_thread(cache.get_many, ids) if cache else {}
+    missing = [message_id for message_id in ids if message_id not in cached]
+    if cached:
+        logger.debug("Metadata cache: %s hits, %s misses.", len(cached), len(missing))
+
+    joined = {mailbox.detail_fetches.in_flight(message_id) for message_id in missing} - {None}
+    to_fetch = [message_id for message_id in missing if mailbox.detail_fetches.in_flight(message_id) is None]
+    if joined:
+        logger.debug("Joining %s in-flight detail fetches for %s messages.", len(joined), len(missing) - len(to_fetch))
+
+    fetches = list(joined)
+    if to_fetch:
+        # One batch round-trip per MAX_BATCH_SIZE messages instead of one call per message
+        fetch = asyncio.ensure_future(_fetch_and_cache(mailbox, to_fetch))
+        mailbox.detail_fetches.track(to_fetch, fetch)
+        fetches.append(fetch)
+
+    # Joined before the first await, so no fetch we looked up can lose its last waiter in between
+    for fetch in fetches:
+        mailbox.detail_fetches.join(fetch)
+    fetched = {}
+    try:
+        for details_by_id in await asyncio.gather(*(asyncio.shield(fetch) for fetch in fetches)):
+            fetched.update(details_by_id)
+    finally:
+        # Cancelling us releases every fetch we hold
+        for fetch in fetches:
+            mailbox.detail_fetches.leave(fetch)
+    return {**{message_id: fetched.get(message_id) for message_id in missing}, **cached}
+
+
+async def _fetch_page(
+    mailbox: Mailbox, ids: list[str], end: Optional[ListPosition],
+    listing: Listing, previous: Optional[asyncio.Task], on_page: Optional[OnPage],
+) -> None:
+    """Fetches one page's details and adds it to listing once every earlier page has been added."""
+    details_by_id = await _fetch_details(mailbox, ids)
+    page = [(message_id, details_by_id.get(message_id)) for message_id in ids]
+    if previous:
+        # Keep pages in listing order even when a later batch finishes first
+        await previous
+    listing.add_page(page, end)
+    if on_page:
+        await on_page(page)
+
+
+async def _await_pages(pages: list[asyncio.Task]) -> None:
+    """Awaits page tasks in order, cancelling the rest if one fails or the caller is cancelled."""
+    try:
+        for page in pages:
+            await page
+    finally:
+        for page in pages:
+            page.cancel()
+
+
+async def _list_and_fetch_details(mailbox: Mailbox, listing: Listing, on_page: Optional[OnPage] = None, **list_kwargs) -> None:
+    """
+    Lists message IDs page by page from listing.next_position and batch-fetches details for each page.
+
+    The detail batch for a page is started as soon as that page arrives, so
+    fetching details for page N overlaps with listing page N+1. Completed
+    pages are added to listing in order, so if this is cancelled (e.g. by
+    a deadline) listing still holds a resumable prefix.
+
+    Args:
+        mailbox: The mailbox to list (client, cache and in-flight fetches).
+        listing: Receives each page's (message_id, details) pairs.
+        on_page: Optional callback awaited with each page's (message_id, details)
+            pairs as soon as they are fetched, in listing order.
+        **list_kwargs: Passed through to client.iter_message_id_pages.
+
+    Raises:
+         HttpError: If a list call fails.
+    """
+    pages = []
+    try:
+        async for page in _iter_pages(mailbox.client, start=listing.next_position, **list_kwargs):
+            ids = [msg_ref['id'] for msg_ref in page.messages]
+            logger.debug("Listed %s messages. Fetching details...", len(ids))
+            previous = pages[-1] if pages else None
+            pages.append(asyncio.create_task(_fetch_page(mailbox, ids, page.end, listing, previous, on_page)))
+    except BaseException:
+        # Don't leave detail fetches orphaned if listing failed part-way
+        for page in pages:
+            page.cancel()
+        raise
+    await _await_pages(pages)
+
+
+async def _fetch_listed(
+    mailbox: Mailbox, ids: list[str], skip: int, end: Optional[ListPosition], listing: Listing, on_page: Optional[OnPage]
+) -> None:
+    """
+    Fetches details for known IDs that start at token-less position skip.
+
+    The IDs are fetched in MAX_BATCH_SIZE chunks, concurrently, and added
+    to listing in order like listed pages.
+    """
+    pages = []
+    for start in range(0, len(ids), MAX_BATCH_SIZE):
+        chunk = ids[start:start + MAX_BATCH_SIZE]
+        chunk_end = ListPosition(None, skip + start + len(chunk)) if start + len(chunk) < len(ids) else end
+        previous = pages[-1] if pages else None
+        pages.append(asyncio.create_task(_fetch_page(mailbox, chunk, chunk_end, listing, previous, on_page)))
+    await _await_pages(pages)
+
+
+async def _page_known_ids(mailbox: Mailbox, ids: list[str], max_results: int, listing: Listing, on_page: Optional[OnPage]) -> None:
+    """
+    Adds the page after listing.next_position from a locally known, newest-first ID list.
+
+    ids holds the first next_position.skip + max_results IDs (fewer if
+    that is all there are). If the list shifted since the cursor was
+    issued (new mail, messages read), the position is re-found just after
+    the cursor's anchor message, so nothing is repeated or skipped. If the
+    anchor itself is gone, the messages after it moved up one place.
+    """
+    requested = listing.next_position.skip + max_results
+    skip = listing.next_position.skip
+    if listing.anchor in ids:
+        skip = ids.index(listing.anchor) + 1
+    elif listing.anchor is not None:
+        skip = max(skip - 1, 0)
+    page = ids[skip:skip + max_results]
+    more = len(ids) >= requested or skip + len(page) < len(ids)
+    end = ListPosition(None, skip + len(page)) if more else None
+    await _fetch_listed(mailbox, page, skip, end, listing, on_page)
+
+
+async def _sync_unread_ids(mailbox: Mailbox, max_results: int) -> Optional[list[str]]:
+    """
+    Brings the unread view up to date and returns the newest unread IDs.
+
+    A synced view costs one users.history.list call; an unsynced one (first
+    poll, or an expired historyId) is rebuilt from a full UNREAD listing.
+
+    Returns:
+        Up to max_results message IDs, or None if the view cannot answer
+        (max_results exceeds what it tracks) and the caller should list normally.
+
+    Raises:
+         HttpError: If a Gmail call other than an expired-checkpoint 404 fails.
+    """
+    client, view = mailbox.client, mailbox.unread_view
+    if max_results > view.capacity:
+        return None
+    async with view.lock:
+        if view.history_id is not None:
+            try:
+                records, history_id = await _call_client(
+                    client, client.list_history, view.history_id,
+                    quota_units=QUOTA_UNITS["users.history.list"],
+                )
+                view.apply_history(records, history_id)
+            except HttpError as e:
+                if e.resp.status != 404:
+                    raise
+                logger.info("History checkpoint %s expired, resyncing unread view.", view.history_id)
+                view.invalidate()
+
+        if view.history_id is None:
+            # Read the checkpoint first so changes made during the listing are replayed next poll
+            history_id = await _call_client(client, client.get_history_id, quota_units=QUOTA_UNITS["users.getProfile"])
+            ids = []
+            async for page in _iter_pages(client, label_ids=["UNREAD"], max_results=view.capacity):
+                ids.extend(msg_ref['id'] for msg_ref in page.messages)
+            view.reset(ids, history_id)
+            logger.info("Unread view resynced: %s messages at historyId %s.", len(ids), history_id)
+
+        if mailbox.query_cache:
+            mailbox.query_cache.note_history_id(view.history_id)
+        return view.snapshot(max_results)
+
+
+async def _list_unread(mailbox: Mailbox, max_results: int, listing: Listing, on_page: Optional[OnPage] = None) -> None:
+    """Adds the newest unread messages after listing.next_position, from the unread view when it can answer."""
+    start = listing.next_position
+    unread_ids = None
+    if mailbox.unread_view and start.page_token is None:
+        unread_ids = await _sync_unread_ids(mailbox, start.skip + max_results)
+    if unread_ids is None:
+        await _list_and_fetch_details(mailbox, listing, on_page, label_ids=["UNREAD"], max_results=max_results)
+        return
+    await _page_known_ids(mailbox, unread_ids, max_results, listing, on_page)
+
+
+async def _current_history_id(mailbox: Mailbox) -> str:
+    """Returns the mailbox historyId, re-checking it only once the last observation goes stale."""
+    query_cache = mailbox.query_cache
+    history_id = query_cache.fresh_history_id()
+    if history_id is None:
+        # Concurrent searches share one getProfile call
+        client = mailbox.client
+        history_id = await mailbox.tool_calls.do(
+            ("users.getProfile",),
+            lambda: _call_client(client, client.get_history_id, quota_units=QUOTA_UNITS["users.getProfile"]),
+        )
+        query_cache.note_history_id(history_id)
+    return history_id
+
+
+async def _search(mailbox: Mailbox, query: str, max_results: int, listing: Listing, on_page: Optional[OnPage] = None) -> None:
     """
-    Executes the specified tool logic using the GmailApiClient.
+    Adds the messages matching query after listing.next_position, reusing a cached listing while the mailbox is unchanged.
+
+    On a miss the historyId is read before listing, so the stored entry can
+    only be older than its listing, never newer: a change made during the
+    listing causes a miss next time rather than a stale hit. Only listings
+    from the start are cached; continuations from a Gmail pageToken are not.
+    """
+    query_cache = mailbox.query_cache
+    start = listing.next_position
+    if query_cache is None or start.page_token is not None:
+        await _list_and_fetch_details(mailbox, listing, on_page, query=query, max_results=max_results)
+        return
+
+    history_id = await _current_history_id(mailbox)
+    cached_ids = query_cache.get(query, start.skip + max_results, history_id)
+    if cached_ids is not None:
+        logger.debug("Query cache hit for '%s' at historyId %s.", query, history_id)
+        await _page_known_ids(mailbox, cached_ids, max_results, listing, on_page)
+        return
+
+    await _list_and_fetch_details(mailbox, listing, on_page, query=query, max_results=max_results)
+    if start.skip == 0:
+        query_cache.put(query, [message_id for message_id, _ in listing.messages], history_id, complete=listing.next_position is None)
+
+
+def _normalize_query(query: str) -> str:
+    """Collapses whitespace so trivially different spellings of a query share work."""
+    return " ".join(query.split())
+
+
+def _is_number(value: Any, integer: bool = False) -> bool:
+    """Checks a numeric tool argument, since clients don't always follow the schema."""
+    # bool is an int subclass, so exclude it explicitly
+    if isinstance(value, bool) or not isinstance(value, int if integer else (int, float)):
+        return False
+    return not isinstance(value, float) or math.isfinite(value)
+
+
+def _format_messages(fetched: list[tuple[str, Optional[dict]]]) -> list[dict]:
+    """Turns (message_id, details) pairs into tool output, with a placeholder for each failed fetch."""
+    output = []
+    for message_id, details in fetched:
+        if details:
+            output.append(details)
+        else:
+            # Append a placeholder if fetching details failed (client returned None)
+            logger.warning("Failed to fetch details for message %s.", message_id)
+            output.append({
+                 "id": message_id,
+                 "error": "Failed to fetch message details",
+                 "subject": "Error", "from": "Error", "date": "Error", "snippet": ""
+             })
+    return output
+
+
+async def _run_until(deadline: Optional[float], work: Awaitable[None], listing: Listing) -> Listing:
+    """
+    Runs work until it finishes or the event-loop time deadline passes.
+
+    On the deadline the work is cancelled, along with any Gmail calls no
+    other tool call is waiting on, and listing keeps the pages that were
+    already done, marked partial if more remain.
+    """
+    timeout = asyncio.timeout_at(deadline)
+    try:
+        async with timeout:
+            await work
+    except TimeoutError:
+        if not timeout.expired():
+            raise
+        listing.partial = listing.next_position is not None
+        logger.warning("Deadline reached with %s messages fetched; returning partial results.", len(listing.messages))
+    return listing
+
+
+async def _execute_tool(name: str, arguments: dict, mailbox: Mailbox, stream: Optional[ProgressStream] = None) -> list[TextContent]:
+    """
+    Executes the specified tool logic against a mailbox.
+
+    Concurrent calls with the same normalized (tool, query, labels,
+    max_results, cursor, deadline) share one execution. Streaming calls run
+    on their own, since their pages must reach their own progress token,
+    but still share in-flight detail fetches.
+
+    Whenever more messages may follow, the result includes a "next_cursor"
+    that a later call can pass as `cursor` to continue after them. If the
+    call's deadline (the deadline_seconds argument, or GMAIL_TOOL_DEADLINE)
+    passes first, the messages completed so far are returned with
+    "partial": true.
 
     Args:
         name: The name of the tool to execute.
         arguments: The arguments for the tool.
-        client: An initialized GmailApiClient instance.
+        mailbox: The mailbox to serve (client, caches and in-flight work).
+        stream: If given, messages are sent through it page by page and the
+            result only summarizes what was streamed.
 
     Returns:
         A list containing one TextContent object with the results.
 
     Raises:
-         ValueError: If the tool name is unknown or required arguments are missing.
+         ValueError: If the tool name is unknown, required arguments are missing or the cursor is invalid.
          HttpError: If the underlying API list calls fail.
     """
-    output = []
-    message_ids = []
+    async def _send_page(page: list[tuple[str, Optional[dict]]]) -> None:
+        await stream.send_messages(_format_messages(page))
+
+    on_page = _send_page if stream else None
+
+    def run(key: tuple, fill: Callable[[Listing], Awaitable[None]], start: Cursor) -> Awaitable[Listing]:
+        def execute() -> Awaitable[Listing]:
+            listing = start.listing()
+            return _run_until(deadline, fill(listing), listing)
+        return execute() if stream else mailbox.tool_calls.do(key + (start, deadline_seconds), execute)
 
     try:
+        deadline_seconds = arguments.get("deadline_seconds", TOOL_DEADLINE)
+        if not _is_number(deadline_seconds) or deadline_seconds < 0:
+            raise ValueError(f"deadline_seconds must be a non-negative number, got {deadline_seconds!r}")
+        deadline = asyncio.get_running_loop().time() + deadline_seconds if deadline_seconds > 0 else None
+
+        cursor = arguments.get("cursor")
+        # Large requests are served in slices; callers continue with next_cursor
+        max_results = arguments.get("max_results", 10)
+        if not _is_number(max_results, integer=True) or max_results < 1:
+            raise ValueError(f"max_results must be a positive integer, got {max_results!r}")
+        if MAX_RESULTS_LIMIT > 0:
+            max_results = min(max_results, MAX_RESULTS_LIMIT)
+
         if name == "list_unread":
-            max_results = arguments.get("max_results", 10)
-            print(f"Calling client.list_message_ids for UNREAD (max: {max_results})")
-            # Call client method, can raise HttpError
-            message_ids = await asyncio.to_thread(client.list_message_ids, label_ids=["UNREAD"], max_results=max_results)
+            start = decode_cursor(cursor, name) if cursor else Cursor("")
+            logger.debug("Listing UNREAD messages (max: %s)", max_results)
+            # Can raise HttpError
+            key = (name, "", ("UNREAD",), max_results)
+            listing = await run(key, lambda listing: _list_unread(mailbox, max_results, listing, on_page), start)
 
         elif name == "search_emails":
             query = arguments.get("query")
+            start = None
+            if cursor:
+                # The query may be omitted when continuing from a cursor
+                start = decode_cursor(cursor, name)
+                query = query or start.query
+                if _normalize_query(query) != start.query:
+                    raise ValueError("Cursor was issued for a different query")
             # Check for missing or empty query, since schema doesn't enforce 'required'
             if not query:
                 raise ValueError("Missing or empty required argument: query")
-            max_results = arguments.get("max_results", 10)
-            print(f"Calling client.list_message_ids for query='{query}' (max: {max_results})")
-             # Call client method, can raise HttpError
-            message_ids = await asyncio.to_thread(client.list_message_ids, query=query, max_results=max_results)
+            query = _normalize_query(query)
+            start = start or Cursor(query)
+            logger.debug("Listing messages for query='%s' (max: %s)", query, max_results)
+            # Can raise HttpError
+            key = (name, query, (), max_results)
+            listing = await run(key, lambda listing: _search(mailbox, query, max_results, listing, on_page), start)
 
         else:
             raise ValueError(f"Unknown tool: {name}")
 
-        # Process message IDs returned by the client
-        if message_ids:
-            print(f"Found {len(message_ids)} messages for tool '{name}'. Fetching details...")
-            tasks = []
-            for msg_ref in message_ids:
-                # Fetch details concurrently using asyncio.to_thread
-                tasks.append(asyncio.to_thread(client.get_message_details, msg_ref['id']))
-
-            # Gather results from concurrent fetches
-            details_results = await asyncio.gather(*tasks)
+        fetched = listing.messages
+        if not fetched:
+             logger.debug("No messages found for tool '%s'.", name)
 
-            for details in details_results:
-                if details:
-                    output.append(details)
-                else:
-                    # Append a placeholder if fetching details failed (client returned None)
-                    # Find the ID that corresponds to this None result (tricky without tracking)
-                    # For simplicity, just log that *a* fetch failed. Better tracking needed for exact ID.
-                    print("Warning: Failed to fetch details for one or more messages.", file=sys.stderr)
-                    output.append({
-                         "id": "unknown", # We don't easily know which ID failed here
-                         "error": "Failed to fetch message details",
-                         "subject": "Error", "from": "Error", "date": "Error", "snippet": ""
-                     })
+        if stream:
+            result = {
+                "streamed": True,
+                "message_count": len(fetched),
+                "failed_count": sum(1 for _, details in fetched if not details),
+            }
         else:
-             print(f"No messages found for tool '{name}'.")
+            result = {"messages": _format_messages(fetched)}
+        if listing.partial:
+            result["partial"] = True
+        if listing.next_position is not None:
+            result["next_cursor"] = encode_cursor(name, Cursor(start.query, listing.next_position, listing.anchor))
 
     except HttpError as e:
         # Handle API errors specifically during list calls
-        print(f"API error during tool execution '{name}': {e}", file=sys.stderr)
+        logger.error("API error during tool execution '%s': %s", name, e)
         # Re-raise to be potentially caught by serve() or return specific error text
+        TOOL_ERRORS.inc(tool=name, kind="gmail_api")
         error_message = f"Gmail API Error: {e.resp.status} {e.reason}"
         return [TextContent(type="text", text=json.dumps({"error": error_message}))]
     except ValueError as e:
         # Handle ValueErrors (unknown tool, missing args)
-        print(f"Value error during tool execution '{name}': {e}", file=sys.stderr)
+        logger.warning("Value error during tool execution '%s': %s", name, e)
+        TOOL_ERRORS.inc(tool=name, kind="invalid_arguments")
         return [TextContent(type="text", text=json.dumps({"error": str(e)}))]
     except Exception as e:
         # Catch other potential errors
-        print(f"Unexpected error during tool execution '{name}': {e}", file=sys.stderr)
+        logger.exception("Unexpected error during tool execution '%s': %s", name, e)
+        TOOL_ERRORS.inc(tool=name, kind="internal")
         return [TextContent(type="text", text=json.dumps({"error": f"Internal server error: {e}"}))]
 
 
-    print(f"Tool '{name}' execution finished. Returning {len(output)} messages.")
+    logger.info("Tool '%s' execution finished. Returning %s messages.", name, len(fetched))
     return [
         TextContent(
-            type="text", text=json.dumps({"messages": output}, indent=2)
+            type="text", text=json.dumps(result, indent=2)
         )
     ]
 
 
 # --- Server Setup ---
+def _register_mailbox_metrics(mailbox: Mailbox) -> None:
+    """Exposes counters the mailbox's components already keep as scrape-time metrics."""
+    caches = {"metadata": mailbox.cache, "query": mailbox.query_cache}
+
+    def cache_counts(counter: str) -> list[tuple[dict, float]]:
+        return [({"cache": cache_name}, getattr(cache, counter)) for cache_name, cache in caches.items() if cache]
+
+    def hit_ratios() -> list[tuple[dict, float]]:
+        return [
+            ({"cache": cache_name}, cache.hits / (cache.hits + cache.misses))
+            for cache_name, cache in caches.items() if cache and cache.hits + cache.misses
+        ]
+
+    REGISTRY.register_callback("gmail_mcp_cache_hits_total", "Cache lookups answered locally.", lambda: cache_counts("hits"), "counter")
+    REGISTRY.register_callback("gmail_mcp_cache_misses_total", "Cache lookups that went to Gmail.", lambda: cache_counts("misses"), "counter")
+    REGISTRY.register_callback("gmail_mcp_cache_hit_ratio", "Hits over lookups since startup.", hit_ratios)
+    REGISTRY.register_callback(
+        "gmail_api_cancelled_calls_total", "Gmail calls of cancelled tool calls, by how they ended.",
+        lambda: [({"outcome": outcome}, count) for outcome, count in mailbox.client.cancellation.stats().items()], "counter",
+    )
+    limiter = mailbox.client.limiter
+    if limiter:
+        REGISTRY.register_callback(
+            "gmail_api_concurrency_limit", "Current adaptive limit on concurrent Gmail calls.",
+            lambda: [({}, limiter.concurrency.limit)],
+        )
+
+
+def _register_account_metrics(accounts: AccountPool) -> None:
+    """Exposes the account pool's size and churn as scrape-time metrics."""
+    REGISTRY.register_callback("gmail_mcp_accounts_open", "Named-account mailboxes currently open.", lambda: [({}, len(accounts))])
+    REGISTRY.register_callback("gmail_mcp_account_opens_total", "Named-account mailboxes opened.", lambda: [({}, accounts.opened)], "counter")
+    REGISTRY.register_callback("gmail_mcp_account_evictions_total", "Named-account mailboxes closed as idle or least recently used.", lambda: [({}, accounts.evicted)], "counter")
+
+
+async def _in_daemon_thread(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Runs a blocking call on a daemon thread and awaits its result.
+
+    Unlike asyncio.to_thread, a call abandoned by cancellation (such as an
+    OAuth flow waiting on a browser) does not hold up interpreter exit.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def _deliver(setter: Callable[[Any], None], value: Any) -> None:
+        if not future.done():
+            setter(value)
+
+    def _run() -> None:
+        try:
+            outcome = (future.set_result, func(*args))
+        except BaseException as e:
+            outcome = (future.set_exception, e)
+        # The loop is gone if the server exited while the call was running
+        with contextlib.suppress(RuntimeError):
+            loop.call_soon_threadsafe(_deliver, *outcome)
+
+    threading.Thread(target=_run, name=f"gmail-{func.__name__}", daemon=True).start()
+    return await future
+
+
+async def _open_mailbox(cassette: Optional[Cassette], account: Optional[str] = None) -> Mailbox:
+    """
+    Obtains credentials and builds the client and mailbox of the default account or a named one.
+
+    serve() opens the default account in the background so the MCP
+    handshake does not wait for token file I/O, a token refresh or the
+    OAuth flow; tool calls await it. Named accounts are opened by the
+    AccountPool on first use, from tokens saved by --authorize; they never
+    start the OAuth flow.
+    """
+    started = time.perf_counter()
+    label = account or "the default account"
+    token_manager = None
+    try:
+        if cassette and cassette.mode == "replay":
+            # Nothing reaches Gmail, so no real token is needed
+            creds = Credentials(token=EMULATOR_TOKEN)
+        elif API_ROOT:
+            logger.info("Using the Gmail API at %s with a placeholder token.", API_ROOT)
+            creds = Credentials(token=EMULATOR_TOKEN)
+        else:
+            logger.info("Attempting to get credentials for %s...", label)
+            token_file = account_token_file(ACCOUNTS_DIR, account) if account else TOKEN_FILE
+            # Run blocking IO in a separate thread
+            # The default account may start the OAuth flow, which only returns once the user signs in
+            creds = await _in_daemon_thread(get_credentials, token_file, account is None)
+            logger.info("Credentials obtained successfully.")
+            if creds.refresh_token:
+                # Keep the token fresh ahead of expiry so no tool call waits on a refresh
+                token_manager = CredentialManager(creds, token_file, TOKEN_REFRESH_MARGIN)
+                creds = token_manager.credentials
+            else:
+                logger.warning("Credentials have no refresh token; they will stop working when the access token expires.")
+
+        client = await asyncio.to_thread(_create_client, creds, cassette)
+    except Exception as e:
+        # FileNotFoundError (no credentials.json) or RuntimeError (OAuth/refresh/build failed);
+        # the server keeps running and tool calls report the error (see _DefaultMailbox for retries)
+        logger.error("Initialization Error for %s: %s", label, e)
+        raise
+    mailbox = _create_mailbox(client, token_manager, account, cassette)
+    if token_manager:
+        token_manager.start()
+    if account is None:
+        _register_mailbox_metrics(mailbox)
+    logger.info("Gmail client initialized for %s (backend: %s) in %.0f ms.", label, BACKEND, (time.perf_counter() - started) * 1000)
+    return mailbox
+
+
+class _DefaultMailbox:
+    """
+    The default account's mailbox, opened in the background by serve().
+
+    If opening it fails, the next tool call starts a new attempt, so a
+    transient failure (e.g. a network error during the startup token
+    refresh) does not break every call until the process restarts. A
+    missing credentials.json needs the operator, so that keeps failing fast.
+    """
+
+    def __init__(self, open_mailbox: Callable[[], Awaitable[Mailbox]]):
+        self._open_mailbox = open_mailbox
+        self._task = asyncio.create_task(open_mailbox())
+
+    async def get(self) -> Mailbox:
+        """
+        Waits for the mailbox, starting a new attempt if the last one failed for a retryable reason.
+
+        Raises:
+            Exception: Whatever opening the mailbox raised.
+        """
+        task = self._task
+        if task.done() and not task.cancelled() and task.exception() is not None \
+                and not isinstance(task.exception(), FileNotFoundError):
+            logger.info("Retrying initialization of the default account after: %s", task.exception())
+            self._task = task = asyncio.create_task(self._open_mailbox())
+        # Shielded: a cancelled call must not cancel the open other calls are waiting for
+        return await asyncio.shield(task)
+
+    async def close(self) -> None:
+        """Stops an open in progress, or closes the opened mailbox."""
+        if not self._task.done():
+            # E.g. the client disconnected during the OAuth flow
+            self._task.cancel()
+        elif not self._task.cancelled() and self._task.exception() is None:
+            await self._task.result().close()
+
+
+async def _start_metrics_server() -> Optional[asyncio.AbstractServer]:
+    """Starts the Prometheus endpoint if configured; failing to bind it only disables metrics."""
+    if not METRICS_PORT:
+        return None
+    try:
+        return await serve_metrics(REGISTRY, METRICS_HOST, METRICS_PORT)
+    except OSError as e:
+        # Metrics are optional; the tools must keep working (e.g. a second instance on the same port)
+        logger.warning("Metrics endpoint disabled: cannot listen on %s:%s: %s", METRICS_HOST, METRICS_PORT, e)
+        return None
+
+
 async def serve():
     """Main server function for the MCP Gmail integration."""
-    client = None # Initialize client to None
     try:
-        print("Attempting to get credentials...")
-        # Run blocking IO in a separate thread
-        creds = await asyncio.to_thread(get_credentials)
-        print("Credentials obtained successfully.")
-
-        # Create the client instance here (also potentially blocking if build() is slow)
-        # Although build is usually fast, let's keep it potentially async friendly
-        client = await asyncio.to_thread(GmailApiClient, credentials=creds)
-        print("GmailApiClient initialized.")
+        cassette = _open_cassette()
+        profiler = CallProfiler(PROFILE_DIR, PROFILE_RATE, PROFILE_MODE, PROFILE_INTERVAL_MS / 1000)
+        metrics_server = await _start_metrics_server()
+        # Credentials and the client are prepared while the stdio loop already answers initialize/list_tools
+        default_mailbox = _DefaultMailbox(lambda: _open_mailbox(cassette))
+        # Mailboxes named by the account argument, each with its own client and quota limiter
+        accounts = AccountPool(lambda account: _open_mailbox(cassette, account), MAX_OPEN_ACCOUNTS, ACCOUNT_IDLE_TIMEOUT)
+        accounts.start()
+        _register_account_metrics(accounts)
 
         server = Server(name="mcp-gmail")
 
@@ -260,33 +1028,71 @@ async def serve():
 
         @server.call_tool()
         async def call_tool(name: str, arguments: dict) -> list[TextContent]:
-            # Pass the initialized client instance
-            if client is None:
-                 # This should ideally not happen if serve() setup works
-                 print("CRITICAL: Gmail API Client was not initialized!", file=sys.stderr)
-                 return [TextContent(type="text", text=json.dumps({"error": "Server not initialized correctly."}))]
-            print(f"Executing tool: {name} with args: {arguments}")
-            # _execute_tool now handles its own errors and returns TextContent list
-            return await _execute_tool(name, arguments, client)
+            logger.info("Executing tool: %s with args: %s", name, arguments)
+            mailbox = None
+            account = arguments.get("account") if name != "server_stats" else None
+            if account:
+                try:
+                    mailbox = await accounts.acquire(account)
+                except Exception as e:
+                    TOOL_ERRORS.inc(tool=name, kind="account")
+                    return [TextContent(type="text", text=json.dumps({"error": f"Account {account!r} is unavailable: {e}"}))]
+            elif name != "server_stats":
+                try:
+                    mailbox = await default_mailbox.get()
+                except Exception as e:
+                    TOOL_ERRORS.inc(tool=name, kind="initialization")
+                    return [TextContent(type="text", text=json.dumps({"error": f"Server not initialized correctly: {e}"}))]
+            if cassette and cassette.mode == "record":
+                cassette.record_tool_call(name, arguments)
+            stream = None
+            if arguments.get("stream"):
+                ctx = server.request_context
+                progress_token = ctx.meta.progressToken if ctx.meta else None
+                if progress_token is None:
+                    logger.warning("Tool '%s' asked to stream without a progressToken; returning results inline.", name)
+                else:
+                    stream = ProgressStream(ctx.session, progress_token)
+            try:
+                with TOOLS_IN_FLIGHT.track_in_progress(tool=name), TOOL_LATENCY.time(tool=name):
+                    async with profiler.profile(name, force=bool(arguments.get("debug_profile"))):
+                        if name == "server_stats":
+                            result = [TextContent(type="text", text=json.dumps(REGISTRY.snapshot(), indent=2))]
+                        else:
+                            # _execute_tool now handles its own errors and returns TextContent list
+                            result = await _execute_tool(name, arguments, mailbox, stream)
+            except asyncio.CancelledError:
+                # The client cancelled the request; work no other call shares has been abandoned
+                stats = mailbox.client.cancellation.stats() if mailbox else {}
+                logger.info("Tool '%s' cancelled. Abandoned Gmail calls so far: %s", name, stats)
+                raise
+            finally:
+                if account:
+                    accounts.release(account)
+            RESPONSE_BYTES.observe(sum(len(content.text.encode()) for content in result), tool=name)
+            return result
 
         options = server.create_initialization_options()
-        print("Starting MCP server via stdio...")
-        async with stdio_server() as (read_stream, write_stream):
-            await server.run(read_stream, write_stream, options)
-        print("MCP server finished.")
-
-    except FileNotFoundError as e:
-         # Raised by get_credentials if credentials.json is missing
-         print(f"Configuration Error: {e}", file=sys.stderr)
-         # Exit cleanly if critical config is missing
-         sys.exit(1)
+        logger.info("Starting MCP server via stdio...")
+        try:
+            async with stdio_server() as (read_stream, write_stream):
+                await server.run(read_stream, write_stream, options)
+        finally:
+            if metrics_server:
+                metrics_server.close()
+            await accounts.close()
+            await default_mailbox.close()
+            if cassette:
+                cassette.close()
+        logger.info("MCP server finished.")
+
     except RuntimeError as e:
-         # Raised if credentials could not be obtained/refreshed/validated
-         print(f"Initialization Error: {e}", file=sys.stderr)
+         # Raised if the cassette configuration is invalid; credential errors surface in tool calls
+         logger.error("Initialization Error: %s", e)
          sys.exit(1)
     except Exception as e:
         # Catch unexpected errors during server startup or shutdown
-        print(f"FATAL Error running Gmail MCP server: {e}", file=sys.stderr)
+        logger.exception("FATAL Error running Gmail MCP server: %s", e)
         import traceback
         traceback.print_exc()
         # Re-raise or specific exit codes depending on desired behavior
@@ -294,19 +1100,57 @@ async def serve():
 
 
 # --- Main Entry Point ---
+def authorize_account(account: str) -> int:
+    """
+    Runs the OAuth flow for a named account and saves its token under ACCOUNTS_DIR.
+
+    The token is kept only if Gmail confirms the signed-in mailbox is the
+    requested one, so a wrong browser login cannot be filed under it.
+
+    Returns:
+        The process exit code.
+    """
+    try:
+        account = normalize_account(account)
+    except ValueError as e:
+        logger.error("%s", e)
+        return 2
+    token_file = account_token_file(ACCOUNTS_DIR, account)
+    try:
+        creds = get_credentials(token_file)
+        service = build_from_document(load_discovery_document(DISCOVERY_FILE), credentials=creds)
+        address = service.users().getProfile(userId="me").execute()["emailAddress"].lower()
+    except Exception as e:
+        logger.error("Could not authorize %s: %s", account, e)
+        return 1
+    if address != account:
+        token_file.unlink(missing_ok=True)
+        logger.error("Signed in as %s, not %s; the token was discarded.", address, account)
+        return 1
+    logger.info("Account %s authorized; token saved to %s.", account, token_file)
+    return 0
+
+
 def main():
     """Entry point for the MCP server that properly handles the asyncio event loop."""
+    parser = argparse.ArgumentParser(description="MCP server for Gmail.")
+    parser.add_argument("--authorize", metavar="ADDRESS",
+                        help="Sign in to another Gmail account for the tools' account argument, save its token and exit")
+    args = parser.parse_args()
+    configure_logging(LOG_LEVEL, LOG_FILE, LOG_FORMAT)
+    if args.authorize:
+        sys.exit(authorize_account(args.authorize))
     try:
-        print("Starting Gmail MCP Server...")
+        logger.info("Starting Gmail MCP Server...")
         asyncio.run(serve())
     except KeyboardInterrupt:
-        print("\nServer stopped by user.")
+        logger.info("Server stopped by user.")
     except Exception as e:
         # Catch errors raised from serve() or asyncio itself
-        print(f"\nUnhandled error during server execution: {e}", file=sys.stderr)
+        logger.exception("Unhandled error during server execution: %s", e)
         sys.exit(1)
     finally:
-        print("Gmail MCP Server exited.")
+        logger.info("Gmail MCP Server exited.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,143 @@
+# src/mcp_server/gmail/service_pool.py
+import asyncio
+import functools
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import httplib2
+from google.auth.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document, Resource
+
+from .cancellation import CancelToken, CancellationStats, run_with_token
+from .cassette import Cassette
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 8
+# Socket timeout (seconds) for each pooled HTTP transport
+HTTP_TIMEOUT = 60
+
+
+@functools.lru_cache(maxsize=None)
+def load_discovery_document(path: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    Loads and parses the Gmail v1 discovery document once per process.
+
+    Args:
+        path: Optional on-disk discovery document. When omitted, the copy
+            bundled with google-api-python-client is used, so no network
+            fetch happens at startup.
+
+    Returns:
+        The parsed discovery document, shared by every service built from it.
+
+    Raises:
+        RuntimeError: If the document cannot be found or parsed.
+    """
+    try:
+        if path is not None:
+            logger.info("Loading Gmail discovery document from %s", path)
+            return json.loads(Path(path).read_text())
+        content = discovery_cache.get_static_doc("gmail", "v1")
+        if content is None:
+            raise FileNotFoundError("google-api-python-client ships no static gmail.v1 document")
+        return json.loads(content)
+    except Exception as e:
+        logger.error("Error loading Gmail discovery document: %s", e)
+        raise RuntimeError(f"Could not load Gmail discovery document: {e}") from e
+
+
+class ServicePool:
+    """
+    A bounded executor whose worker threads each own a Gmail service.
+
+    httplib2.Http is not thread-safe, so sharing one Resource across
+    threads corrupts responses. Instead every worker lazily builds its own
+    authorized Http + Resource and keeps it for the life of the thread,
+    which also keeps that thread's keep-alive connections warm.
+    """
+
+    def __init__(self, credentials: Credentials, size: int = DEFAULT_POOL_SIZE, discovery_file: Optional[Path] = None, api_root: Optional[str] = None, cassette: Optional[Cassette] = None):
+        """
+        Initializes the pool. Services are built lazily, one per worker.
+
+        Args:
+            credentials: Valid Google OAuth2 credentials shared by all workers.
+            size: Maximum number of worker threads (and so of concurrent API calls).
+            discovery_file: Optional on-disk discovery document (see load_discovery_document).
+            api_root: Optional root URL replacing https://gmail.googleapis.com/,
+                e.g. a local emulator. Batch requests go there too.
+            cassette: Optional cassette each worker's transport records into or replays from.
+
+        Raises:
+            ValueError: If size is less than 1.
+        """
+        if size < 1:
+            raise ValueError(f"Service pool size must be at least 1, got {size}.")
+        self.size = size
+        self._credentials = credentials
+        self._discovery_file = discovery_file
+        self._api_root = api_root
+        self._cassette = cassette
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="gmail-api")
+        self.cancellation = CancellationStats()
+
+    def get_service(self) -> Resource:
+        """
+        Returns the Gmail service owned by the calling thread, building it on first use.
+
+        Raises:
+            RuntimeError: If the service cannot be built.
+        """
+        service = getattr(self._local, "service", None)
+        if service is None:
+            try:
+                transport = self._cassette.http(timeout=HTTP_TIMEOUT) if self._cassette else httplib2.Http(timeout=HTTP_TIMEOUT)
+                http = AuthorizedHttp(self._credentials, http=transport)
+                # Reuse the parsed document; build() would re-read and re-parse it per thread
+                document = load_discovery_document(self._discovery_file)
+                if self._api_root:
+                    # rootUrl also sets the batch URI, which client_options' api_endpoint would not
+                    document = {**document, "rootUrl": self._api_root}
+                service = build_from_document(document, http=http)
+            except Exception as e:
+                logger.error("Error building Gmail service: %s", e)
+                raise RuntimeError(f"Could not build Gmail service: {e}") from e
+            logger.debug("Gmail API service built for %s.", threading.current_thread().name)
+            self._local.service = service
+        return service
+
+    def warm_up(self) -> None:
+        """Builds one worker's service now, so configuration errors surface at startup."""
+        self._executor.submit(self.get_service).result()
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Runs a blocking callable on one of the pool's workers and awaits its result.
+
+        If the awaiting task is cancelled, a call that has not started yet is
+        dropped from the queue; a running one has its CancelToken fired so it
+        stops at its next checkpoint.
+        """
+        token = CancelToken()
+        future = self._executor.submit(run_with_token, token, functools.partial(func, *args, **kwargs))
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            if future.cancel():
+                self.cancellation.record("dropped")
+            else:
+                token.cancel()
+                future.add_done_callback(lambda done: self.cancellation.record_abandoned(done.exception()))
+            raise
+
+    def shutdown(self) -> None:
+        """Stops the workers, dropping any calls that have not started yet."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,85 @@
+# src/mcp_server/gmail/singleflight.py
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that would compute the same result.
+
+    The first caller for a key starts the work; callers arriving while it
+    is still running await the same task instead of repeating it. Entries
+    are dropped as soon as the task finishes, so this never serves stale
+    results -- it only deduplicates overlapping work.
+
+    Waiters are counted, so work nobody is waiting for any more (every
+    caller was cancelled) is cancelled too instead of spending quota.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Future, int] = {}
+        self._keys: Dict[asyncio.Future, List[Hashable]] = {}
+
+    def in_flight(self, key: Hashable) -> Optional[asyncio.Task]:
+        """Returns the running task for key, if any; a task being cancelled does not count."""
+        task = self._tasks.get(key)
+        if task is None or task.done() or (isinstance(task, asyncio.Task) and task.cancelling()):
+            return None
+        return task
+
+    def track(self, keys: Iterable[Hashable], task: asyncio.Task) -> None:
+        """Registers one running task under several keys (e.g. one batch covering many messages)."""
+        keys = list(keys)
+        for key in keys:
+            self._tasks[key] = task
+        self._keys[task] = keys
+        task.add_done_callback(self._forget)
+
+    def _forget(self, task: asyncio.Future) -> None:
+        for key in self._keys.pop(task, ()):
+            # A newer task may have replaced ours under the same key
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+
+    def join(self, task: asyncio.Future) -> None:
+        """
+        Counts the caller as waiting on a shared task; pair with leave().
+
+        Synchronous, so a caller that has just looked the task up holds it
+        before yielding; otherwise the last other waiter could be cancelled
+        in between and take the task down with it.
+        """
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+
+    def leave(self, task: asyncio.Future) -> None:
+        """Stops counting the caller as a waiter, cancelling the task if it was the last one."""
+        self._waiters[task] -= 1
+        if not self._waiters[task]:
+            del self._waiters[task]
+            if not task.done():
+                # Unregister now, not when the task finishes: a caller arriving in
+                # the meantime must start fresh work instead of joining a dying task
+                self._forget(task)
+                task.cancel()
+
+    async def wait(self, task: asyncio.Future) -> Any:
+        """
+        Awaits a shared task and returns its result.
+
+        A caller that is cancelled stops waiting, but the task keeps running
+        for the others; it is cancelled once its last waiter has gone.
+        """
+        self.join(task)
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self.leave(task)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Returns func()'s result, sharing one execution among concurrent callers with the same key."""
+        task = self.in_flight(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self.track([key], task)
+        return await self.wait(task)
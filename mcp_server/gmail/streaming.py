@@ -0,0 +1,43 @@
+# src/mcp_server/gmail/streaming.py
+from typing import Any, Dict, List
+
+from mcp.server.session import ServerSession
+from mcp.types import ProgressNotification, ProgressNotificationParams, ProgressToken, ServerNotification
+
+
+class ProgressStream:
+    """
+    Streams parsed messages to the MCP client as progress notifications.
+
+    Each notification carries the running message count as `progress` and
+    the newly completed messages in an extra `messages` field, so a client
+    can render results long before the whole tool call finishes.
+    """
+
+    def __init__(self, session: ServerSession, progress_token: ProgressToken):
+        """
+        Args:
+            session: The session of the request being answered.
+            progress_token: The token the client sent in the request's _meta.
+        """
+        self._session = session
+        self._progress_token = progress_token
+        self.sent = 0
+
+    async def send_messages(self, messages: List[Dict[str, Any]]) -> None:
+        """Sends one batch of messages; empty batches are skipped."""
+        if not messages:
+            return
+        self.sent += len(messages)
+        await self._session.send_notification(
+            ServerNotification(
+                ProgressNotification(
+                    method="notifications/progress",
+                    params=ProgressNotificationParams(
+                        progressToken=self._progress_token,
+                        progress=self.sent,
+                        messages=messages,
+                    ),
+                )
+            )
+        )
@@ -0,0 +1,98 @@
+# src/mcp_server/gmail/unread_sync.py
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+# The view tracks at most one messages.list page of unread messages
+DEFAULT_CAPACITY = 500
+# Unread messages in these labels are not returned by messages.list
+HIDDEN_LABELS = {"TRASH", "SPAM"}
+
+
+class UnreadView:
+    """
+    In-memory view of the mailbox's UNREAD set, kept current from Gmail history.
+
+    After one full listing (reset), each poll only needs users.history.list
+    from the stored historyId checkpoint; apply_history folds the returned
+    adds, deletes and label changes into the view.
+
+    Messages are ordered newest first. New arrivals are placed at the front,
+    so a message marked unread again is treated as the newest one. When the
+    mailbox holds more than `capacity` unread messages only the newest are
+    tracked, and snapshot() declines requests it cannot answer exactly.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.history_id: Optional[str] = None
+        # Held while syncing so concurrent polls don't replay the same history twice
+        self.lock = asyncio.Lock()
+        self._ids: "OrderedDict[str, None]" = OrderedDict()
+        # True when the view holds every unread message, not just the newest ones
+        self._complete = False
+
+    def reset(self, message_ids: Iterable[str], history_id: str) -> None:
+        """
+        Replaces the view with a full listing taken at history_id.
+
+        Args:
+            message_ids: Unread message IDs, newest first, at most `capacity` of them.
+            history_id: Mailbox historyId read before the listing started.
+        """
+        self._ids = OrderedDict((message_id, None) for message_id in message_ids)
+        self._complete = len(self._ids) < self.capacity
+        self.history_id = history_id
+
+    def invalidate(self) -> None:
+        """Forgets the view so the next poll performs a full resync."""
+        self._ids.clear()
+        self._complete = False
+        self.history_id = None
+
+    def apply_history(self, records: List[Dict[str, Any]], history_id: str) -> None:
+        """
+        Applies users.history.list records and advances the checkpoint.
+
+        Args:
+            records: History records, oldest first.
+            history_id: The mailbox historyId returned with the records.
+        """
+        for record in records:
+            for item in record.get("messagesDeleted", []):
+                self._ids.pop(item["message"]["id"], None)
+            for key in ("messagesAdded", "labelsAdded", "labelsRemoved"):
+                for item in record.get(key, []):
+                    message = item["message"]
+                    if "labelIds" not in message:
+                        continue
+                    labels = set(message["labelIds"])
+                    if "UNREAD" in labels and not labels & HIDDEN_LABELS:
+                        self._add(message["id"])
+                    else:
+                        self._ids.pop(message["id"], None)
+        self.history_id = history_id
+
+    def _add(self, message_id: str) -> None:
+        if message_id in self._ids:
+            return
+        self._ids[message_id] = None
+        self._ids.move_to_end(message_id, last=False)
+        if len(self._ids) > self.capacity:
+            # Drop the oldest; the view now only covers the newest messages
+            self._ids.popitem(last=True)
+            self._complete = False
+
+    def snapshot(self, max_results: int) -> Optional[List[str]]:
+        """
+        Returns up to max_results unread IDs, newest first.
+
+        Returns None if the view is not synced, or if it was truncated and
+        holds fewer than max_results messages (older unread messages exist
+        that it does not know about).
+        """
+        if self.history_id is None:
+            return None
+        if not self._complete and len(self._ids) < max_results:
+            return None
+        return list(self._ids)[:max_results]
@@ -0,0 +1,143 @@
+# tests/test_accounts.py
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+from mcp_server.gmail.accounts import AccountPool, account_token_file, normalize_account
+
+
+class _FakeMailbox:
+    def __init__(self, account: str):
+        self.account = account
+        self.closed = False
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class _Opener:
+    """open_mailbox stand-in that records every mailbox it builds."""
+
+    def __init__(self):
+        self.opened: list[_FakeMailbox] = []
+
+    async def __call__(self, account: str) -> _FakeMailbox:
+        await asyncio.sleep(0)
+        mailbox = _FakeMailbox(account)
+        self.opened.append(mailbox)
+        return mailbox
+
+
+class NormalizeAccountTest(unittest.TestCase):
+    def test_address_is_lower_cased_and_trimmed(self):
+        self.assertEqual(normalize_account("  Alice.Liddell+gmail@Example.COM "), "alice.liddell+gmail@example.com")
+
+    def test_bad_names_are_rejected(self):
+        for account in ("", "alice", "@example.com", "alice@", ".alice@example.com", "alice@.example.com",
+                        "alice bob@example.com", "a" * 250 + "@example.com", None, 42):
+            with self.subTest(account=account), self.assertRaisesRegex(ValueError, "Invalid account"):
+                normalize_account(account)
+
+    def test_path_traversal_is_rejected(self):
+        for account in ("../alice@example.com", "alice@example.com/../../token", "alice/..@example.com",
+                        "..@example.com", "alice@example.com\\..\\x", "alice@example.com\x00"):
+            with self.subTest(account=account), self.assertRaisesRegex(ValueError, "Invalid account"):
+                normalize_account(account)
+
+    def test_token_file_stays_in_the_accounts_directory(self):
+        with tempfile.TemporaryDirectory() as scratch:
+            accounts_dir = Path(scratch)
+            self.assertEqual(account_token_file(accounts_dir, "Alice@Example.com").parent, accounts_dir)
+            with self.assertRaises(ValueError):
+                account_token_file(accounts_dir, "../alice@example.com")
+
+
+class AccountPoolTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.opener = _Opener()
+
+    async def _use(self, pool: AccountPool, account: str) -> _FakeMailbox:
+        mailbox = await pool.acquire(account)
+        pool.release(account)
+        return mailbox
+
+    async def test_same_account_shares_one_mailbox(self):
+        pool = AccountPool(self.opener)
+        with self.assertLogs("mcp_server.gmail.accounts", "INFO"):
+            first, second = await asyncio.gather(pool.acquire("a@example.com"), pool.acquire("A@example.com"))
+        self.assertIs(first, second)
+        self.assertEqual(len(self.opener.opened), 1)
+
+    async def test_least_recently_used_is_evicted_past_max_open(self):
+        pool = AccountPool(self.opener, max_open=2)
+        with self.assertLogs("mcp_server.gmail.accounts", "INFO"):
+            a = await self._use(pool, "a@example.com")
+            b = await self._use(pool, "b@example.com")
+            # Using a again makes b the least recently used
+            await self._use(pool, "a@example.com")
+            await self._use(pool, "c@example.com")
+        self.assertTrue(b.closed)
+        self.assertFalse(a.closed)
+        self.assertEqual(len(pool), 2)
+        self.assertEqual(pool.evicted, 1)
+
+    async def test_leased_mailbox_is_not_evicted(self):
+        pool = AccountPool(self.opener, max_open=1)
+        with self.assertLogs("mcp_server.gmail.accounts", "INFO"):
+            a = await pool.acquire("a@example.com")
+            # a is still in use, so the pool grows past max_open instead of closing it
+            b = await pool.acquire("b@example.com")
+            self.assertFalse(a.closed)
+            self.assertEqual(len(pool), 2)
+            pool.release("b@example.com")
+            pool.release("a@example.com")
+            # The next acquire trims the pool back to max_open, least recently used first
+            await self._use(pool, "a@example.com")
+        self.assertTrue(b.closed)
+        self.assertFalse(a.closed)
+        self.assertEqual(len(pool), 1)
+
+    async def test_evicted_account_is_reopened_on_next_use(self):
+        pool = AccountPool(self.opener, max_open=1)
+        with self.assertLogs("mcp_server.gmail.accounts", "INFO"):
+            first = await self._use(pool, "a@example.com")
+            await self._use(pool, "b@example.com")
+            again = await self._use(pool, "a@example.com")
+        self.assertTrue(first.closed)
+        self.assertIsNot(again, first)
+        self.assertEqual(pool.opened, 3)
+
+    async def test_idle_mailbox_is_closed_by_the_sweeper(self):
+        pool = AccountPool(self.opener, idle_timeout=0.05)
+        pool.start()
+        try:
+            with self.assertLogs("mcp_server.gmail.accounts", "INFO") as logs:
+                idle = await self._use(pool, "a@example.com")
+                busy = await pool.acquire("b@example.com")
+                await asyncio.sleep(0.2)
+            self.assertTrue(idle.closed)
+            self.assertFalse(busy.closed)
+            self.assertEqual(len(pool), 1)
+            self.assertTrue(any("(idle)" in line for line in logs.output))
+            pool.release("b@example.com")
+        finally:
+            await pool.close()
+        self.assertTrue(busy.closed)
+
+    async def test_failed_open_is_not_registered(self):
+        async def unauthorized(account):
+            raise FileNotFoundError(account)
+
+        pool = AccountPool(unauthorized)
+        with self.assertRaises(FileNotFoundError):
+            await pool.acquire("a@example.com")
+        self.assertEqual(len(pool), 0)
+
+    def test_max_open_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            AccountPool(self.opener, max_open=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
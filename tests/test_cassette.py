@@ -0,0 +1,100 @@
+# tests/test_cassette.py
+import gzip
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import httpx
+
+from mcp_server.gmail import server
+from mcp_server.gmail.cassette import Cassette, RecordingTransport, ReplayTransport
+
+ADDRESS = "alice.liddell@example.com"
+REQUEST_TOKEN = "ya29.request-secret"
+RESPONSE_TOKEN = "ya29.response-secret"
+QUERY_TOKEN = "ya29.query-secret"
+API = "https://gmail.googleapis.com/gmail/v1/users/me/"
+
+
+def _gmail(request: httpx.Request) -> httpx.Response:
+    """Answers like Gmail would, plus headers that must never be recorded."""
+    headers = {"Authorization": f"Bearer {RESPONSE_TOKEN}", "Set-Cookie": f"session={RESPONSE_TOKEN}"}
+    if request.url.path.endswith("/profile"):
+        return httpx.Response(200, headers=headers, json={"emailAddress": ADDRESS, "messagesTotal": 3, "historyId": "42"})
+    if request.url.path.endswith("/messages"):
+        return httpx.Response(200, headers=headers, json={"messages": [{"id": "m1", "threadId": "t1"}], "resultSizeEstimate": 1})
+    return httpx.Response(200, headers=headers, json={
+        "id": "m1",
+        "labelIds": ["UNREAD", "INBOX"],
+        "snippet": f"Your token is {RESPONSE_TOKEN}, reply to {ADDRESS}",
+        "payload": {"headers": [{"name": "From", "value": f"Alice <{ADDRESS}>"}, {"name": "Subject", "value": "Secrets"}]},
+    })
+
+
+async def _exchange(transport: httpx.AsyncBaseTransport, token: str) -> list:
+    """Makes the same three requests a tool call would, returning status and decoded body of each."""
+    async with httpx.AsyncClient(transport=transport, headers={"Authorization": f"Bearer {token}"}) as client:
+        responses = [
+            await client.get(API + "profile"),
+            await client.get(API + "messages", params={"q": f"from:{ADDRESS}", "access_token": QUERY_TOKEN, "maxResults": 10}),
+            await client.get(API + "messages/m1", params={"format": "metadata"}),
+        ]
+    return [(response.status_code, response.json()) for response in responses]
+
+
+class CassetteRedactionTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp.name) / "session.jsonl.gz"
+        recording = Cassette(self.path, mode="record")
+        try:
+            self.recorded = await _exchange(RecordingTransport(recording, httpx.MockTransport(_gmail)), REQUEST_TOKEN)
+            recording.record_tool_call("search_emails", {"query": f"from:{ADDRESS}", "account": ADDRESS})
+        finally:
+            recording.close()
+
+    async def asyncTearDown(self):
+        self._tmp.cleanup()
+
+    def test_secrets_never_reach_the_file(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            stored = f.read()
+        for secret in (REQUEST_TOKEN, RESPONSE_TOKEN, QUERY_TOKEN, "ya29.", ADDRESS, "alice", "Bearer", "session="):
+            self.assertNotIn(secret, stored)
+
+    async def test_replay_still_matches_the_recording(self):
+        replaying = Cassette(self.path, mode="replay", time_scale=0)
+        # The replaying client holds a different token; requests must still match
+        replayed = await _exchange(ReplayTransport(replaying), "placeholder")
+        self.assertEqual(replaying.misses, 0)
+        self.assertEqual([status for status, _ in replayed], [status for status, _ in self.recorded])
+        profile, listing, message = (body for _, body in replayed)
+        self.assertEqual(profile["messagesTotal"], 3)
+        self.assertEqual(listing["messages"], [{"id": "m1", "threadId": "t1"}])
+        self.assertEqual(message["labelIds"], ["UNREAD", "INBOX"])
+        # Redacted values keep their length, so replayed responses are as large as the real ones
+        self.assertEqual(len(profile["emailAddress"]), len(ADDRESS))
+        self.assertEqual(len(message["snippet"]), len(self.recorded[2][1]["snippet"]))
+        self.assertEqual(replaying.tool_calls[0]["tool"], "search_emails")
+
+
+class CassetteMailboxTest(unittest.TestCase):
+    def test_metadata_cache_is_not_opened_with_a_cassette(self):
+        with tempfile.TemporaryDirectory() as scratch:
+            cache_file = Path(scratch) / "metadata.db"
+            cassette = Cassette(Path(scratch) / "session.jsonl.gz", mode="record")
+            with mock.patch.object(server, "METADATA_CACHE_FILE", cache_file), \
+                    mock.patch.object(server, "METADATA_CACHE_SIZE", 100):
+                recording = server._create_mailbox(client=None, cassette=cassette)
+                self.assertIsNone(recording.cache)
+                self.assertFalse(cache_file.exists())
+                # Without a cassette the same settings do open the cache
+                live = server._create_mailbox(client=None)
+                self.assertIsNotNone(live.cache)
+                live.cache.close()
+            cassette.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,201 @@
+# tests/test_credential_manager.py
+import asyncio
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest import mock
+
+from google.auth.exceptions import RefreshError
+from google.oauth2.credentials import Credentials
+
+from mcp_server.gmail import credential_manager
+from mcp_server.gmail.credential_manager import (
+    _LIBRARY_THRESHOLD, RETRY_DELAY, CredentialManager, ManagedCredentials, save_credentials,
+)
+
+
+def _utcnow() -> datetime:
+    # google-auth keeps expiry as a naive UTC datetime
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _credentials(expires_in: float = 3600) -> Credentials:
+    return Credentials(
+        token="access-0", refresh_token="refresh-token", client_id="client-id", client_secret="client-secret",
+        token_uri="https://oauth2.googleapis.com/token", expiry=_utcnow() + timedelta(seconds=expires_in),
+    )
+
+
+class ConcurrentRefreshTest(unittest.TestCase):
+    def test_concurrent_refreshes_hit_the_token_endpoint_once(self):
+        managed = ManagedCredentials.wrap(_credentials(expires_in=0))
+        endpoint_calls = []
+
+        def token_endpoint(credentials, request):
+            endpoint_calls.append(threading.get_ident())
+            # Slow enough that every thread arrives while the first refresh is running
+            time.sleep(0.2)
+            credentials.token = f"access-{len(endpoint_calls)}"
+            credentials.expiry = _utcnow() + timedelta(hours=1)
+
+        start = threading.Barrier(8)
+
+        def refresh():
+            start.wait()
+            managed.refresh(None)
+
+        with mock.patch.object(Credentials, "refresh", token_endpoint), \
+                self.assertLogs("mcp_server.gmail.credential_manager", "INFO"):
+            threads = [threading.Thread(target=refresh) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(endpoint_calls), 1)
+        self.assertEqual(managed.token, "access-1")
+
+    def test_failed_refresh_is_not_shared_with_later_callers(self):
+        managed = ManagedCredentials.wrap(_credentials(expires_in=0))
+        outcomes = iter([RefreshError("temporarily unavailable"), None])
+
+        def token_endpoint(credentials, request):
+            error = next(outcomes)
+            if error:
+                raise error
+            credentials.token = "access-1"
+
+        with mock.patch.object(Credentials, "refresh", token_endpoint):
+            with self.assertRaises(RefreshError):
+                managed.refresh(None)
+            with self.assertLogs("mcp_server.gmail.credential_manager", "INFO"):
+                managed.refresh(None)
+        self.assertEqual(managed.token, "access-1")
+
+    def test_refreshed_token_is_saved(self):
+        with tempfile.TemporaryDirectory() as scratch:
+            token_file = Path(scratch) / "token.json"
+            managed = ManagedCredentials.wrap(_credentials(expires_in=0), token_file)
+
+            def token_endpoint(credentials, request):
+                credentials.token = "access-1"
+
+            with mock.patch.object(Credentials, "refresh", token_endpoint), \
+                    self.assertLogs("mcp_server.gmail.credential_manager", "INFO"):
+                managed.refresh(None)
+            self.assertEqual(json.loads(token_file.read_text())["token"], "access-1")
+
+
+class _Stop(Exception):
+    """Ends a _run loop under test once it has scheduled enough work."""
+
+
+class RefreshSchedulingTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.sleeps = []
+        real_sleep = asyncio.sleep
+
+        async def sleep(delay):
+            self.sleeps.append(delay)
+            if len(self.sleeps) >= 2:
+                raise _Stop
+            await real_sleep(0)
+
+        patcher = mock.patch.object(credential_manager.asyncio, "sleep", sleep)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_refresh_is_due_margin_seconds_before_expiry(self):
+        manager = CredentialManager(_credentials(expires_in=1000), margin=600)
+        self.assertAlmostEqual(manager.seconds_until_refresh(), 400, delta=2)
+
+    def test_token_without_expiry_is_never_refreshed(self):
+        manager = CredentialManager(_credentials())
+        manager.credentials.expiry = None
+        self.assertIsNone(manager.seconds_until_refresh())
+
+    def test_margin_inside_the_library_window_is_raised(self):
+        with self.assertLogs("mcp_server.gmail.credential_manager", "WARNING"):
+            manager = CredentialManager(_credentials(), margin=10)
+        self.assertEqual(manager.margin, _LIBRARY_THRESHOLD + RETRY_DELAY)
+
+    async def test_sleeps_until_the_refresh_is_due(self):
+        manager = CredentialManager(_credentials(expires_in=1000), margin=600)
+        manager.credentials.refresh = mock.Mock()
+        with self.assertRaises(_Stop):
+            await manager._run()
+        # Woken early, the loop re-checks the expiry instead of refreshing blindly
+        self.assertAlmostEqual(self.sleeps[0], 400, delta=2)
+        manager.credentials.refresh.assert_not_called()
+
+    async def test_due_token_is_refreshed_and_the_next_refresh_scheduled(self):
+        manager = CredentialManager(_credentials(expires_in=60), margin=600)
+
+        def refresh(request, trigger):
+            self.assertEqual(trigger, "background")
+            manager.credentials.expiry = _utcnow() + timedelta(hours=1)
+
+        manager.credentials.refresh = refresh
+        with self.assertRaises(_Stop):
+            await manager._run()
+        self.assertAlmostEqual(self.sleeps[0], 3000, delta=2)
+
+    async def test_failed_refreshes_back_off(self):
+        manager = CredentialManager(_credentials(expires_in=60), margin=600)
+        manager.credentials.refresh = mock.Mock(side_effect=RefreshError("temporarily unavailable"))
+        with self.assertLogs("mcp_server.gmail.credential_manager", "WARNING"), self.assertRaises(_Stop):
+            await manager._run()
+        self.assertEqual(self.sleeps, [RETRY_DELAY, RETRY_DELAY * 2])
+
+    async def test_short_lived_token_is_refreshed_before_the_library_window_without_spinning(self):
+        manager = CredentialManager(_credentials(expires_in=60), margin=600)
+
+        def refresh(request, trigger):
+            # Google hands out a token that expires sooner than the margin
+            manager.credentials.expiry = _utcnow() + timedelta(seconds=500)
+
+        manager.credentials.refresh = refresh
+        with self.assertRaises(_Stop):
+            await manager._run()
+        self.assertAlmostEqual(self.sleeps[0], (500 - _LIBRARY_THRESHOLD) / 2, delta=2)
+
+
+class SaveCredentialsTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.directory = Path(self._tmp.name)
+        self.token_file = self.directory / "tokens" / "token.json"
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_writes_a_private_token_file(self):
+        save_credentials(_credentials(), self.token_file)
+        self.assertEqual(json.loads(self.token_file.read_text())["token"], "access-0")
+        self.assertEqual(stat.S_IMODE(os.stat(self.token_file).st_mode), 0o600)
+
+    def test_failed_replace_keeps_the_old_file_and_no_temporary(self):
+        save_credentials(_credentials(), self.token_file)
+        newer = _credentials()
+        newer.token = "access-1"
+        with mock.patch.object(credential_manager.os, "replace", side_effect=OSError("disk full")), \
+                self.assertRaises(OSError):
+            save_credentials(newer, self.token_file)
+        self.assertEqual(json.loads(self.token_file.read_text())["token"], "access-0")
+        self.assertEqual(list(self.token_file.parent.iterdir()), [self.token_file])
+
+    def test_failed_serialization_leaves_no_temporary(self):
+        broken = mock.Mock()
+        broken.to_json.side_effect = ValueError("not serializable")
+        with self.assertRaises(ValueError):
+            save_credentials(broken, self.token_file)
+        self.assertEqual(list(self.token_file.parent.iterdir()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
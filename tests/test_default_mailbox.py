@@ -0,0 +1,72 @@
+# tests/test_default_mailbox.py
+import asyncio
+import unittest
+
+from mcp_server.gmail.server import _DefaultMailbox
+
+
+class _FakeMailbox:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class DefaultMailboxTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.attempts = 0
+        self.failures = []
+
+    async def _open(self):
+        self.attempts += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return _FakeMailbox()
+
+    async def test_transient_failure_is_retried_by_the_next_call(self):
+        self.failures = [RuntimeError("Failed to refresh token: connection reset")]
+        default = _DefaultMailbox(self._open)
+        with self.assertRaises(RuntimeError):
+            await default.get()
+        mailbox = await default.get()
+        self.assertIsInstance(mailbox, _FakeMailbox)
+        # Once open, later calls reuse it
+        self.assertIs(await default.get(), mailbox)
+        self.assertEqual(self.attempts, 2)
+        await default.close()
+        self.assertTrue(mailbox.closed)
+
+    async def test_missing_credentials_file_is_not_retried(self):
+        self.failures = [FileNotFoundError("Credentials file not found")]
+        default = _DefaultMailbox(self._open)
+        for _ in range(2):
+            with self.assertRaises(FileNotFoundError):
+                await default.get()
+        self.assertEqual(self.attempts, 1)
+
+    async def test_concurrent_calls_after_a_failure_share_one_retry(self):
+        self.failures = [OSError("network is unreachable")]
+        default = _DefaultMailbox(self._open)
+        with self.assertRaises(OSError):
+            await default.get()
+        first, second = await asyncio.gather(default.get(), default.get())
+        self.assertIs(first, second)
+        self.assertEqual(self.attempts, 2)
+
+    async def test_cancelled_call_does_not_cancel_the_open(self):
+        opened = asyncio.Event()
+
+        async def slow_open():
+            await opened.wait()
+            return _FakeMailbox()
+        default = _DefaultMailbox(slow_open)
+        waiter = asyncio.create_task(default.get())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        opened.set()
+        self.assertIsInstance(await default.get(), _FakeMailbox)
+
+
+if __name__ == "__main__":
+    unittest.main()
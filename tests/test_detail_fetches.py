@@ -0,0 +1,62 @@
+# tests/test_detail_fetches.py
+import asyncio
+import unittest
+
+from mcp_server.gmail.mailbox import Mailbox
+from mcp_server.gmail.server import _fetch_details
+
+
+class _SlowClient:
+    """An async client whose batch fetch takes a while, recording which IDs it was asked for."""
+
+    limiter = None
+
+    def __init__(self):
+        self.batches = []
+
+    async def get_messages_details_batch(self, message_ids):
+        self.batches.append(list(message_ids))
+        await asyncio.sleep(0.05)
+        return {message_id: {"id": message_id} for message_id in message_ids}
+
+
+class OverlappingFetchTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.client = _SlowClient()
+        self.mailbox = Mailbox(client=self.client)
+
+    async def test_joiner_survives_the_original_caller_being_cancelled_right_away(self):
+        first = asyncio.create_task(_fetch_details(self.mailbox, ["m1", "m2"]))
+        await asyncio.sleep(0.01)
+        # The first call is cancelled just as the second one starts
+        first.cancel()
+        second = asyncio.create_task(_fetch_details(self.mailbox, ["m2", "m3"]))
+        details = await second
+        self.assertEqual(details, {"m2": {"id": "m2"}, "m3": {"id": "m3"}})
+        with self.assertRaises(asyncio.CancelledError):
+            await first
+
+    async def test_cancelling_one_of_two_overlapping_calls_keeps_the_shared_fetch(self):
+        first = asyncio.create_task(_fetch_details(self.mailbox, ["m1", "m2"]))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(_fetch_details(self.mailbox, ["m2", "m3"]))
+        await asyncio.sleep(0.01)
+        # second has joined first's fetch for m2 and started its own for m3
+        self.assertEqual(self.client.batches, [["m1", "m2"], ["m3"]])
+        first.cancel()
+        self.assertEqual(await second, {"m2": {"id": "m2"}, "m3": {"id": "m3"}})
+        # m2 came from the joined fetch, which kept running for second
+        self.assertEqual(self.client.batches, [["m1", "m2"], ["m3"]])
+
+    async def test_fetch_nobody_waits_for_is_cancelled(self):
+        first = asyncio.create_task(_fetch_details(self.mailbox, ["m1"]))
+        await asyncio.sleep(0)
+        fetch = self.mailbox.detail_fetches.in_flight("m1")
+        first.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await first
+        self.assertTrue(fetch.cancelled() or fetch.cancelling())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+# tests/test_emulator.py
+import contextlib
+import io
+import json
+import socket
+import struct
+import time
+import unittest
+import urllib.request
+from urllib.parse import urlsplit
+
+from mcp_server.gmail.emulator import FaultProfile, GmailEmulator, SyntheticMailbox
+
+
+class DisconnectedClientTest(unittest.TestCase):
+    def test_client_hanging_up_mid_request_is_not_an_error(self):
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr), \
+                GmailEmulator(SyntheticMailbox(size=10), FaultProfile(latency=0.2)) as emulator:
+            root = urlsplit(emulator.api_root)
+            sock = socket.create_connection((root.hostname, root.port))
+            sock.sendall(b"GET /gmail/v1/users/me/profile HTTP/1.1\r\nHost: emulator\r\nAuthorization: Bearer token\r\n\r\n")
+            # Abort with a reset instead of a FIN, as a cancelled request does
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+            sock.close()
+            # Let the handler wake from the injected latency and answer the dead socket
+            time.sleep(0.5)
+
+            with urllib.request.urlopen(emulator.api_root + "emulator/stats") as response:
+                stats = json.load(response)
+        self.assertEqual(stats["http_requests"], 1)
+        self.assertNotIn("Traceback", stderr.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+# tests/test_list_pages.py
+import unittest
+
+from mcp_server.gmail.gmail_client import ListPosition, slice_list_page
+
+# Three messages.list pages, newest first, as Gmail would return them for pageToken None, "p2" and "p3"
+PAGES = {
+    None: {"messages": [{"id": f"m{i}"} for i in range(0, 4)], "nextPageToken": "p2"},
+    "p2": {"messages": [{"id": f"m{i}"} for i in range(4, 8)], "nextPageToken": "p3"},
+    "p3": {"messages": [{"id": f"m{i}"} for i in range(8, 10)]},
+}
+
+
+def _ids(page) -> list[str]:
+    return [message["id"] for message in page.messages]
+
+
+def _walk(position: ListPosition, max_results: int) -> tuple[list[str], ListPosition | None, int]:
+    """Lists max_results IDs from position the way the clients do; returns them, the end position and pages requested."""
+    ids, requests = [], 0
+    while len(ids) < max_results and position is not None:
+        page = slice_list_page(PAGES[position.page_token], position, max_results - len(ids))
+        requests += 1
+        ids.extend(_ids(page))
+        position = page.end
+    return ids, position, requests
+
+
+class SliceListPageTest(unittest.TestCase):
+    def test_slice_from_mid_page_resumes_within_the_page(self):
+        page = slice_list_page(PAGES[None], ListPosition(None, 1), 2)
+        self.assertEqual(_ids(page), ["m1", "m2"])
+        self.assertEqual(page.end, ListPosition(None, 3))
+
+    def test_slice_ending_with_the_page_resumes_at_the_next_token(self):
+        page = slice_list_page(PAGES[None], ListPosition(None, 2), 5)
+        self.assertEqual(_ids(page), ["m2", "m3"])
+        self.assertEqual(page.end, ListPosition("p2", 0))
+
+    def test_slice_crossing_a_page_boundary(self):
+        ids, end, requests = _walk(ListPosition(None, 3), 3)
+        self.assertEqual(ids, ["m3", "m4", "m5"])
+        self.assertEqual(end, ListPosition("p2", 2))
+        self.assertEqual(requests, 2)
+        # Resuming from there continues without repeating or skipping
+        ids, end, _ = _walk(end, 3)
+        self.assertEqual(ids, ["m6", "m7", "m8"])
+        self.assertEqual(end, ListPosition("p3", 1))
+
+    def test_skip_larger_than_the_page_carries_over(self):
+        page = slice_list_page(PAGES[None], ListPosition(None, 6), 2)
+        self.assertEqual(_ids(page), [])
+        self.assertEqual(page.end, ListPosition("p2", 2))
+        ids, _, requests = _walk(ListPosition(None, 6), 2)
+        self.assertEqual(ids, ["m6", "m7"])
+        self.assertEqual(requests, 2)
+
+    def test_end_of_the_last_page_exhausts_the_listing(self):
+        page = slice_list_page(PAGES["p3"], ListPosition("p3", 1), 5)
+        self.assertEqual(_ids(page), ["m9"])
+        self.assertIsNone(page.end)
+        ids, end, _ = _walk(ListPosition("p2", 3), 10)
+        self.assertEqual(ids, ["m7", "m8", "m9"])
+        self.assertIsNone(end)
+
+    def test_empty_result_set(self):
+        page = slice_list_page({}, ListPosition(), 10)
+        self.assertEqual(page, ([], None))
+
+
+if __name__ == "__main__":
+    unittest.main()
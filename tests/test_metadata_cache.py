@@ -0,0 +1,65 @@
+# tests/test_metadata_cache.py
+import sqlite3
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from mcp_server.gmail.metadata_cache import MessageMetadataCache
+
+
+class MessageMetadataCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.path = Path(self._dir.name) / "metadata.db"
+        self.cache = MessageMetadataCache(self.path, max_entries=2, busy_timeout=0.05)
+
+    def tearDown(self):
+        self.cache.close()
+        self._dir.cleanup()
+
+    def _lock_database(self) -> sqlite3.Connection:
+        """Holds the write lock from another connection, like a second server process."""
+        other = sqlite3.connect(str(self.path), isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        return other
+
+    def test_round_trip_and_lru_eviction(self):
+        self.cache.put_many({"a": {"subject": "A"}})
+        time.sleep(0.01)
+        self.cache.put_many({"b": {"subject": "B"}})
+        time.sleep(0.01)
+        self.cache.get_many(["a"])
+        time.sleep(0.01)
+        self.cache.put_many({"c": {"subject": "C"}})
+        self.assertEqual(set(self.cache.get_many(["a", "b", "c"])), {"a", "c"})
+
+    def test_write_under_foreign_lock_is_dropped_quickly(self):
+        other = self._lock_database()
+        try:
+            started = time.monotonic()
+            self.cache.put_many({"a": {"subject": "A"}})
+            self.assertLess(time.monotonic() - started, 1.0)
+        finally:
+            other.execute("ROLLBACK")
+            other.close()
+        self.assertEqual(self.cache.get_many(["a"]), {})
+
+    def test_read_under_foreign_lock_still_serves_hits(self):
+        self.cache.put_many({"a": {"subject": "A"}})
+        other = self._lock_database()
+        try:
+            self.assertEqual(self.cache.get_many(["a", "b"]), {"a": {"subject": "A"}})
+        finally:
+            other.execute("ROLLBACK")
+            other.close()
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_read_error_is_a_miss(self):
+        self.cache._conn.execute("DROP TABLE messages")
+        self.assertEqual(self.cache.get_many(["a"]), {})
+        self.assertEqual(self.cache.misses, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+# tests/test_metrics.py
+import socket
+import unittest
+from unittest import mock
+
+from mcp_server.gmail import server
+from mcp_server.gmail.metrics import MetricsRegistry, _Metric
+
+
+class MetricTypesTest(unittest.TestCase):
+    def test_metric_base_is_abstract(self):
+        with self.assertRaises(TypeError):
+            _Metric("gmail_test", "A metric with no samples.")
+
+    def test_counter_renders(self):
+        registry = MetricsRegistry()
+        registry.counter("gmail_test_total", "Test events.", ["kind"]).inc(kind="a")
+        self.assertIn('gmail_test_total{kind="a"} 1', registry.render())
+
+
+class MetricsEndpointTest(unittest.IsolatedAsyncioTestCase):
+    async def test_port_in_use_disables_metrics_instead_of_failing(self):
+        taken = socket.socket()
+        taken.bind(("127.0.0.1", 0))
+        taken.listen()
+        try:
+            with mock.patch.object(server, "METRICS_HOST", "127.0.0.1"), \
+                    mock.patch.object(server, "METRICS_PORT", taken.getsockname()[1]), \
+                    self.assertLogs("mcp_server.gmail.server", "WARNING") as logs:
+                self.assertIsNone(await server._start_metrics_server())
+        finally:
+            taken.close()
+        self.assertIn("Metrics endpoint disabled", logs.output[0])
+
+    async def test_free_port_serves_metrics(self):
+        with mock.patch.object(server, "METRICS_HOST", "127.0.0.1"), mock.patch.object(server, "METRICS_PORT", _free_port()):
+            metrics_server = await server._start_metrics_server()
+        self.assertIsNotNone(metrics_server)
+        metrics_server.close()
+        await metrics_server.wait_closed()
+
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+if __name__ == "__main__":
+    unittest.main()
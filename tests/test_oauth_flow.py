@@ -0,0 +1,52 @@
+# tests/test_oauth_flow.py
+import contextlib
+import io
+import subprocess
+import sys
+import textwrap
+import unittest
+
+from google_auth_oauthlib.flow import WSGITimeoutError
+
+from mcp_server.gmail.server import SCOPES, _StderrAppFlow
+
+_CLIENT_CONFIG = {"installed": {
+    "client_id": "client-id",
+    "client_secret": "client-secret",
+    "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+    "token_uri": "https://oauth2.googleapis.com/token",
+}}
+
+
+class OAuthFlowTest(unittest.TestCase):
+    def test_authorization_url_goes_to_stderr_and_the_wait_times_out(self):
+        flow = _StderrAppFlow.from_client_config(_CLIENT_CONFIG, SCOPES)
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr), \
+                self.assertRaises(WSGITimeoutError):
+            flow.run_local_server(port=0, open_browser=False, authorization_prompt_message=None, timeout_seconds=0.1)
+        self.assertEqual(stdout.getvalue(), "")
+        self.assertIn("https://accounts.google.com/o/oauth2/auth?", stderr.getvalue())
+
+    def test_abandoned_credential_lookup_does_not_block_exit(self):
+        script = textwrap.dedent("""
+            import asyncio, threading
+            from mcp_server.gmail import server
+
+            # Stands in for an OAuth flow waiting on a browser that never returns
+            server.get_credentials = lambda *args: threading.Event().wait()
+            server.API_ROOT = None
+
+            async def main():
+                warm_up = asyncio.create_task(server._open_mailbox(None))
+                await asyncio.sleep(0.1)
+                warm_up.cancel()
+
+            asyncio.run(main())
+        """)
+        completed = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=30)
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+# tests/test_pagination.py
+import base64
+import json
+import unittest
+
+from mcp_server.gmail.gmail_client import ListPosition
+from mcp_server.gmail.mailbox import Mailbox
+from mcp_server.gmail.pagination import Cursor, decode_cursor, encode_cursor
+from mcp_server.gmail.server import _page_known_ids
+
+
+def _raw_cursor(state: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode().rstrip("=")
+
+
+class CursorTest(unittest.TestCase):
+    def test_round_trip(self):
+        for cursor in (
+            Cursor("from:bob", ListPosition("token-1", 3), "m7"),
+            Cursor("", ListPosition(None, 40), None),
+            Cursor("subject:\"ünïcode\" OR label:x", ListPosition(), None),
+        ):
+            with self.subTest(cursor=cursor):
+                encoded = encode_cursor("search_emails", cursor)
+                self.assertNotIn("=", encoded)
+                self.assertEqual(decode_cursor(encoded, "search_emails"), cursor)
+
+    def test_cursor_from_another_tool_is_rejected(self):
+        encoded = encode_cursor("list_unread", Cursor("", ListPosition(None, 10), "m1"))
+        with self.assertRaisesRegex(ValueError, "issued by 'list_unread'"):
+            decode_cursor(encoded, "search_emails")
+
+    def test_malformed_cursors_are_rejected(self):
+        for cursor in ("", "not base64!", "bm90IGpzb24", _raw_cursor([1, 2]), _raw_cursor({"tool": "search_emails"})):
+            with self.subTest(cursor=cursor), self.assertRaisesRegex(ValueError, "Invalid cursor"):
+                decode_cursor(cursor, "search_emails")
+
+    def test_tampered_fields_are_rejected(self):
+        valid = {"tool": "search_emails", "q": "from:bob", "t": None, "s": 10, "a": "m1"}
+        for field, value in (("s", -1), ("s", "10"), ("s", 1.5), ("q", None), ("t", 5), ("a", ["m1"])):
+            with self.subTest(field=field, value=value), self.assertRaisesRegex(ValueError, "Invalid cursor"):
+                decode_cursor(_raw_cursor({**valid, field: value}), "search_emails")
+
+
+class _DetailsClient:
+    """An async client that returns a stub for every requested message."""
+
+    limiter = None
+
+    async def get_messages_details_batch(self, message_ids):
+        return {message_id: {"id": message_id} for message_id in message_ids}
+
+
+class PageKnownIdsTest(unittest.IsolatedAsyncioTestCase):
+    async def _next_page(self, ids: list[str], cursor: Cursor, max_results: int = 2):
+        listing = cursor.listing()
+        await _page_known_ids(Mailbox(client=_DetailsClient()), ids, max_results, listing, None)
+        return [message_id for message_id, _ in listing.messages], listing.next_position
+
+    async def test_unchanged_list_resumes_after_the_anchor(self):
+        page, end = await self._next_page(["m6", "m5", "m4", "m3"], Cursor("", ListPosition(None, 2), "m5"))
+        self.assertEqual(page, ["m4", "m3"])
+        self.assertEqual(end, ListPosition(None, 4))
+
+    async def test_new_mail_shifts_the_position_down(self):
+        page, _ = await self._next_page(["m8", "m7", "m6", "m5", "m4", "m3"], Cursor("", ListPosition(None, 2), "m5"))
+        self.assertEqual(page, ["m4", "m3"])
+
+    async def test_deleted_anchor_does_not_skip_the_next_message(self):
+        # m5 was the last message of the first page and has been deleted (or read) since
+        page, end = await self._next_page(["m6", "m4", "m3", "m2"], Cursor("", ListPosition(None, 2), "m5"))
+        self.assertEqual(page, ["m4", "m3"])
+        self.assertEqual(end, ListPosition(None, 3))
+
+    async def test_last_page_has_no_next_position(self):
+        page, end = await self._next_page(["m6", "m5", "m4"], Cursor("", ListPosition(None, 2), "m5"))
+        self.assertEqual(page, ["m4"])
+        self.assertIsNone(end)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+# tests/test_profiling.py
+import os
+import pstats
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from mcp_server.gmail.profiling import CallProfiler
+
+
+def _pool_work() -> int:
+    return sum(range(10_000))
+
+
+class CallProfilerTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.directory = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    async def test_stem_names_the_process(self):
+        async with CallProfiler(self.directory).profile("search_emails", force=True) as stem:
+            pass
+        self.assertIn(f"-{os.getpid()}-", stem.name)
+        self.assertTrue(Path(f"{stem}.collapsed").exists())
+
+    async def test_cprofile_records_worker_threads(self):
+        async with CallProfiler(self.directory, mode="cprofile").profile("list_unread", force=True) as stem:
+            worker = threading.Thread(target=_pool_work)
+            worker.start()
+            worker.join()
+        functions = {name for _, _, name in pstats.Stats(f"{stem}.prof").stats}
+        self.assertIn("_pool_work", functions)
+
+    async def test_dumps_are_written_off_the_event_loop(self):
+        profiler = CallProfiler(self.directory)
+        finishing_threads = []
+        finish = profiler._finish
+
+        def recording_finish(*args):
+            finishing_threads.append(threading.get_ident())
+            finish(*args)
+
+        with mock.patch.object(profiler, "_finish", recording_finish):
+            async with profiler.profile("search_emails", force=True):
+                pass
+        self.assertEqual(len(finishing_threads), 1)
+        self.assertNotEqual(finishing_threads[0], threading.get_ident())
+
+    async def test_unsampled_call_is_not_profiled(self):
+        async with CallProfiler(self.directory).profile("list_unread") as stem:
+            self.assertIsNone(stem)
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
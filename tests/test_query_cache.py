@@ -0,0 +1,101 @@
+# tests/test_query_cache.py
+import unittest
+from unittest import mock
+
+from mcp_server.gmail import query_cache
+from mcp_server.gmail.query_cache import QueryCache
+
+
+class _Clock:
+    """Stands in for the time module; only monotonic() is used."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class QueryCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        patcher = mock.patch.object(query_cache, "time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_hit_at_the_same_history_id(self):
+        cache = QueryCache()
+        cache.put("from:bob", ["m3", "m2", "m1"], "100", complete=True)
+        self.assertEqual(cache.get("from:bob", 2, "100"), ["m3", "m2"])
+        # A complete listing answers larger requests too
+        self.assertEqual(cache.get("from:bob", 10, "100"), ["m3", "m2", "m1"])
+        self.assertEqual(cache.stats()["hits"], 2)
+
+    def test_incomplete_listing_does_not_answer_larger_requests(self):
+        cache = QueryCache()
+        cache.put("from:bob", ["m3", "m2"], "100", complete=False)
+        self.assertIsNone(cache.get("from:bob", 3, "100"))
+        self.assertEqual(cache.get("from:bob", 2, "100"), ["m3", "m2"])
+
+    def test_changed_history_id_invalidates_the_entry(self):
+        cache = QueryCache()
+        cache.put("from:bob", ["m1"], "100", complete=True)
+        self.assertIsNone(cache.get("from:bob", 1, "101"))
+        # The stale entry was dropped, not just skipped
+        self.assertEqual(cache.stats()["entries"], 0)
+        self.assertIsNone(cache.get("from:bob", 1, "100"))
+
+    def test_entry_expires_after_the_ttl(self):
+        cache = QueryCache(ttl=60)
+        cache.put("from:bob", ["m1"], "100", complete=True)
+        self.clock.now += 60
+        self.assertEqual(cache.get("from:bob", 1, "100"), ["m1"])
+        self.clock.now += 1
+        self.assertIsNone(cache.get("from:bob", 1, "100"))
+        self.assertEqual(cache.stats()["bytes"], 0)
+
+    def test_put_sweeps_expired_entries(self):
+        cache = QueryCache(ttl=60)
+        cache.put("from:bob", ["m1"], "100", complete=True)
+        cache.put("from:carol", ["m2"], "100", complete=True)
+        self.clock.now += 30
+        cache.put("from:dave", ["m3"], "100", complete=True)
+        self.clock.now += 31
+        # from:bob and from:carol expired without ever being asked for again
+        cache.put("from:erin", ["m4"], "100", complete=True)
+        self.assertEqual(cache.stats()["entries"], 2)
+        self.assertEqual(cache.get("from:dave", 1, "100"), ["m3"])
+        self.assertEqual(cache.get("from:erin", 1, "100"), ["m4"])
+
+    def test_memory_budget_evicts_least_recently_used(self):
+        probe = QueryCache()
+        probe.put("q1", ["m1"], "100", complete=True)
+        entry_size = probe.stats()["bytes"]
+        cache = QueryCache(max_bytes=entry_size * 2)
+        cache.put("q1", ["m1"], "100", complete=True)
+        cache.put("q2", ["m2"], "100", complete=True)
+        # Using q1 makes q2 the least recently used
+        cache.get("q1", 1, "100")
+        cache.put("q3", ["m3"], "100", complete=True)
+        self.assertEqual(cache.stats()["bytes"], entry_size * 2)
+        self.assertIsNone(cache.get("q2", 1, "100"))
+        self.assertEqual(cache.get("q1", 1, "100"), ["m1"])
+        self.assertEqual(cache.get("q3", 1, "100"), ["m3"])
+
+    def test_entry_larger_than_the_budget_is_not_stored(self):
+        cache = QueryCache(max_bytes=100)
+        cache.put("from:bob", [f"m{i}" for i in range(10)], "100", complete=True)
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_observed_history_id_is_trusted_for_the_freshness_window(self):
+        cache = QueryCache(freshness=1.0)
+        self.assertIsNone(cache.fresh_history_id())
+        cache.note_history_id("100")
+        self.clock.now += 0.5
+        self.assertEqual(cache.fresh_history_id(), "100")
+        self.clock.now += 0.5
+        self.assertIsNone(cache.fresh_history_id())
+
+
+if __name__ == "__main__":
+    unittest.main()
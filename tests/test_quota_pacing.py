@@ -0,0 +1,104 @@
+# tests/test_quota_pacing.py
+import asyncio
+import contextlib
+import unittest
+
+import httpx
+from google.oauth2.credentials import Credentials
+
+from mcp_server.gmail.async_gmail_client import AsyncGmailApiClient
+from mcp_server.gmail.gmail_client import ListPosition, MessageIdPage
+from mcp_server.gmail.rate_limit import QUOTA_UNITS, QuotaLimiter
+from mcp_server.gmail.retry import RetryPolicy
+from mcp_server.gmail.server import _iter_pages
+
+
+def _message(message_id: str) -> dict:
+    return {"id": message_id, "snippet": "", "payload": {"headers": []}}
+
+
+class AsyncBatchPacingTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.in_flight = 0
+        self.peak = 0
+        self.throttled_ids = set()
+        self.limiter = QuotaLimiter(units_per_second=1_000_000, max_concurrency=3)
+        self.client = AsyncGmailApiClient(Credentials(token="token"), limiter=self.limiter, retry_policy=RetryPolicy(max_attempts=1))
+        await self.client.close()
+        self.client._http = httpx.AsyncClient(base_url="https://gmail.test/gmail/v1/users/me/", transport=httpx.MockTransport(self._handle))
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    async def _handle(self, request: httpx.Request) -> httpx.Response:
+        message_id = request.url.path.rsplit("/", 1)[-1]
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.in_flight -= 1
+        if message_id in self.throttled_ids:
+            return httpx.Response(429, json={"error": {"code": 429, "message": "Too many requests"}})
+        return httpx.Response(200, json=_message(message_id))
+
+    async def test_each_get_takes_its_own_concurrency_slot(self):
+        ids = [f"m{i}" for i in range(20)]
+        details = await self.client.get_messages_details_batch(ids)
+        self.assertEqual(set(details), set(ids))
+        self.assertTrue(all(details.values()))
+        self.assertLessEqual(self.peak, 3)
+        self.assertEqual(self.limiter.concurrency.in_flight, 0)
+
+    async def test_throttled_gets_are_reported_one_by_one(self):
+        self.throttled_ids = {"m1", "m4", "m7"}
+        details = await self.client.get_messages_details_batch([f"m{i}" for i in range(8)])
+        self.assertEqual({message_id for message_id, value in details.items() if value is None}, self.throttled_ids)
+        self.assertEqual(self.limiter.throttled, 3)
+
+
+class _ListingClient:
+    """Stands in for a GmailClient whose listing returns fixed pages, charging a fake limiter."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.charged = []
+        self.requests = 0
+        self.limiter = self
+
+    @contextlib.asynccontextmanager
+    async def slot(self, units):
+        self.charged.append(units)
+        yield
+
+    async def run_in_pool(self, func, *args):
+        return func(*args)
+
+    def iter_message_id_pages(self, max_results=10, start=None):
+        for page in self.pages:
+            self.requests += 1
+            yield page
+
+
+class IterPagesChargingTest(unittest.IsolatedAsyncioTestCase):
+    async def _collect(self, client, **list_kwargs):
+        return [page async for page in _iter_pages(client, **list_kwargs)]
+
+    async def test_exhausted_listing_is_not_charged_an_extra_step(self):
+        client = _ListingClient([
+            MessageIdPage([{"id": "a"}], ListPosition("t1")),
+            MessageIdPage([{"id": "b"}], None),
+        ])
+        pages = await self._collect(client, max_results=10)
+        self.assertEqual(len(pages), 2)
+        self.assertEqual(client.charged, [QUOTA_UNITS["users.messages.list"]] * 2)
+
+    async def test_listing_that_fills_max_results_is_not_charged_an_extra_step(self):
+        client = _ListingClient([MessageIdPage([{"id": "a"}, {"id": "b"}], ListPosition("t1"))])
+        pages = await self._collect(client, max_results=2)
+        self.assertEqual(len(pages), 1)
+        self.assertEqual(len(client.charged), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+# tests/test_retry.py
+import unittest
+
+import httplib2
+from google.oauth2.credentials import Credentials
+from googleapiclient.errors import HttpError
+
+from mcp_server.gmail.emulator import FaultProfile, GmailEmulator, SyntheticMailbox
+from mcp_server.gmail.gmail_client import GmailApiClient
+from mcp_server.gmail.rate_limit import QuotaLimiter, TokenBucket
+from mcp_server.gmail.retry import RetryBudget, RetryPolicy
+
+
+def _throttled() -> HttpError:
+    return HttpError(httplib2.Response({"status": "429"}), b"rateLimitExceeded")
+
+
+class _RecordingLimiter(QuotaLimiter):
+    """A QuotaLimiter that remembers every retry it was charged for."""
+
+    def __init__(self):
+        super().__init__(units_per_second=1_000_000)
+        self.charged = []
+
+    async def charge(self, units):
+        self.charged.append(units)
+        await super().charge(units)
+
+    def charge_blocking(self, units):
+        self.charged.append(units)
+        return super().charge_blocking(units)
+
+
+def _policy() -> RetryPolicy:
+    return RetryPolicy(max_attempts=5, base_delay=0.001, budget=RetryBudget(max_tokens=100))
+
+
+def _flaky(failures: int):
+    """Returns a callable that raises a 429 on its first `failures` calls, and how many calls it got."""
+    calls = []
+
+    def func():
+        calls.append(None)
+        if len(calls) <= failures:
+            raise _throttled()
+        return "ok"
+    return func, calls
+
+
+class RetryChargingTest(unittest.IsolatedAsyncioTestCase):
+    def test_each_blocking_retry_is_charged(self):
+        limiter = _RecordingLimiter()
+        func, calls = _flaky(2)
+        with self.assertLogs("mcp_server.gmail.retry", "WARNING"):
+            self.assertEqual(_policy().call(func, limiter=limiter, units=5), "ok")
+        self.assertEqual(len(calls), 3)
+        # The first attempt was paid for by the caller's slot; only the retries are charged here
+        self.assertEqual(limiter.charged, [5, 5])
+
+    async def test_each_async_retry_is_charged(self):
+        limiter = _RecordingLimiter()
+        func, calls = _flaky(3)
+
+        async def attempt():
+            return func()
+        with self.assertLogs("mcp_server.gmail.retry", "WARNING"):
+            self.assertEqual(await _policy().call_async(attempt, limiter=limiter, units=2), "ok")
+        self.assertEqual(limiter.charged, [2, 2, 2])
+
+    def test_no_charge_without_retries(self):
+        limiter = _RecordingLimiter()
+        func, _ = _flaky(0)
+        _policy().call(func, limiter=limiter, units=5)
+        self.assertEqual(limiter.charged, [])
+
+    def test_charges_come_out_of_the_bucket(self):
+        limiter = QuotaLimiter(units_per_second=10)
+        func, _ = _flaky(2)
+        with self.assertLogs("mcp_server.gmail.retry", "WARNING"):
+            _policy().call(func, limiter=limiter, units=5)
+        # Two retries took 10 of the 10 burst units; the refill over the backoff is negligible
+        self.assertLess(limiter.bucket._tokens, 1)
+
+    def test_blocking_charge_reports_the_wait_it_owes(self):
+        bucket = TokenBucket(rate=10, capacity=10)
+        self.assertEqual(bucket.charge(10), 0)
+        # The bucket is empty, so 5 more units take half a second to cover
+        self.assertAlmostEqual(bucket.charge(5), 0.5, delta=0.05)
+
+
+class BatchRetryChargingTest(unittest.TestCase):
+    def test_batch_retry_rounds_are_charged_per_message(self):
+        mailbox = SyntheticMailbox(size=60, seed=1)
+        ids = [message["id"] for message in mailbox.list(None, [], None, 60)["messages"]]
+        limiter = _RecordingLimiter()
+        with GmailEmulator(mailbox, FaultProfile(throttle_rate=0.2, seed=3)) as emulator:
+            client = GmailApiClient(Credentials(token="token"), pool_size=1, limiter=limiter,
+                                    retry_policy=RetryPolicy(max_attempts=10, base_delay=0.001, budget=RetryBudget(max_tokens=100)),
+                                    api_root=emulator.api_root)
+            try:
+                with self.assertLogs("mcp_server.gmail", "WARNING"):
+                    details = client.get_messages_details_batch(ids)
+            finally:
+                client.close()
+            throttled = emulator.stats.snapshot()["errors"].get("429", 0)
+        self.assertTrue(all(details.values()))
+        self.assertGreater(throttled, 0)
+        # Every throttled message went into exactly one more round, costing one messages.get each
+        self.assertEqual(sum(limiter.charged), 5 * throttled)
+
+
+if __name__ == "__main__":
+    unittest.main()
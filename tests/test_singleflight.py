@@ -0,0 +1,83 @@
+# tests/test_singleflight.py
+import asyncio
+import unittest
+
+from mcp_server.gmail.singleflight import SingleFlight
+
+
+class SingleFlightTest(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_callers_share_one_execution(self):
+        flight = SingleFlight()
+        runs = 0
+
+        async def work():
+            nonlocal runs
+            runs += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+        self.assertEqual(results, ["result"] * 5)
+        self.assertEqual(runs, 1)
+
+    async def test_call_after_last_waiter_cancelled_starts_fresh_work(self):
+        flight = SingleFlight()
+        started = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(10)
+
+        async def fast():
+            return "fresh"
+
+        first = asyncio.create_task(flight.do("key", slow))
+        await started.wait()
+        first.cancel()
+        # Let the cancelled caller's finally block run, but not the dying task's done callbacks
+        await asyncio.sleep(0)
+        self.assertIsNone(flight.in_flight("key"))
+        self.assertEqual(await flight.do("key", fast), "fresh")
+        with self.assertRaises(asyncio.CancelledError):
+            await first
+
+    async def test_cancelling_one_of_two_waiters_keeps_the_work(self):
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            return "result"
+
+        first = asyncio.create_task(flight.do("key", work))
+        second = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        self.assertEqual(await second, "result")
+
+    async def test_joined_task_survives_the_other_waiter_leaving_before_it_is_awaited(self):
+        flight = SingleFlight()
+        task = asyncio.ensure_future(asyncio.sleep(0.01, "result"))
+        flight.track(["key"], task)
+        flight.join(task)
+        # A second caller looks the task up and joins it, but has not awaited it yet...
+        joined = flight.in_flight("key")
+        flight.join(joined)
+        # ...when the first caller is cancelled
+        flight.leave(task)
+        self.assertFalse(task.cancelled())
+        self.assertEqual(await asyncio.shield(joined), "result")
+        flight.leave(joined)
+
+    async def test_leaving_last_cancels_the_task(self):
+        flight = SingleFlight()
+        task = asyncio.ensure_future(asyncio.sleep(10))
+        flight.track(["key"], task)
+        flight.join(task)
+        flight.leave(task)
+        self.assertIsNone(flight.in_flight("key"))
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+# tests/test_tool_arguments.py
+import json
+import unittest
+
+from mcp_server.gmail.server import _execute_tool
+
+
+async def _error(name: str, arguments: dict) -> str:
+    # Argument checks run before the mailbox is touched, so none is needed
+    result = await _execute_tool(name, arguments, mailbox=None)
+    return json.loads(result[0].text)["error"]
+
+
+class MaxResultsTest(unittest.IsolatedAsyncioTestCase):
+    async def test_zero_is_rejected(self):
+        self.assertIn("max_results", await _error("list_unread", {"max_results": 0}))
+
+    async def test_negative_is_rejected(self):
+        self.assertIn("max_results", await _error("search_emails", {"query": "x", "max_results": -3}))
+
+    async def test_non_integers_are_rejected(self):
+        for value in ("5", 2.5, True, None):
+            with self.subTest(value=value):
+                self.assertIn("max_results", await _error("list_unread", {"max_results": value}))
+
+
+class DeadlineSecondsTest(unittest.IsolatedAsyncioTestCase):
+    async def test_invalid_values_are_rejected(self):
+        for value in ("5", None, -1, True, float("nan")):
+            with self.subTest(value=value):
+                self.assertIn("deadline_seconds", await _error("list_unread", {"deadline_seconds": value}))
+
+
+if __name__ == "__main__":
+    unittest.main()
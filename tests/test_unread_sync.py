@@ -0,0 +1,142 @@
+# tests/test_unread_sync.py
+import unittest
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from mcp_server.gmail.gmail_client import MessageIdPage
+from mcp_server.gmail.mailbox import Mailbox
+from mcp_server.gmail.server import _sync_unread_ids
+from mcp_server.gmail.unread_sync import UnreadView
+
+
+def _labelled(key: str, message_id: str, *labels: str) -> dict:
+    return {key: [{"message": {"id": message_id, "labelIds": list(labels)}}]}
+
+
+class ApplyHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.view = UnreadView(capacity=10)
+        self.view.reset(["m2", "m1"], "100")
+
+    def test_marking_unread_adds_the_message_as_newest(self):
+        self.view.apply_history([_labelled("labelsAdded", "m0", "UNREAD", "INBOX")], "101")
+        self.assertEqual(self.view.snapshot(10), ["m0", "m2", "m1"])
+        self.assertEqual(self.view.history_id, "101")
+
+    def test_marking_read_removes_the_message(self):
+        self.view.apply_history([_labelled("labelsRemoved", "m2", "INBOX")], "101")
+        self.assertEqual(self.view.snapshot(10), ["m1"])
+
+    def test_changes_apply_in_record_order(self):
+        records = [_labelled("labelsRemoved", "m1", "INBOX"), _labelled("labelsAdded", "m1", "UNREAD", "INBOX")]
+        self.view.apply_history(records, "102")
+        self.assertEqual(self.view.snapshot(10), ["m1", "m2"])
+
+    def test_moving_to_trash_or_spam_removes_an_unread_message(self):
+        self.view.apply_history([
+            _labelled("labelsAdded", "m2", "UNREAD", "TRASH"),
+            _labelled("labelsAdded", "m1", "UNREAD", "SPAM"),
+        ], "101")
+        self.assertEqual(self.view.snapshot(10), [])
+
+    def test_unread_arrival_in_spam_is_not_added(self):
+        self.view.apply_history([_labelled("messagesAdded", "m3", "UNREAD", "SPAM")], "101")
+        self.assertEqual(self.view.snapshot(10), ["m2", "m1"])
+
+    def test_deleted_message_is_removed(self):
+        self.view.apply_history([{"messagesDeleted": [{"message": {"id": "m1"}}]}], "101")
+        self.assertEqual(self.view.snapshot(10), ["m2"])
+
+    def test_record_without_labels_is_ignored(self):
+        self.view.apply_history([{"labelsAdded": [{"message": {"id": "m2"}}]}], "101")
+        self.assertEqual(self.view.snapshot(10), ["m2", "m1"])
+
+
+class SnapshotTest(unittest.TestCase):
+    def test_unsynced_view_cannot_answer(self):
+        self.assertIsNone(UnreadView().snapshot(5))
+
+    def test_short_listing_is_complete(self):
+        view = UnreadView(capacity=3)
+        view.reset(["m2", "m1"], "100")
+        # Fewer messages than asked for is the exact answer when the view holds every unread message
+        self.assertEqual(view.snapshot(5), ["m2", "m1"])
+
+    def test_full_listing_may_be_truncated(self):
+        view = UnreadView(capacity=3)
+        view.reset(["m3", "m2", "m1"], "100")
+        self.assertEqual(view.snapshot(2), ["m3", "m2"])
+        self.assertEqual(view.snapshot(3), ["m3", "m2", "m1"])
+        self.assertIsNone(view.snapshot(4))
+
+    def test_growing_past_capacity_drops_the_oldest_and_marks_the_view_truncated(self):
+        view = UnreadView(capacity=2)
+        view.reset(["m1"], "100")
+        view.apply_history([_labelled("messagesAdded", "m2", "UNREAD"), _labelled("messagesAdded", "m3", "UNREAD")], "101")
+        self.assertEqual(view.snapshot(2), ["m3", "m2"])
+        # Reading m3 leaves one known message, but m1 is still unread somewhere below it
+        view.apply_history([_labelled("labelsRemoved", "m3", "INBOX")], "102")
+        self.assertIsNone(view.snapshot(2))
+        self.assertEqual(view.snapshot(1), ["m2"])
+
+    def test_invalidate_forgets_the_view(self):
+        view = UnreadView()
+        view.reset(["m1"], "100")
+        view.invalidate()
+        self.assertIsNone(view.history_id)
+        self.assertIsNone(view.snapshot(1))
+
+
+class _HistoryClient:
+    """An async client whose history checkpoint has expired."""
+
+    limiter = None
+
+    def __init__(self, unread_ids: list[str], history_id: str):
+        self.unread_ids = unread_ids
+        self.history_id = history_id
+        self.calls = []
+
+    async def list_history(self, start_history_id):
+        self.calls.append(("list_history", start_history_id))
+        raise HttpError(httplib2.Response({"status": "404"}), b"Requested entity was not found.")
+
+    async def get_history_id(self):
+        self.calls.append(("get_history_id",))
+        return self.history_id
+
+    async def iter_message_id_pages(self, label_ids=None, max_results=10, **kwargs):
+        self.calls.append(("list", tuple(label_ids)))
+        yield MessageIdPage([{"id": message_id} for message_id in self.unread_ids[:max_results]], None)
+
+
+class ExpiredCheckpointTest(unittest.IsolatedAsyncioTestCase):
+    async def test_expired_history_id_forces_a_full_resync(self):
+        client = _HistoryClient(["m9", "m8"], "500")
+        mailbox = Mailbox(client=client, unread_view=UnreadView(capacity=10))
+        mailbox.unread_view.reset(["m1"], "100")
+        with self.assertLogs("mcp_server.gmail.server", "INFO") as logs:
+            ids = await _sync_unread_ids(mailbox, 5)
+        self.assertEqual(ids, ["m9", "m8"])
+        self.assertEqual(mailbox.unread_view.history_id, "500")
+        self.assertEqual(client.calls, [("list_history", "100"), ("get_history_id",), ("list", ("UNREAD",))])
+        self.assertIn("History checkpoint 100 expired", logs.output[0])
+
+    async def test_other_history_errors_are_raised(self):
+        client = _HistoryClient([], "500")
+
+        async def failing_history(start_history_id):
+            raise HttpError(httplib2.Response({"status": "500"}), b"backendError")
+
+        client.list_history = failing_history
+        mailbox = Mailbox(client=client, unread_view=UnreadView(capacity=10))
+        mailbox.unread_view.reset(["m1"], "100")
+        with self.assertRaises(HttpError):
+            await _sync_unread_ids(mailbox, 5)
+        # The checkpoint is kept for the next poll to retry
+        self.assertEqual(mailbox.unread_view.history_id, "100")
+
+
+if __name__ == "__main__":
+    unittest.main()